@@ -0,0 +1,89 @@
+# bench_db_async.py → 200 LLAMADAS CONCURRENTES AL WEBHOOK: POOL SÍNCRONO vs ASÍNCRONO
+#
+#   TEST_DATABASE_URL=postgresql://postgres@localhost/agenza_test python -m pytest benchmarks/bench_db_async.py -s
+#
+# Cada llamada hace lo que un paciente en el paso más pesado: consulta la
+# disponibilidad de un día y reserva un bloque. La ruta síncrona llama a
+# db_service desde el handler async (como antes): cada consulta detiene el
+# event loop. La asíncrona usa el pool asíncrono. Además del throughput se mide
+# cuánto llega a atrasarse el loop (lo que espera cualquier otro webhook).
+
+import asyncio
+import time
+import pytest
+import db_service
+from migrar import _sembrar
+
+LLAMADAS = 200
+RONDAS = 3
+
+
+async def _medir_atraso(detener: asyncio.Event, atrasos: list):
+    """Tic cada 1 ms: el atraso máximo es lo que el loop estuvo sin atender a nadie."""
+    while not detener.is_set():
+        antes = time.perf_counter()
+        await asyncio.sleep(0.001)
+        atrasos.append(time.perf_counter() - antes - 0.001)
+
+
+async def _ronda(webhook, casos) -> tuple:
+    detener = asyncio.Event()
+    atrasos: list = []
+    medidor = asyncio.create_task(_medir_atraso(detener, atrasos))
+    await asyncio.sleep(0.005)
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(webhook(*caso) for caso in casos))
+    segundos = time.perf_counter() - inicio
+    detener.set()
+    await medidor
+    return segundos, max(atrasos), resultados
+
+
+@pytest.fixture
+def casos(bd):
+    """
+    Por ronda, LLAMADAS pares distintos (médico, fecha) —ninguno sale del cache—
+    con un bloque libre distinto para reservar en cada ronda de cada ruta.
+    """
+    s = _sembrar(bd.cursor())
+    filas = bd.execute("""
+        SELECT id_bloque, medico_id, fecha, n FROM (
+            SELECT id_bloque, medico_id, fecha,
+                   row_number() OVER (PARTITION BY medico_id, fecha ORDER BY hora_inicio) AS n,
+                   dense_rank() OVER (ORDER BY medico_id, fecha) AS par
+            FROM bloques_disponibles
+            WHERE medico_id = ANY(%s) AND estado = 'DISPONIBLE' AND fecha > CURRENT_DATE
+        ) x
+        WHERE par <= %s AND n <= %s
+        ORDER BY n, medico_id, fecha
+    """, (s["medicos"], LLAMADAS, 2 * RONDAS)).fetchall()
+    assert len(filas) == 2 * RONDAS * LLAMADAS
+    return [(id_bloque, medico_id, fecha, f"bench{i}", f"569{i:08d}")
+            for i, (id_bloque, medico_id, fecha, _) in enumerate(filas)]
+
+
+async def test_webhook_200_concurrentes(casos, pool_prueba, pool_sync_prueba):
+    async def webhook_sync(id_bloque, medico_id, fecha, rut, telefono):
+        db_service.consultar_disponibilidad(medico_id, fecha)
+        return db_service.reservar_cita(id_bloque, rut, "Bench", telefono, medico_id)
+
+    async def webhook_async(id_bloque, medico_id, fecha, rut, telefono):
+        await db_service.consultar_disponibilidad_async(medico_id, fecha)
+        return await db_service.reservar_cita_async(id_bloque, rut, "Bench", telefono, medico_id)
+
+    medido = {}
+    for nombre, webhook, desde in (("sync", webhook_sync, 0), ("async", webhook_async, RONDAS * LLAMADAS)):
+        segundos, atrasos = [], []
+        for r in range(RONDAS):
+            db_service.cache_disponibilidad.limpiar()
+            lote = casos[desde + r * LLAMADAS: desde + (r + 1) * LLAMADAS]
+            s, atraso, resultados = await _ronda(webhook, lote)
+            assert all(resultados)
+            segundos.append(s)
+            atrasos.append(atraso)
+        medido[nombre] = (LLAMADAS / min(segundos), max(atrasos))
+        print(f"\n{nombre:>5}: {medido[nombre][0]:,.0f} llamadas/s ({LLAMADAS} concurrentes, mejor de {RONDAS}), "
+              f"event loop bloqueado hasta {medido[nombre][1] * 1000:.0f} ms")
+
+    # Con la ruta síncrona el loop queda tomado mientras dura toda la ráfaga
+    assert medido["async"][1] < medido["sync"][1]
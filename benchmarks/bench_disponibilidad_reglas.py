@@ -0,0 +1,105 @@
+# bench_disponibilidad_reglas.py → MOTOR DE REGLAS vs BLOQUES MATERIALIZADOS (1M+ bloques)
+#
+#   TEST_DATABASE_URL=postgresql://postgres@localhost/agenza_test python -m pytest benchmarks/bench_disponibilidad_reglas.py -s
+#
+# Se generan más de un millón de bloques con generador_bloques y se reserva un
+# cuarto. Luego se compara, para los mismos (médico, fecha), leer los bloques
+# libres ya generados contra calcularlos desde las plantillas; lo mismo para
+# "próxima" en una especialidad. Ambas rutas sin caché, una consulta a la vez.
+
+import random
+import statistics
+import time
+from datetime import date, timedelta
+import pytest
+import db_service
+import disponibilidad_reglas as reglas
+from generador_bloques import generar_bloques_async
+
+MEDICOS = 250
+SEMANAS = 24          # 250 médicos × 36 bloques × 5 días × 24 semanas = 1.080.000
+CONSULTAS = 300
+ESPECIALIDAD = 10     # médicos por búsqueda de "próxima"
+
+
+@pytest.fixture
+async def bloques(bd, pool_prueba):
+    bd.execute("INSERT INTO medicos (nombre, especialidad) SELECT 'Bench ' || i, 'Bench' FROM generate_series(1, %s) i", (MEDICOS,))
+    bd.execute(
+        "INSERT INTO horarios_medicos (medico_id, dia_semana, hora_inicio, hora_fin, duracion_min) "
+        "SELECT m, d, '08:00', '17:00', 15 FROM generate_series(1, %s) m, generate_series(1, 5) d",
+        (MEDICOS,),
+    )
+    inicio = time.perf_counter()
+    creados = await generar_bloques_async(semanas=SEMANAS, desde=date.today())
+    print(f"\nGenerados {creados:,} bloques en {time.perf_counter() - inicio:.1f} s")
+    bd.execute("UPDATE bloques_disponibles SET estado = 'RESERVADO' WHERE id_bloque % 4 = 0")
+    bd.execute("VACUUM ANALYZE bloques_disponibles")
+    return creados
+
+
+async def _mediana(funcion, casos) -> float:
+    tiempos = []
+    for caso in casos:
+        inicio = time.perf_counter()
+        await funcion(*caso)
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+async def _materializados_dia(id_medico, fecha):
+    async with db_service.pool_async.connection() as conn:
+        cur = await conn.execute(db_service.SQL_DISPONIBILIDAD, (id_medico, fecha))
+        return [h for _, h in await cur.fetchall()]
+
+
+async def _reglas_dia(id_medico, fecha):
+    return [b["hora_str"] for b in (await reglas.disponibilidad_rango_async(id_medico, fecha, fecha)).get(fecha, [])]
+
+
+async def test_reglas_vs_materializados(bd, bloques):
+    assert bloques > 1_000_000
+    azar = random.Random(1)
+    dias = [date.today() + timedelta(days=d) for d in range(SEMANAS * 7) if (date.today() + timedelta(days=d)).isoweekday() <= 5]
+    casos = [(azar.randint(1, MEDICOS), azar.choice(dias)) for _ in range(CONSULTAS)]
+
+    # Misma respuesta por ambas rutas
+    for caso in casos[:20]:
+        assert await _materializados_dia(*caso) == await _reglas_dia(*caso)
+
+    dia_bloques = await _mediana(_materializados_dia, casos)
+    dia_reglas = await _mediana(_reglas_dia, casos)
+    print(f"Un día:    materializados p50 {dia_bloques * 1000:6.2f} ms · reglas p50 {dia_reglas * 1000:6.2f} ms ({CONSULTAS} consultas)")
+
+    alcances = [(list(range(m, m + ESPECIALIDAD)),) for m in (azar.randint(1, MEDICOS - ESPECIALIDAD) for _ in range(CONSULTAS))]
+    prox_bloques = await _mediana(db_service.proximos_bloques_async, alcances)
+    prox_reglas = await _mediana(reglas.proximos_reglas_async, alcances)
+    print(f"Próxima:   materializados p50 {prox_bloques * 1000:6.2f} ms · reglas p50 {prox_reglas * 1000:6.2f} ms "
+          f"({ESPECIALIDAD} médicos, {db_service.PROXIMOS_BLOQUES_DIAS} días)")
+
+    total, reservados, tamano = bd.execute(
+        "SELECT count(*), count(*) FILTER (WHERE estado <> 'DISPONIBLE'), pg_total_relation_size('bloques_disponibles') "
+        "FROM bloques_disponibles"
+    ).fetchone()
+    print(f"Filas:     materializados {total:,} ({tamano / 2**20:.0f} MB con índices) · reglas {reservados:,} "
+          f"(solo las tomadas) + {MEDICOS * 5} plantillas")
+
+
+def test_restar_ocupados_numpy_vs_bisect(monkeypatch):
+    np = pytest.importorskip("numpy")
+    azar = random.Random(2)
+    inicios = list(range(0, 1_080_000 * 15, 15))
+    duraciones = [15] * len(inicios)
+    ocupados = [(s, s + 15) for s in azar.sample(inicios, len(inicios) // 4)]
+
+    inicio = time.perf_counter()
+    con_numpy = reglas.restar_ocupados(inicios, duraciones, ocupados)
+    t_numpy = time.perf_counter() - inicio
+    monkeypatch.setattr(reglas, "np", None)
+    inicio = time.perf_counter()
+    con_bisect = reglas.restar_ocupados(inicios, duraciones, ocupados)
+    t_bisect = time.perf_counter() - inicio
+    print(f"\nrestar_ocupados con {len(inicios):,} candidatos: numpy {t_numpy * 1000:.0f} ms · bisect {t_bisect * 1000:.0f} ms")
+
+    assert con_numpy == con_bisect
+    assert len(con_numpy) == len(inicios) - len(ocupados)
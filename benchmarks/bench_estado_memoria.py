@@ -0,0 +1,84 @@
+# bench_estado_memoria.py → BYTES POR CONVERSACIÓN: DICT ANIDADO vs REGISTRO COMPACTO
+#
+#   python -m pytest benchmarks/bench_estado_memoria.py -s
+#
+# Antes cada conversación guardaba las filas completas de la consulta (lista de
+# médicos o de bloques, dicts nuevos por cada respuesta de la BD) y un `date`.
+# Ahora el almacén guarda los bytes de EstadoConversacion: solo IDs y minutos.
+
+import gc
+import time
+import tracemalloc
+from datetime import date
+from estado_conversacion import EstadoConversacion
+from estado_store import MemoriaStore
+
+CONVERSACIONES = 20_000
+MEDICOS = 20
+BLOQUES = 16  # un día de 08:00 a 16:00 cada 30 min
+
+
+def _filas_medicos():
+    return [{"id_medico": i, "nombre": f"Nombre Apellido {i}", "especialidad": "Odontología General"}
+            for i in range(1, MEDICOS + 1)]
+
+
+def _filas_bloques():
+    return [{"id_bloque": 1000 + i, "hora_str": f"{8 + i // 2:02d}:{30 * (i % 2):02d}"} for i in range(BLOQUES)]
+
+
+def _estado_antes(i: int) -> dict:
+    # Mitad eligiendo médico (lista de médicos), mitad eligiendo hora (lista de bloques)
+    if i % 2:
+        return {"estado": "elegir_medico", "medicos": _filas_medicos()}
+    return {"estado": "elegir_hora", "medico_id": 3, "medico_nombre": "Nombre Apellido 3",
+            "fecha": date(2025, 11, 20), "bloques": _filas_bloques()}
+
+
+def _estado_despues(i: int) -> EstadoConversacion:
+    if i % 2:
+        return EstadoConversacion(estado="elegir_medico", version_catalogo=123456789)
+    return EstadoConversacion(estado="elegir_hora", medico_id=3, fecha=date(2025, 11, 20),
+                              bloque_ids=tuple(1000 + b for b in range(BLOQUES)),
+                              horas=tuple(480 + 30 * b for b in range(BLOQUES)))
+
+
+async def _medir(llenar):
+    """Bytes que quedan retenidos tras `llenar()` y lo que devuelve (para seguir usándolo)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        retenido = await llenar()
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0] - base, retenido
+    finally:
+        tracemalloc.stop()
+
+
+async def test_bytes_por_conversacion():
+    async def antes():
+        return {f"569{i:08d}": _estado_antes(i) for i in range(CONVERSACIONES)}
+
+    async def despues():
+        store = MemoriaStore(max_entradas=CONVERSACIONES)
+        for i in range(CONVERSACIONES):
+            await store.set(f"569{i:08d}", _estado_despues(i))
+        return store
+
+    usado_antes, conversaciones = await _medir(antes)
+    del conversaciones
+    usado_despues, store = await _medir(despues)
+    bytes_antes = usado_antes / CONVERSACIONES
+    bytes_despues = usado_despues / CONVERSACIONES
+
+    muestra = range(0, CONVERSACIONES, 7)
+    inicio = time.perf_counter()
+    for i in muestra:
+        await store.get(f"569{i:08d}")
+    lectura_us = (time.perf_counter() - inicio) / len(muestra) * 1e6
+
+    print(f"\n{CONVERSACIONES} conversaciones: antes {bytes_antes:,.0f} B/conv, "
+          f"después {bytes_despues:,.0f} B/conv ({bytes_antes / bytes_despues:.1f}x menos); "
+          f"get + de_bytes {lectura_us:.1f} µs")
+    assert bytes_despues * 3 < bytes_antes
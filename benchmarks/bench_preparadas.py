@@ -0,0 +1,71 @@
+# bench_preparadas.py → TIEMPO POR CONSULTA CALIENTE: SIN PREPARAR vs PREPARADA
+#
+#   TEST_DATABASE_URL=postgresql://postgres@localhost/agenza_test python -m pytest benchmarks/bench_preparadas.py -s
+#
+# Misma conexión, mismos parámetros, local (sin latencia de red): la diferencia
+# es lo que Postgres deja de hacer al no volver a parsear ni planificar.
+
+import statistics
+import time
+from datetime import date, timedelta
+import psycopg
+import db_service
+from migrar import _sembrar
+
+REPETICIONES = 1000
+
+
+def _consultas(s):
+    manana = date.today() + timedelta(days=1)
+    medico = s["medicos"][0]
+    return [
+        ("listar_medicos", db_service.SQL_LISTAR_MEDICOS, None),
+        ("disponibilidad", db_service.SQL_DISPONIBILIDAD, (medico, manana)),
+        ("disponibilidad_lote", db_service.SQL_DISPONIBILIDAD_LOTE, (s["medicos"][:4], [manana] * 4)),
+        ("proximos_bloques", db_service.SQL_PROXIMOS_BLOQUES,
+         db_service._params_proximos(s["medicos"][:5], 5, None, db_service.PROXIMOS_BLOQUES_DIAS)),
+        ("citas_paciente", db_service.SQL_CITAS_PACIENTE, (s["rut"], s["telefono"], 10)),
+    ]
+
+
+def _tiempos(conn, sql, params) -> float:
+    inicio = time.perf_counter()
+    with conn.cursor() as cur:
+        db_service._ejecutar(cur, sql, params)
+        cur.fetchall()
+    return time.perf_counter() - inicio
+
+
+def test_preparadas_vs_sin_preparar(bd, monkeypatch):
+    """
+    Dos conexiones, una sin preparar y otra preparada, alternadas en cada
+    repetición para que el ruido de la máquina afecte igual a ambas. Al tiempo
+    de cada consulta se le resta el de un `SELECT 1` (viaje + cliente) y queda
+    aproximadamente lo que trabajó el servidor.
+    """
+    s = _sembrar(bd.cursor())
+    dsn = bd.info.dsn
+    conexiones = {p: psycopg.connect(dsn, **db_service.CONFIG_POOL["kwargs"]) for p in (False, True)}
+    try:
+        base = statistics.median(_tiempos(conexiones[False], "SELECT 1", None) for _ in range(REPETICIONES))
+        totales = {False: 0.0, True: 0.0}
+        print(f"\n{'':>20}  servidor ≈ mediana − SELECT 1 ({base * 1e6:.0f} µs), {REPETICIONES} repeticiones")
+        for nombre, sql, params in _consultas(s):
+            tiempos = {False: [], True: []}
+            for i in range(REPETICIONES + 20):
+                for preparar in (False, True):
+                    monkeypatch.setattr(db_service, "_preparadas_activas", preparar)
+                    t = _tiempos(conexiones[preparar], sql, params)
+                    if i >= 20:  # las primeras calientan cache y preparan
+                        tiempos[preparar].append(t)
+            servidor = {p: max(0.0, statistics.median(t) - base) * 1e6 for p, t in tiempos.items()}
+            for p in servidor:
+                totales[p] += servidor[p]
+            print(f"{nombre:>20}: sin preparar {servidor[False]:7.1f} µs · preparada {servidor[True]:7.1f} µs")
+        print(f"{'total':>20}: sin preparar {totales[False]:7.1f} µs · preparada {totales[True]:7.1f} µs "
+              f"({totales[False] / totales[True]:.2f}x)")
+    finally:
+        for conn in conexiones.values():
+            conn.close()
+
+    assert totales[True] < totales[False]
@@ -0,0 +1,64 @@
+# bench_reserva.py → LATENCIA DE UNA RESERVA: UN VIAJE (CTE) vs TRES PASOS
+#
+#   TEST_DATABASE_URL=postgresql://postgres@localhost/agenza_test python -m pytest benchmarks/bench_reserva.py -s
+#
+# Tres pasos son cuatro viajes de red (3 sentencias + COMMIT); la CTE es uno.
+# Se mide sin latencia agregada y a través de ProxyLatencia con un RTT
+# parecido al de Railway → Neon en la misma región.
+
+import statistics
+import time
+import psycopg
+import pytest
+import db_service
+from migrar import _sembrar
+from proxy_latencia import ProxyLatencia
+
+RESERVAS = 60
+RTTS = (0.0, 0.005, 0.02)
+
+
+@pytest.fixture
+def bloques(bd):
+    s = _sembrar(bd.cursor())
+    filas = bd.execute(
+        "SELECT id_bloque, medico_id FROM bloques_disponibles "
+        "WHERE medico_id = ANY(%s) AND estado = 'DISPONIBLE' AND fecha >= CURRENT_DATE ORDER BY id_bloque LIMIT %s",
+        (s["medicos"], 2 * RESERVAS * len(RTTS)),
+    ).fetchall()
+    assert len(filas) == 2 * RESERVAS * len(RTTS)
+    return filas
+
+
+async def _medir(url: str, reservar, bloques) -> list:
+    latencias = []
+    async with await psycopg.AsyncConnection.connect(url, **db_service.CONFIG_POOL["kwargs"]) as conn:
+        for i, (id_bloque, medico_id) in enumerate(bloques):
+            inicio = time.perf_counter()
+            fecha = await reservar(conn, id_bloque, f"bench{id_bloque}", "Bench", f"569{i:08d}", medico_id)
+            latencias.append(time.perf_counter() - inicio)
+            assert fecha is not None
+    return latencias
+
+
+async def test_latencia_reserva(bd_migrada, bloques):
+    rutas = (("un viaje", db_service._reservar_un_viaje_async), ("tres pasos", db_service._reservar_tres_pasos_async))
+    pendientes = iter(bloques)
+    medianas = {}
+    for rtt in RTTS:
+        proxy = ProxyLatencia(bd_migrada, rtt)
+        url = await proxy.iniciar()
+        try:
+            for nombre, reservar in rutas:
+                lote = [next(pendientes) for _ in range(RESERVAS)]
+                latencias = await _medir(url, reservar, lote)
+                medianas[(rtt, nombre)] = statistics.median(latencias)
+                p95 = statistics.quantiles(latencias, n=20)[-1]
+                print(f"\nRTT {rtt * 1000:4.0f} ms · {nombre:>10}: p50 {medianas[(rtt, nombre)] * 1000:6.2f} ms, "
+                      f"p95 {p95 * 1000:6.2f} ms ({RESERVAS} reservas)")
+        finally:
+            await proxy.detener()
+
+    rtt = RTTS[-1]
+    # Cuatro viajes contra uno: con latencia de red la CTE gana por mucho
+    assert medianas[(rtt, "un viaje")] * 2 < medianas[(rtt, "tres pasos")]
@@ -0,0 +1,61 @@
+# proxy_latencia.py → PROXY TCP QUE AGREGA LATENCIA DE RED HACIA POSTGRES
+#
+# Contra un Postgres local cada viaje cuesta microsegundos; entre Railway y
+# Neon, milisegundos. El proxy retrasa cada paquete `rtt / 2` en cada sentido
+# para que los benchmarks midan lo que cuesta cada viaje de red.
+
+import asyncio
+from typing import Optional
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+
+
+class ProxyLatencia:
+
+    def __init__(self, url: str, rtt: float):
+        self.url = url
+        self.rtt = rtt
+        self._server: Optional[asyncio.AbstractServer] = None
+        destino = conninfo_to_dict(url)
+        self._host = destino.get("host") or "localhost"
+        self._puerto = int(destino.get("port") or 5432)
+
+    async def _conectar_destino(self):
+        if self._host.startswith("/"):
+            return await asyncio.open_unix_connection(f"{self._host}/.s.PGSQL.{self._puerto}")
+        return await asyncio.open_connection(self._host, self._puerto)
+
+    async def _copiar(self, origen: asyncio.StreamReader, destino: asyncio.StreamWriter):
+        # Cada paquete sale `rtt / 2` después de llegar, sin frenar a los que vienen detrás
+        cola: asyncio.Queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+
+        async def entregar():
+            while (item := await cola.get()) is not None:
+                sale, datos = item
+                await asyncio.sleep(max(0.0, sale - loop.time()))
+                destino.write(datos)
+                await destino.drain()
+            destino.close()
+
+        entrega = asyncio.create_task(entregar())
+        try:
+            while datos := await origen.read(65536):
+                cola.put_nowait((loop.time() + self.rtt / 2, datos))
+        finally:
+            cola.put_nowait(None)
+            await entrega
+
+    async def _atender(self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        lector_bd, escritor_bd = await self._conectar_destino()
+        await asyncio.gather(self._copiar(lector, escritor_bd), self._copiar(lector_bd, escritor),
+                             return_exceptions=True)
+
+    async def iniciar(self) -> str:
+        """Abre el proxy y devuelve la URL que pasa por él."""
+        self._server = await asyncio.start_server(self._atender, "127.0.0.1", 0)
+        puerto = self._server.sockets[0].getsockname()[1]
+        return make_conninfo(self.url, host="127.0.0.1", port=puerto, sslmode="disable")
+
+    async def detener(self):
+        self._server.close()
+        await self._server.wait_closed()
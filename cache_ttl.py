@@ -0,0 +1,145 @@
+# cache_ttl.py → CACHE TTL CON PROTECCIÓN ANTI-ESTAMPIDA (una carga por clave)
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Vuelo:
+    """Carga en curso de una clave: los que llegan mientras tanto esperan su resultado."""
+    __slots__ = ("evento", "valor", "error")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class CacheTTL:
+    """
+    Cache en memoria con TTL y tope de entradas (LRU).
+    Ráfagas de la misma clave producen una sola carga. Invalidar una clave
+    también descarta la carga en curso: su resultado ya no se guarda y los
+    que lleguen después cargan de nuevo, así nunca se cachea un dato previo
+    a la invalidación.
+    """
+
+    def __init__(self, ttl: float, max_entradas: int = 10000):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._datos: "OrderedDict[Hashable, tuple]" = OrderedDict()  # clave → (expira, valor)
+        self._vuelos: Dict[Hashable, _Vuelo] = {}
+        self._vuelos_async: Dict[Hashable, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalescidas": 0, "invalidaciones": 0}
+
+    def obtener(self, clave: Hashable, cargar: Callable[[], Any]) -> Any:
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is not None and item[0] > time.monotonic():
+                self._datos.move_to_end(clave)
+                self._stats["hits"] += 1
+                return item[1]
+            vuelo = self._vuelos.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._vuelos[clave] = _Vuelo()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalescidas"] += 1
+
+        if not lider:
+            vuelo.evento.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.valor
+
+        try:
+            vuelo.valor = cargar()
+        except BaseException as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._vuelos.get(clave) is vuelo:
+                    del self._vuelos[clave]
+                    if vuelo.error is None:
+                        self._guardar(clave, vuelo.valor)
+            vuelo.evento.set()
+        return vuelo.valor
+
+    async def obtener_async(self, clave: Hashable, cargar: Callable[[], Awaitable[Any]]) -> Any:
+        """Igual que obtener() pero sin bloquear el event loop mientras se carga."""
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is not None and item[0] > time.monotonic():
+                self._datos.move_to_end(clave)
+                self._stats["hits"] += 1
+                return item[1]
+            vuelo = self._vuelos_async.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._vuelos_async[clave] = asyncio.get_running_loop().create_future()
+                vuelo.add_done_callback(lambda f: f.cancelled() or f.exception())
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalescidas"] += 1
+
+        if not lider:
+            return await asyncio.shield(vuelo)
+
+        try:
+            valor = await cargar()
+        except BaseException as e:
+            with self._lock:
+                if self._vuelos_async.get(clave) is vuelo:
+                    del self._vuelos_async[clave]
+            if isinstance(e, asyncio.CancelledError):
+                vuelo.cancel()
+            else:
+                vuelo.set_exception(e)
+            raise
+        with self._lock:
+            if self._vuelos_async.get(clave) is vuelo:
+                del self._vuelos_async[clave]
+                self._guardar(clave, valor)
+        vuelo.set_result(valor)
+        return valor
+
+    def poner(self, clave: Hashable, valor: Any):
+        with self._lock:
+            self._guardar(clave, valor)
+
+    def invalidar(self, clave: Hashable):
+        with self._lock:
+            self._datos.pop(clave, None)
+            self._vuelos.pop(clave, None)
+            self._vuelos_async.pop(clave, None)
+            self._stats["invalidaciones"] += 1
+
+    def invalidar_si(self, predicado: Callable[[Hashable], bool]):
+        with self._lock:
+            for clave in [c for c in self._datos if predicado(c)]:
+                del self._datos[clave]
+            for clave in [c for c in self._vuelos if predicado(c)]:
+                del self._vuelos[clave]
+            for clave in [c for c in self._vuelos_async if predicado(c)]:
+                del self._vuelos_async[clave]
+            self._stats["invalidaciones"] += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._vuelos.clear()
+            self._vuelos_async.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {**self._stats, "entradas": len(self._datos)}
+
+    def _guardar(self, clave: Hashable, valor: Any):
+        self._datos[clave] = (time.monotonic() + self.ttl, valor)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.max_entradas:
+            self._datos.popitem(last=False)
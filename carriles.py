@@ -0,0 +1,105 @@
+# carriles.py → EJECUTOR POR CLAVE (un carril serializado por teléfono)
+
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+from loguru import logger
+
+Trabajo = Tuple[Callable[..., Awaitable[Any]], tuple, Optional[asyncio.Future]]
+
+
+class _Carril:
+    __slots__ = ("pendientes", "tarea")
+
+    def __init__(self):
+        self.pendientes: Deque[Trabajo] = deque()
+        self.tarea: Optional[asyncio.Task] = None
+
+
+class CarrilesPorClave:
+    """
+    Un carril lógico por clave: los trabajos de una misma clave se ejecutan
+    en orden y de a uno; carriles distintos corren en paralelo (hasta
+    max_paralelo a la vez). Un carril sin trabajos se elimina solo.
+    Al cancelar, los trabajos de enviar() que no alcanzaron a correr se
+    entregan a al_descartar(fn, args) para que el llamador libere lo suyo.
+    """
+
+    def __init__(self, max_paralelo: int, al_descartar: Optional[Callable[[Callable, tuple], None]] = None):
+        self.al_descartar = al_descartar
+        self._carriles: Dict[str, _Carril] = {}
+        self._sem = asyncio.Semaphore(max(1, max_paralelo))
+        self._tareas: Set[asyncio.Task] = set()
+
+    def activos(self) -> int:
+        return len(self._carriles)
+
+    def enviar(self, clave: str, fn: Callable[..., Awaitable[Any]], *args):
+        """Encola fn(*args) en el carril de `clave` sin esperar el resultado."""
+        self._agregar(clave, (fn, args, None))
+
+    async def ejecutar(self, clave: str, fn: Callable[..., Awaitable[Any]], *args):
+        """Encola fn(*args) en el carril de `clave` y espera su resultado."""
+        fut = asyncio.get_running_loop().create_future()
+        self._agregar(clave, (fn, args, fut))
+        return await fut
+
+    async def cancelar(self):
+        for t in list(self._tareas):
+            t.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        # Una tarea cancelada antes de su primer paso no alcanza a correr su finally
+        for carril in self._carriles.values():
+            for trabajo in carril.pendientes:
+                self._descartar(trabajo)
+        self._carriles.clear()
+
+    def _agregar(self, clave: str, trabajo: Trabajo):
+        carril = self._carriles.get(clave)
+        if carril is None:
+            carril = self._carriles[clave] = _Carril()
+        carril.pendientes.append(trabajo)
+        if carril.tarea is None:
+            carril.tarea = asyncio.create_task(self._drenar(clave, carril))
+            self._tareas.add(carril.tarea)
+            carril.tarea.add_done_callback(self._tareas.discard)
+
+    async def _drenar(self, clave: str, carril: _Carril):
+        try:
+            while carril.pendientes:
+                trabajo = carril.pendientes.popleft()
+                fn, args, fut = trabajo
+                iniciado = False
+                try:
+                    async with self._sem:
+                        iniciado = True
+                        resultado = await fn(*args)
+                except Exception as e:
+                    if fut is None:
+                        logger.exception(f"Error en carril {clave}: {e}")
+                    elif not fut.done():
+                        fut.set_exception(e)
+                except BaseException:
+                    # Carril cancelado (apagado): nadie queda esperando este trabajo
+                    if not iniciado:
+                        carril.pendientes.appendleft(trabajo)  # lo descarta el finally
+                    elif fut is not None and not fut.done():
+                        fut.cancel()
+                    raise
+                else:
+                    if fut is not None and not fut.done():
+                        fut.set_result(resultado)
+        finally:
+            # Sin await entre el último popleft y aquí: nadie pudo encolar en medio
+            for trabajo in carril.pendientes:
+                self._descartar(trabajo)
+            carril.pendientes.clear()
+            self._carriles.pop(clave, None)
+
+    def _descartar(self, trabajo: Trabajo):
+        fn, args, fut = trabajo
+        if fut is not None:
+            if not fut.done():
+                fut.cancel()
+        elif self.al_descartar is not None:
+            self.al_descartar(fn, args)
@@ -0,0 +1,127 @@
+# catalogo.py → CACHE DEL CATÁLOGO DE MÉDICOS (TTL + invalidación + LISTEN/NOTIFY)
+
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from cache_ttl import CacheTTL
+from db_service import obtener_lista_medicos_async, DATABASE_URL
+
+# ==============================================================
+# CONFIG
+# ==============================================================
+
+CATALOGO_TTL = float(os.getenv("CATALOGO_TTL", "600"))
+CATALOGO_LISTEN = os.getenv("CATALOGO_LISTEN", "0") == "1"
+# LISTEN no funciona a través del pooler de Neon: usar la URL directa si existe
+CATALOGO_LISTEN_URL = os.getenv("CATALOGO_LISTEN_URL") or DATABASE_URL
+CANAL_CATALOGO = "catalogo_medicos"
+MAX_SNAPSHOTS = 8
+CLAVE = "medicos"
+
+Medicos = Tuple[Dict[str, Any], ...]
+
+# version → tupla inmutable de médicos; la misma lista en todos los procesos da la misma versión
+_snapshots: "OrderedDict[int, Medicos]" = OrderedDict()
+_cache = CacheTTL(ttl=CATALOGO_TTL, max_entradas=1)   # CLAVE → versión vigente
+_stats = {"recargas": 0, "notificaciones": 0}
+
+# ==============================================================
+# SNAPSHOTS
+# ==============================================================
+
+def version_de(medicos: List[Dict[str, Any]]) -> int:
+    contenido = json.dumps([(m["id_medico"], m["nombre"], m["especialidad"]) for m in medicos])
+    return zlib.crc32(contenido.encode())
+
+def registrar(medicos: List[Dict[str, Any]]) -> int:
+    """Guarda la lista como snapshot y devuelve su versión."""
+    version = version_de(medicos)
+    if version not in _snapshots:
+        _snapshots[version] = tuple(medicos)
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    _snapshots.move_to_end(version)
+    return version
+
+def snapshot(version: int) -> Optional[Medicos]:
+    return _snapshots.get(version)
+
+def medico_por_id(medico_id: int) -> Optional[Dict[str, Any]]:
+    for medicos in reversed(_snapshots.values()):
+        for m in medicos:
+            if m["id_medico"] == medico_id:
+                return m
+    return None
+
+# ==============================================================
+# CACHE CON TTL
+# ==============================================================
+
+class _CatalogoVacio(Exception):
+    """Error de BD o tabla vacía: no se cachea."""
+
+async def _cargar_async() -> int:
+    medicos = await obtener_lista_medicos_async()
+    if not medicos:
+        raise _CatalogoVacio()
+    _stats["recargas"] += 1
+    return registrar(medicos)
+
+async def obtener_medicos_async() -> Tuple[int, Medicos]:
+    """(versión, médicos) vigentes; solo va a la BD si expiró el TTL o hubo invalidación."""
+    try:
+        version = await _cache.obtener_async(CLAVE, _cargar_async)
+    except _CatalogoVacio:
+        return 0, ()
+    return version, _snapshots[version]
+
+async def medicos_de_version_async(version: int) -> Optional[Medicos]:
+    """Lista que vio el paciente; None si el catálogo cambió desde entonces."""
+    medicos = snapshot(version)
+    if medicos is None and (await obtener_medicos_async())[0] == version:
+        medicos = snapshot(version)
+    return medicos
+
+def invalidar():
+    """Hook explícito: la próxima lectura recarga desde la BD."""
+    _cache.invalidar(CLAVE)
+
+def estadisticas() -> Dict[str, Any]:
+    return {**_cache.estadisticas(), **_stats, "snapshots": len(_snapshots)}
+
+# ==============================================================
+# REFRESCO POR LISTEN/NOTIFY
+# ==============================================================
+# Requiere en la BD un trigger que haga NOTIFY catalogo_medicos al
+# modificar la tabla medicos.
+
+_detener = threading.Event()
+
+def _escuchar():
+    import psycopg
+    while not _detener.is_set():
+        try:
+            with psycopg.connect(CATALOGO_LISTEN_URL, autocommit=True, connect_timeout=15) as conn:
+                conn.execute(f"LISTEN {CANAL_CATALOGO}")
+                logger.info(f"Escuchando NOTIFY {CANAL_CATALOGO}")
+                invalidar()  # pudo cambiar mientras no escuchábamos
+                while not _detener.is_set():
+                    for _ in conn.notifies(timeout=5.0):
+                        _stats["notificaciones"] += 1
+                        invalidar()
+        except Exception as e:
+            logger.error(f"Error LISTEN {CANAL_CATALOGO}: {e}")
+            _detener.wait(10)
+
+def iniciar_escucha():
+    if not CATALOGO_LISTEN:
+        return
+    _detener.clear()
+    threading.Thread(target=_escuchar, name="catalogo-listen", daemon=True).start()
+
+def detener_escucha():
+    _detener.set()
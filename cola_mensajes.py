@@ -0,0 +1,90 @@
+# cola_mensajes.py → COLA DE TRABAJO EN PROCESO PARA EL WEBHOOK
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+from loguru import logger
+from carriles import CarrilesPorClave
+
+# ==============================================================
+# CONFIG
+# ==============================================================
+
+COLA_WORKERS = int(os.getenv("COLA_WORKERS", "8"))
+COLA_MAX_MENSAJES = int(os.getenv("COLA_MAX_MENSAJES", "5000"))
+COLA_TIMEOUT_ENCOLAR = float(os.getenv("COLA_TIMEOUT_ENCOLAR", "0.5"))
+
+
+class ColaLlena(Exception):
+    """La cola no aceptó el mensaje a tiempo (backpressure hacia YCloud)."""
+
+
+class ColaMensajes:
+    """
+    Cola acotada de mensajes entrantes drenada por hasta `workers` tareas.
+    Cada teléfono tiene su propio carril (CarrilesPorClave): los mensajes de
+    un paciente se procesan en orden y nunca en paralelo entre sí, mientras
+    que pacientes distintos avanzan en paralelo.
+    """
+
+    def __init__(self, procesar: Callable[[Dict[str, Any]], Awaitable[None]],
+                 workers: int = COLA_WORKERS, max_mensajes: int = COLA_MAX_MENSAJES):
+        self.procesar = procesar
+        self.workers = max(1, workers)
+        self.max_mensajes = max(1, max_mensajes)
+        self._carriles: Optional[CarrilesPorClave] = None
+        self._cupos: Optional[asyncio.Semaphore] = None
+        self._pendientes = 0
+        self._vacia: Optional[asyncio.Event] = None
+
+    async def iniciar(self):
+        self._carriles = CarrilesPorClave(self.workers, al_descartar=self._descartado)
+        self._cupos = asyncio.Semaphore(self.max_mensajes)
+        self._vacia = asyncio.Event()
+        self._vacia.set()
+        logger.info(f"Cola de mensajes iniciada ({self.workers} workers, máx {self.max_mensajes} pendientes)")
+
+    async def detener(self, timeout: float = 10.0):
+        """Espera a que se drene lo pendiente (hasta timeout) y cancela los carriles."""
+        try:
+            await asyncio.wait_for(self._vacia.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Cola de mensajes detenida con {self._pendientes} mensajes pendientes")
+        await self._carriles.cancelar()
+
+    async def encolar(self, msg: Dict[str, Any], timeout: Optional[float] = COLA_TIMEOUT_ENCOLAR):
+        if self._cupos.locked():
+            try:
+                await asyncio.wait_for(self._cupos.acquire(), timeout)
+            except asyncio.TimeoutError:
+                raise ColaLlena(f"Cola llena para {msg['from']}")
+        else:
+            await self._cupos.acquire()
+        self._pendientes += 1
+        self._vacia.clear()
+        self._carriles.enviar(msg["from"], self._procesar, msg)
+
+    def pendientes(self) -> int:
+        return self._pendientes
+
+    def carriles_activos(self) -> int:
+        return self._carriles.activos() if self._carriles else 0
+
+    async def _procesar(self, msg: Dict[str, Any]):
+        try:
+            await self.procesar(msg)
+        except Exception as e:
+            logger.exception(f"Error procesando mensaje de {msg.get('from')}: {e}")
+        finally:
+            self._liberar()
+
+    def _descartado(self, fn, args):
+        # Encolado pero nunca procesado (la cola se detuvo antes)
+        logger.warning(f"Mensaje de {args[0].get('from')} descartado al detener la cola")
+        self._liberar()
+
+    def _liberar(self):
+        self._pendientes -= 1
+        self._cupos.release()
+        if self._pendientes == 0:
+            self._vacia.set()
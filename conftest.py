@@ -0,0 +1,74 @@
+# conftest.py → CONFIGURACIÓN COMÚN DE LAS PRUEBAS
+#
+#   pip install -r requirements-dev.txt
+#   python -m pytest                    pruebas (las de BD se saltan sin TEST_DATABASE_URL)
+#   python -m pytest benchmarks -s      benchmarks (imprimen sus mediciones)
+#
+# Pruebas y benchmarks contra Postgres: TEST_DATABASE_URL apunta a una base
+# desechable, p. ej. postgresql://postgres@localhost/agenza_test. Se migra al
+# empezar y se vacía antes de cada prueba que la usa.
+
+import os
+import sys
+import pytest
+import pytest_asyncio
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+# db_service exige una URL al importarse; sin base de prueba basta una que nunca
+# se usa. SUPABASE_URI y MIGRACIONES_URL tienen prioridad en la app: se quitan
+# para no apuntar por accidente a otra base.
+os.environ.pop("SUPABASE_URI", None)
+os.environ.pop("MIGRACIONES_URL", None)
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL or "postgresql://localhost/agenza_sin_bd"
+os.environ["PROGRAMADOR_ACTIVO"] = "0"
+
+from loguru import logger
+
+logger.remove()
+logger.add(sys.stderr, level=os.getenv("TEST_LOG_NIVEL", "WARNING"))
+
+TABLAS = "recordatorios_enviados, citas_agendadas, bloques_disponibles, pacientes, horarios_medicos, feriados, medicos"
+
+
+@pytest.fixture(scope="session")
+def bd_migrada():
+    """URL de la base de prueba con todas las migraciones aplicadas."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("Sin TEST_DATABASE_URL")
+    import migrar
+    migrar.migrar()
+    return TEST_DATABASE_URL
+
+
+@pytest_asyncio.fixture(scope="session")
+async def pool_prueba(bd_migrada):
+    """Pool asíncrono de db_service abierto contra la base de prueba (uno por sesión: no se reabre)."""
+    import db_service
+    await db_service.abrir_pool_async()
+    try:
+        yield db_service.pool_async
+    finally:
+        await db_service.cerrar_pool_async()
+
+
+@pytest.fixture(scope="session")
+def pool_sync_prueba(bd_migrada):
+    import db_service
+    db_service.abrir_pool()
+    try:
+        yield db_service.pool
+    finally:
+        db_service.cerrar_pool()
+
+
+@pytest.fixture
+def bd(bd_migrada):
+    """Conexión autocommit a la base de prueba vacía (y caches de db_service limpios)."""
+    import psycopg
+    import db_service
+    with psycopg.connect(bd_migrada, autocommit=True) as conn:
+        conn.execute(f"TRUNCATE {TABLAS} RESTART IDENTITY CASCADE")
+        db_service.cache_disponibilidad.limpiar()
+        db_service.cache_citas_paciente.limpiar()
+        yield conn
@@ -1,62 +1,84 @@
-# cron_reminders.py
+# cron_reminders.py → RECORDATORIOS DEL DÍA ANTERIOR (despacho concurrente, idempotente)
+import asyncio
 import os
-# ¡Añadir 'datetime' a las importaciones de la librería 'datetime'!
-from datetime import date, timedelta, datetime 
-from db_service import obtener_citas_manana
+import socket
+from datetime import date, timedelta
+from loguru import logger
+from db_service import (
+    abrir_pool_async, cerrar_pool_async, obtener_lotes_citas_async,
+    reclamar_recordatorios_async, marcar_recordatorios_async,
+)
+from despachador import Despachador, ResumenEnvio
+from ycloud_client import YCloudClient
 
-# --- FUNCIÓN DE SIMULACIÓN DE ENVÍO ---
-def send_whatsapp_reminder(recipient_number, message_text):
+TIPO_RECORDATORIO = "DIA_ANTES"
+# Identifica a esta ejecución en el registro (varias pueden correr a la vez)
+INSTANCIA = f"{socket.gethostname()}:{os.getpid()}"
+
+# --- CONSTRUCCIÓN DEL MENSAJE ---
+def construir_recordatorio(cita, fecha: date) -> str:
+    return (
+        f"¡Hola {cita['nombre_completo']}! 👋\n"
+        f"Te recordamos tu cita con el Dr. {cita['medico']} mañana {fecha.strftime('%d-%m-%Y')} "
+        f"a las {cita['hora_inicio']}. Por favor, sé puntual. ¡Te esperamos!"
+    )
+
+# --- FUNCIÓN PRINCIPAL DEL CRON JOB ---
+async def run_reminder_job_async(cliente: YCloudClient):
     """
-    Función que simula el envío real del recordatorio.
-    En un entorno de producción, esta función llamaría a la API de tu BSP.
+    Busca las citas de mañana y envía los recordatorios en paralelo (con límite de tasa).
+    Usa el pool asíncrono y el cliente recibido: dentro de la app son los compartidos.
+    Cada cita se reclama en recordatorios_enviados antes de enviarse: re-ejecutar el
+    job o correr varios a la vez nunca duplica un envío, solo completa lo pendiente.
     """
-    print(f"--- [RECORDATORIO ENVIADO] ---")
-    print(f"A: {recipient_number}")
-    print(f"Mensaje: {message_text}\n")
-    # Aquí iría el código real para la API de WhatsApp/BSP (ej. 360Dialog)
+    # 1. Obtener la fecha de mañana
+    manana = date.today() + timedelta(days=1)
 
-# --- FUNCIÓN PRINCIPAL DEL CRON JOB ---
-# cron_reminders.py (Fragmento corregido)
-# ...
+    logger.info(f"Recordatorios: buscando citas CONFIRMADAS para {manana.strftime('%Y-%m-%d')}")
+
+    despachador = Despachador(cliente)
+    resumen = ResumenEnvio()
+    ya_enviadas = 0
+
+    # Cada recordatorio queda ENVIADO/FALLIDO apenas termina su envío: si el job
+    # se cae a mitad de un lote, solo los que estaban en vuelo quedan en ENVIANDO
+    async def marcar(id_cita: int, ok: bool):
+        await marcar_recordatorios_async(TIPO_RECORDATORIO, INSTANCIA, [id_cita] if ok else [], [] if ok else [id_cita])
+
+    # 2. Citas en streaming, por lotes → reclamar → 3. despacho concurrente
+    async for lote in obtener_lotes_citas_async(manana):
+        reclamadas = await reclamar_recordatorios_async([c['id_cita'] for c in lote], TIPO_RECORDATORIO, INSTANCIA)
+        ya_enviadas += len(lote) - len(reclamadas)
+        if not reclamadas:
+            continue
+
+        async def mensajes():
+            for cita in lote:
+                if cita['id_cita'] in reclamadas:
+                    yield cita['id_cita'], cita['telefono_wsp'], construir_recordatorio(cita, manana)
+
+        await despachador.despachar(mensajes(), resumen, marcar)
+
+    if not (resumen.enviados or resumen.fallidos or ya_enviadas):
+        logger.info("Recordatorios: no hay citas para mañana")
+        return resumen
+
+    logger.success(f"Recordatorios terminados: {resumen.como_dict()} | omitidas (ya reclamadas): {ya_enviadas}")
+    return resumen
 
-# --- FUNCIÓN PRINCIPAL DEL CRON JOB ---
 def run_reminder_job():
-    """Ejecuta la tarea de buscar citas y enviar recordatorios."""
-    # datetime.now() ya no dará error
-    print(f"--- INICIANDO TRABAJO DE RECORDATORIO: {datetime.now()} ---") 
-    
-       # 1. Obtener la fecha de mañana
-    manana = date.today() + timedelta(days=1)
-    
-    print(f"Buscando citas CONFIRMADAS para la fecha: {manana.strftime('%Y-%m-%d')}")
-    
-    # 2. Obtener citas de la BD
-    citas_manana = obtener_citas_manana()
-    
-    if not citas_manana:
-        print("No se encontraron citas para mañana. Finalizando.")
-        return
-
-    print(f"Se encontraron {len(citas_manana)} citas. Enviando recordatorios.")
-    
-    # 3. Enviar recordatorios
-    for cita in citas_manana:
-        nombre = cita['nombre_completo']
-        telefono = cita['telefono_wsp']
-        medico = cita['medico']
-        hora = cita['hora_inicio']
-        
-        # Construir el mensaje
-        mensaje = (
-            f"¡Hola {nombre}! 👋\n"
-            f"Te recordamos tu cita con el Dr. {medico} mañana {manana.strftime('%d-%m-%Y')} "
-            f"a las {hora}. Por favor, sé puntual. ¡Te esperamos!"
-        )
-        
-        send_whatsapp_reminder(telefono, mensaje)
-        
-    print("--- TRABAJO DE RECORDATORIO FINALIZADO ---")
+    """Ejecución manual como script: abre su propio pool y cliente YCloud."""
+    async def _run():
+        cliente = YCloudClient(os.getenv("YCLOUD_API_KEY"), os.getenv("YCLOUD_PHONE_ID"))
+        await abrir_pool_async()
+        await cliente.abrir()
+        try:
+            return await run_reminder_job_async(cliente)
+        finally:
+            await cliente.cerrar()
+            await cerrar_pool_async()
+    return asyncio.run(_run())
 
 if __name__ == "__main__":
-    # Ejecutar el script
-    run_reminder_job()
\ No newline at end of file
+    # En producción el job corre dentro de la app (programador.py); esto es para correrlo a mano
+    run_reminder_job()
@@ -1,12 +1,16 @@
 # db_service.py → NEON FIX FINAL 2025 (Railway + Neon + psycopg3)
 
 import os
-from psycopg_pool import ConnectionPool
+import psycopg
+from psycopg_pool import ConnectionPool, AsyncConnectionPool, PoolClosed
 from psycopg.rows import dict_row
-from contextlib import contextmanager
-from datetime import date
-from typing import List, Dict, Any
+from psycopg.pq import TransactionStatus
+from contextlib import contextmanager, asynccontextmanager
+from datetime import date, timedelta
+from typing import List, Dict, Any, AsyncIterator, Optional
 from loguru import logger
+from cache_ttl import CacheTTL
+from loteador import Loteador
 
 # ==============================================================
 # CONEXIÓN NEON (IPv4 PURO - SIN ERRORES IPv6)
@@ -17,103 +21,607 @@ DATABASE_URL = os.getenv("SUPABASE_URI") or os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("ERROR CRÍTICO: Falta SUPABASE_URI o DATABASE_URL en las variables de entorno de Railway")
 
-pool = ConnectionPool(
+# Tamaño y reciclaje de conexiones configurables desde Railway
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))  # recicla cada 30 min
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))           # Neon corta las inactivas
+DB_POOL_WARMUP_TIMEOUT = float(os.getenv("DB_POOL_WARMUP_TIMEOUT", "60"))
+
+CONFIG_POOL = dict(
     conninfo=DATABASE_URL,
-    min_size=2,
-    max_size=20,
-    timeout=30.0,
+    min_size=DB_POOL_MIN,
+    max_size=DB_POOL_MAX,
+    timeout=DB_POOL_TIMEOUT,
+    max_lifetime=DB_POOL_MAX_LIFETIME,
+    max_idle=DB_POOL_MAX_IDLE,
     kwargs={
         "connect_timeout": 15,
-    }
+        # Sin preparación automática por repetición: solo se preparan las
+        # sentencias registradas con preparada() (ver más abajo). No vale None:
+        # con None psycopg ignora también prepare=True y no prepara ninguna
+        "prepare_threshold": 2**31 - 1,
+    },
+    open=False,
 )
 
+# Sin check al entregar cada conexión (sería un viaje extra por consulta):
+# max_idle descarta las que Neon pudo cortar por inactividad y max_lifetime
+# recicla el resto; una conexión rota igual se detecta y reemplaza al fallar.
+
+# Pool síncrono: scripts y benchmarks (llamar abrir_pool() antes de usarlo)
+pool = ConnectionPool(name="agenza-sync", **CONFIG_POOL)
+
+# Pool asíncrono: webhook (se abre en el lifespan de FastAPI)
+pool_async = AsyncConnectionPool(name="agenza-async", **CONFIG_POOL)
+
+def abrir_pool():
+    """Abre el pool síncrono y espera min_size conexiones listas (TLS ya pagado)."""
+    pool.open(wait=True, timeout=DB_POOL_WARMUP_TIMEOUT)
+    logger.info(f"Pool síncrono listo ({DB_POOL_MIN}-{DB_POOL_MAX} conexiones)")
+
+def cerrar_pool():
+    pool.close()
+
+async def abrir_pool_async():
+    await pool_async.open(wait=True, timeout=DB_POOL_WARMUP_TIMEOUT)
+    logger.info(f"Pool asíncrono listo ({DB_POOL_MIN}-{DB_POOL_MAX} conexiones)")
+
+async def cerrar_pool_async():
+    await pool_async.close()
+
+def estadisticas_pool() -> Dict[str, Any]:
+    return {
+        "async": pool_async.get_stats() if not pool_async.closed else None,
+        "sync": pool.get_stats() if not pool.closed else None,
+        "preparadas": _preparadas_activas,
+    }
+
+# Disponibilidad por (medico_id, fecha): vida corta, se invalida al reservar
+DISPONIBILIDAD_TTL = float(os.getenv("DISPONIBILIDAD_TTL", "30"))
+cache_disponibilidad = CacheTTL(ttl=DISPONIBILIDAD_TTL)
+
+# Próximas citas por RUT ("Ver mis citas"): se invalida al reservar o cancelar
+CITAS_PACIENTE_TTL = float(os.getenv("CITAS_PACIENTE_TTL", "300"))
+CITAS_PACIENTE_MAX = int(os.getenv("CITAS_PACIENTE_MAX", "10"))
+cache_citas_paciente = CacheTTL(ttl=CITAS_PACIENTE_TTL)
+
 @contextmanager
 def get_db():
+    if pool.closed:
+        raise PoolClosed("Pool síncrono cerrado: llamar abrir_pool() antes de usar las funciones síncronas")
     conn = pool.getconn()
     try:
         yield conn
     finally:
         pool.putconn(conn)
 
+# ==============================================================
+# SENTENCIAS PREPARADAS (consultas calientes)
+# ==============================================================
+
+# Cada conexión prepara una sentencia registrada en su primer uso y después
+# solo envía parámetros: Postgres no vuelve a parsear ni planificar.
+# El pooler de Neon (PgBouncer ≥1.22) las soporta a nivel de protocolo; si el
+# pooler en uso no, el primer error las desactiva y todo sigue sin preparar.
+DB_PREPARADAS = os.getenv("DB_PREPARADAS", "1") == "1"
+
+ERRORES_PREPARADAS = (psycopg.errors.InvalidSqlStatementName, psycopg.errors.DuplicatePreparedStatement)
+
+_preparadas: set = set()
+_preparadas_activas = DB_PREPARADAS
+
+def preparada(sql: str) -> str:
+    """Registra `sql` como sentencia caliente (se ejecuta preparada) y la devuelve."""
+    _preparadas.add(sql)
+    return sql
+
+def _desactivar_preparadas(e: Exception):
+    global _preparadas_activas
+    if _preparadas_activas:
+        _preparadas_activas = False
+        logger.warning(f"Sentencias preparadas desactivadas (el pooler no las soporta): {e}")
+
+def _ejecutar(cur, sql: str, params=None):
+    """cur.execute preparando las sentencias registradas; si el pooler las rechaza, reintenta sin preparar."""
+    preparar = _preparadas_activas and sql in _preparadas
+    limpia = cur.connection.info.transaction_status == TransactionStatus.IDLE
+    try:
+        return cur.execute(sql, params, prepare=preparar)
+    except ERRORES_PREPARADAS as e:
+        if not preparar:
+            raise
+        _desactivar_preparadas(e)
+        if not limpia:
+            raise  # había sentencias previas en la transacción: no se puede repetir solo esta
+        cur.connection.rollback()
+        return cur.execute(sql, params, prepare=False)
+
+async def _ejecutar_async(cur, sql: str, params=None):
+    preparar = _preparadas_activas and sql in _preparadas
+    limpia = cur.connection.info.transaction_status == TransactionStatus.IDLE
+    try:
+        return await cur.execute(sql, params, prepare=preparar)
+    except ERRORES_PREPARADAS as e:
+        if not preparar:
+            raise
+        _desactivar_preparadas(e)
+        if not limpia:
+            raise
+        await cur.connection.rollback()
+        return await cur.execute(sql, params, prepare=False)
+
+# ==============================================================
+# SQL (compartido por la versión síncrona y la asíncrona)
+# ==============================================================
+
+SQL_LISTAR_MEDICOS = preparada("""
+    SELECT id_medico, nombre, especialidad
+    FROM medicos
+    ORDER BY especialidad, nombre
+""")
+
+SQL_DISPONIBILIDAD = preparada("""
+    SELECT id_bloque, TO_CHAR(hora_inicio, 'HH24:MI') AS hora_str
+    FROM bloques_disponibles
+    WHERE medico_id = %s AND fecha = %s AND estado = 'DISPONIBLE'
+    ORDER BY hora_inicio
+""")
+
+# Varios (medico_id, fecha) en una sola consulta: lo usa el loteador del webhook
+SQL_DISPONIBILIDAD_LOTE = preparada("""
+    SELECT b.medico_id, b.fecha, b.id_bloque, TO_CHAR(b.hora_inicio, 'HH24:MI') AS hora_str
+    FROM bloques_disponibles b
+    JOIN unnest(%s::int[], %s::date[]) AS k(medico_id, fecha)
+      ON b.medico_id = k.medico_id AND b.fecha = k.fecha
+    WHERE b.estado = 'DISPONIBLE'
+    ORDER BY b.medico_id, b.fecha, b.hora_inicio
+""")
+
+SQL_UPSERT_PACIENTE = preparada("""
+    INSERT INTO pacientes (rut, nombre_completo, telefono_wsp)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (rut) DO UPDATE SET
+        nombre_completo = EXCLUDED.nombre_completo,
+        telefono_wsp = EXCLUDED.telefono_wsp
+    RETURNING id_paciente
+""")
+
+SQL_RESERVAR_BLOQUE = preparada("""
+    UPDATE bloques_disponibles
+    SET estado = 'RESERVADO', paciente_id = %s
+    WHERE id_bloque = %s AND estado = 'DISPONIBLE'
+    RETURNING fecha
+""")
+
+SQL_INSERTAR_CITA = preparada("""
+    INSERT INTO citas_agendadas (bloque_id, paciente_id, medico_id, estado_cita)
+    VALUES (%s, %s, %s, 'CONFIRMADA')
+""")
+
 # ==============================================================
 # 1. LISTAR MÉDICOS
 # ==============================================================
 
-def obtener_lista_medicos() -> List[Dict[str, Any]]:
+async def obtener_lista_medicos_async() -> List[Dict[str, Any]]:
     try:
-        with get_db() as conn:
-            with conn.cursor(row_factory=dict_row) as cur:
-                cur.execute("""
-                    SELECT id_medico, nombre, especialidad 
-                    FROM medicos 
-                    ORDER BY especialidad, nombre
-                """)
-                return cur.fetchall()
+        async with pool_async.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await _ejecutar_async(cur, SQL_LISTAR_MEDICOS)
+                return await cur.fetchall()
     except Exception as e:
-        logger.error(f"Error obtener_lista_medicos: {e}")
+        logger.error(f"Error obtener_lista_medicos_async: {e}")
         return []
 
 # ==============================================================
 # 2. CONSULTAR DISPONIBILIDAD
 # ==============================================================
 
+def _consultar_disponibilidad_bd(id_medico: int, fecha: date) -> List[Dict[str, Any]]:
+    with get_db() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            _ejecutar(cur, SQL_DISPONIBILIDAD, (id_medico, fecha))
+            return cur.fetchall()
+
+async def _consultar_disponibilidad_lote_async(claves: List[tuple]) -> Dict[tuple, List[Dict[str, Any]]]:
+    """Disponibilidad de muchos (medico_id, fecha) en un viaje; las claves sin bloques quedan vacías."""
+    resultado: Dict[tuple, List[Dict[str, Any]]] = {clave: [] for clave in claves}
+    async with pool_async.connection() as conn:
+        async with conn.cursor() as cur:
+            await _ejecutar_async(cur, SQL_DISPONIBILIDAD_LOTE, ([c[0] for c in claves], [c[1] for c in claves]))
+            async for medico_id, fecha, id_bloque, hora_str in cur:
+                resultado[(medico_id, fecha)].append({"id_bloque": id_bloque, "hora_str": hora_str})
+    return resultado
+
+# Mensajes de distintos pacientes procesados a la vez (p. ej. un mismo payload
+# del webhook) comparten una sola consulta de disponibilidad.
+loteador_disponibilidad = Loteador(_consultar_disponibilidad_lote_async, por_defecto=[])
+
 def consultar_disponibilidad(id_medico: int, fecha: date) -> List[Dict[str, Any]]:
     try:
-        with get_db() as conn:
-            with conn.cursor(row_factory=dict_row) as cur:
-                cur.execute("""
-                    SELECT id_bloque, TO_CHAR(hora_inicio, 'HH24:MI') AS hora_str
-                    FROM bloques_disponibles 
-                    WHERE medico_id = %s AND fecha = %s AND estado = 'DISPONIBLE'
-                    ORDER BY hora_inicio
-                """, (id_medico, fecha))
-                return cur.fetchall()
+        return cache_disponibilidad.obtener(
+            (id_medico, fecha), lambda: _consultar_disponibilidad_bd(id_medico, fecha)
+        )
+    except PoolClosed:
+        raise  # abrir_pool() no se llamó: es un error de configuración, no "sin horas"
     except Exception as e:
         logger.error(f"Error consultar_disponibilidad: {e}")
         return []
 
+async def consultar_disponibilidad_async(id_medico: int, fecha: date) -> List[Dict[str, Any]]:
+    try:
+        return await cache_disponibilidad.obtener_async(
+            (id_medico, fecha), lambda: loteador_disponibilidad.cargar((id_medico, fecha))
+        )
+    except Exception as e:
+        logger.error(f"Error consultar_disponibilidad_async: {e}")
+        return []
+
 # ==============================================================
 # 3. RESERVAR CITA (transacción 100% segura)
 # ==============================================================
 
+# Upsert paciente + reservar bloque + registrar cita en una sola sentencia:
+# un viaje de red a Neon en vez de cuatro (3 sentencias + commit).
+# Si el bloque ya no está disponible, bloque y cita quedan vacíos y se
+# devuelve fecha NULL (el upsert del paciente sí queda aplicado).
+SQL_RESERVAR_UN_VIAJE = preparada("""
+    WITH paciente AS (
+        INSERT INTO pacientes (rut, nombre_completo, telefono_wsp)
+        VALUES (%(rut)s, %(nombre)s, %(telefono)s)
+        ON CONFLICT (rut) DO UPDATE SET
+            nombre_completo = EXCLUDED.nombre_completo,
+            telefono_wsp = EXCLUDED.telefono_wsp
+        RETURNING id_paciente
+    ), bloque AS (
+        UPDATE bloques_disponibles b
+        SET estado = 'RESERVADO', paciente_id = paciente.id_paciente
+        FROM paciente
+        WHERE b.id_bloque = %(id_bloque)s AND b.estado = 'DISPONIBLE'
+        RETURNING b.id_bloque, b.fecha
+    ), cita AS (
+        INSERT INTO citas_agendadas (bloque_id, paciente_id, medico_id, estado_cita)
+        SELECT bloque.id_bloque, paciente.id_paciente, %(id_medico)s, 'CONFIRMADA'
+        FROM bloque, paciente
+        RETURNING bloque_id
+    )
+    SELECT paciente.id_paciente, bloque.fecha
+    FROM paciente LEFT JOIN bloque ON TRUE
+""")
+
+# Errores de SQL (p. ej. CTE no soportada) → se reintenta con los tres pasos.
+# Errores de red no: la sentencia pudo haber quedado confirmada.
+ERRORES_FALLBACK = (psycopg.ProgrammingError, psycopg.NotSupportedError)
+
+RESERVA_UN_VIAJE = os.getenv("RESERVA_UN_VIAJE", "1") == "1"
+
+def _tras_reserva(id_bloque: int, rut: str, id_medico: int, fecha: Optional[date]) -> bool:
+    if fecha is None:
+        # Otro lo tomó: lo cacheado de este médico puede mostrarlo libre
+        cache_disponibilidad.invalidar_si(lambda clave: clave[0] == id_medico)
+        return False
+    cache_disponibilidad.invalidar((id_medico, fecha))
+    cache_citas_paciente.invalidar_si(lambda clave: clave[0] == rut)  # la reserva pudo cambiar su teléfono
+    logger.success(f"Cita reservada → Bloque {id_bloque} | Paciente {rut}")
+    return True
+
+def _reservar_un_viaje(conn, id_bloque: int, rut: str, nombre_completo: str, telefono: str, id_medico: int) -> Optional[date]:
+    params = {"rut": rut, "nombre": nombre_completo, "telefono": telefono, "id_bloque": id_bloque, "id_medico": id_medico}
+    conn.autocommit = True  # la sentencia es su propia transacción: sin BEGIN/COMMIT aparte
+    try:
+        with conn.cursor() as cur:
+            return _ejecutar(cur, SQL_RESERVAR_UN_VIAJE, params).fetchone()[1]
+    finally:
+        conn.autocommit = False
+
+def _reservar_tres_pasos(conn, id_bloque: int, rut: str, nombre_completo: str, telefono: str, id_medico: int) -> Optional[date]:
+    with conn.cursor() as cur:
+        # 1. Upsert paciente
+        _ejecutar(cur, SQL_UPSERT_PACIENTE, (rut, nombre_completo, telefono))
+        paciente_id = cur.fetchone()[0]
+
+        # 2. Reservar bloque (solo si sigue disponible)
+        _ejecutar(cur, SQL_RESERVAR_BLOQUE, (paciente_id, id_bloque))
+        fila = cur.fetchone()
+
+        if fila is None:
+            conn.rollback()
+            return None
+
+        # 3. Registrar cita
+        _ejecutar(cur, SQL_INSERTAR_CITA, (id_bloque, paciente_id, id_medico))
+
+        conn.commit()
+        return fila[0]
+
 def reservar_cita(id_bloque: int, rut: str, nombre_completo: str, telefono: str, id_medico: int) -> bool:
+    args = (id_bloque, rut, nombre_completo, telefono, id_medico)
     try:
         with get_db() as conn:
-            with conn.cursor() as cur:
-                # 1. Upsert paciente
-                cur.execute("""
-                    INSERT INTO pacientes (rut, nombre_completo, telefono_wsp)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (rut) DO UPDATE SET
-                        nombre_completo = EXCLUDED.nombre_completo,
-                        telefono_wsp = EXCLUDED.telefono_wsp
-                    RETURNING id_paciente
-                """, (rut, nombre_completo, telefono))
-                paciente_id = cur.fetchone()[0]
-
-                # 2. Reservar bloque (solo si sigue disponible)
-                cur.execute("""
-                    UPDATE bloques_disponibles
-                    SET estado = 'RESERVADO', paciente_id = %s
-                    WHERE id_bloque = %s AND estado = 'DISPONIBLE'
-                """, (paciente_id, id_bloque))
-
-                if cur.rowcount == 0:
-                    conn.rollback()
-                    return False
-
-                # 3. Registrar cita
-                cur.execute("""
-                    INSERT INTO citas_agendadas (bloque_id, paciente_id, medico_id, estado_cita)
-                    VALUES (%s, %s, %s, 'CONFIRMADA')
-                """, (id_bloque, paciente_id, id_medico))
-
-                conn.commit()
-                logger.success(f"Cita reservada → Bloque {id_bloque} | Paciente {rut}")
-                return True
+            if RESERVA_UN_VIAJE:
+                try:
+                    return _tras_reserva(id_bloque, rut, id_medico, _reservar_un_viaje(conn, *args))
+                except ERRORES_FALLBACK as e:
+                    logger.warning(f"Reserva en un viaje falló, usando tres pasos: {e}")
+            return _tras_reserva(id_bloque, rut, id_medico, _reservar_tres_pasos(conn, *args))
 
+    except PoolClosed:
+        raise
     except Exception as e:
         logger.error(f"Error al reservar cita: {e}")
         if 'conn' in locals():
             conn.rollback()
-        return False
\ No newline at end of file
+        return False
+
+async def _reservar_un_viaje_async(conn, id_bloque: int, rut: str, nombre_completo: str, telefono: str, id_medico: int) -> Optional[date]:
+    params = {"rut": rut, "nombre": nombre_completo, "telefono": telefono, "id_bloque": id_bloque, "id_medico": id_medico}
+    await conn.set_autocommit(True)
+    try:
+        async with conn.cursor() as cur:
+            await _ejecutar_async(cur, SQL_RESERVAR_UN_VIAJE, params)
+            return (await cur.fetchone())[1]
+    finally:
+        await conn.set_autocommit(False)
+
+async def _reservar_tres_pasos_async(conn, id_bloque: int, rut: str, nombre_completo: str, telefono: str, id_medico: int) -> Optional[date]:
+    async with conn.cursor() as cur:
+        await _ejecutar_async(cur, SQL_UPSERT_PACIENTE, (rut, nombre_completo, telefono))
+        paciente_id = (await cur.fetchone())[0]
+
+        await _ejecutar_async(cur, SQL_RESERVAR_BLOQUE, (paciente_id, id_bloque))
+        fila = await cur.fetchone()
+
+        if fila is None:
+            await conn.rollback()
+            return None
+
+        await _ejecutar_async(cur, SQL_INSERTAR_CITA, (id_bloque, paciente_id, id_medico))
+        await conn.commit()
+        return fila[0]
+
+async def reservar_cita_async(id_bloque: int, rut: str, nombre_completo: str, telefono: str, id_medico: int) -> bool:
+    args = (id_bloque, rut, nombre_completo, telefono, id_medico)
+    try:
+        async with pool_async.connection() as conn:
+            if RESERVA_UN_VIAJE:
+                try:
+                    return _tras_reserva(id_bloque, rut, id_medico, await _reservar_un_viaje_async(conn, *args))
+                except ERRORES_FALLBACK as e:
+                    logger.warning(f"Reserva en un viaje falló, usando tres pasos: {e}")
+            return _tras_reserva(id_bloque, rut, id_medico, await _reservar_tres_pasos_async(conn, *args))
+
+    except Exception as e:
+        logger.error(f"Error al reservar cita: {e}")
+        return False
+
+# ==============================================================
+# 4. CITAS DE MAÑANA (recordatorios, en streaming)
+# ==============================================================
+
+CITAS_LOTE = int(os.getenv("CITAS_LOTE", "500"))
+
+# Una cita confirmada siempre tiene su bloque RESERVADO: filtrarlo deja unos
+# pocos bloques del día y cada uno busca su cita en uq_citas_bloque_confirmada,
+# en vez de recorrer todo el historial de citas (migraciones/004_indices_acceso.sql).
+SQL_CITAS_DEL_DIA = """
+    SELECT c.id_cita, p.nombre_completo, p.telefono_wsp, m.nombre AS medico,
+           TO_CHAR(b.hora_inicio, 'HH24:MI') AS hora_inicio, b.fecha
+    FROM citas_agendadas c
+    JOIN bloques_disponibles b ON b.id_bloque = c.bloque_id
+    JOIN pacientes p ON p.id_paciente = c.paciente_id
+    JOIN medicos m ON m.id_medico = c.medico_id
+    WHERE b.fecha = %s AND b.estado = 'RESERVADO' AND c.estado_cita = 'CONFIRMADA'
+    ORDER BY b.hora_inicio, c.id_cita
+"""
+
+async def obtener_lotes_citas_async(fecha: Optional[date] = None, tamano_lote: int = CITAS_LOTE) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Lotes de las citas confirmadas del día (mañana por defecto). Usa un cursor
+    con nombre (server-side): se traen `tamano_lote` filas por viaje, así la
+    memoria no crece con el volumen del día y el llamador puede empezar a
+    enviar antes de tener todo el resultado.
+    """
+    fecha = fecha or date.today() + timedelta(days=1)
+    async with pool_async.connection() as conn:
+        try:
+            async with conn.cursor(name="citas_del_dia", row_factory=dict_row) as cur:
+                await cur.execute(SQL_CITAS_DEL_DIA, (fecha,))
+                while lote := await cur.fetchmany(tamano_lote):
+                    yield lote
+        finally:
+            await conn.rollback()
+
+# ==============================================================
+# 5. REGISTRO DE RECORDATORIOS (idempotente entre ejecuciones)
+# ==============================================================
+# Tabla: migraciones/001_recordatorios_enviados.sql
+
+RECORDATORIO_RECLAMO_EXPIRA = int(os.getenv("RECORDATORIO_RECLAMO_EXPIRA", "900"))  # seg. en ENVIANDO = job caído
+RECORDATORIO_MAX_INTENTOS = int(os.getenv("RECORDATORIO_MAX_INTENTOS", "3"))
+
+# Inserta el reclamo; si ya existe solo lo toma de nuevo cuando falló antes o
+# quedó colgado en ENVIANDO. ON CONFLICT bloquea la fila en conflicto, así dos
+# jobs simultáneos nunca reclaman la misma cita: el segundo no la recibe.
+SQL_RECLAMAR_RECORDATORIOS = """
+    INSERT INTO recordatorios_enviados (cita_id, tipo, reclamado_por)
+    SELECT unnest(%(ids)s::int[]), %(tipo)s, %(instancia)s
+    ON CONFLICT (cita_id, tipo) DO UPDATE SET
+        estado = 'ENVIANDO',
+        reclamado_por = EXCLUDED.reclamado_por,
+        reclamado_en = now(),
+        intentos = recordatorios_enviados.intentos + 1
+    WHERE (recordatorios_enviados.estado = 'FALLIDO'
+           AND recordatorios_enviados.intentos < %(max_intentos)s)
+       OR (recordatorios_enviados.estado = 'ENVIANDO'
+           AND recordatorios_enviados.reclamado_en < now() - make_interval(secs => %(expira)s))
+    RETURNING cita_id
+"""
+
+SQL_MARCAR_RECORDATORIOS = """
+    UPDATE recordatorios_enviados
+    SET estado = %(estado)s,
+        enviado_en = CASE WHEN %(estado)s = 'ENVIADO' THEN now() END
+    WHERE tipo = %(tipo)s AND cita_id = ANY(%(ids)s) AND reclamado_por = %(instancia)s
+"""
+
+async def reclamar_recordatorios_async(ids_cita: List[int], tipo: str, instancia: str) -> set:
+    """Devuelve el subconjunto de citas que esta instancia debe enviar."""
+    if not ids_cita:
+        return set()
+    async with pool_async.connection() as conn:
+        cur = await conn.execute(SQL_RECLAMAR_RECORDATORIOS, {
+            "ids": ids_cita, "tipo": tipo, "instancia": instancia,
+            "max_intentos": RECORDATORIO_MAX_INTENTOS, "expira": RECORDATORIO_RECLAMO_EXPIRA,
+        })
+        return {fila[0] for fila in await cur.fetchall()}
+
+async def marcar_recordatorios_async(tipo: str, instancia: str, enviados: List[int], fallidos: List[int]):
+    async with pool_async.connection() as conn:
+        for estado, ids in (("ENVIADO", enviados), ("FALLIDO", fallidos)):
+            if ids:
+                await conn.execute(SQL_MARCAR_RECORDATORIOS, {"estado": estado, "tipo": tipo, "ids": ids, "instancia": instancia})
+
+# ==============================================================
+# 6. BLOQUEO ENTRE RÉPLICAS (advisory lock de Postgres)
+# ==============================================================
+
+@asynccontextmanager
+async def bloqueo_exclusivo_async(clave: int):
+    """
+    True si esta réplica obtuvo el lock `clave`; se libera al salir (es de
+    transacción, así también funciona a través del pooler de Neon).
+    Mantiene una conexión del pool ocupada mientras dura el bloque.
+    """
+    async with pool_async.connection() as conn:
+        cur = await conn.execute("SELECT pg_try_advisory_xact_lock(%s)", (clave,))
+        obtenido = (await cur.fetchone())[0]
+        yield obtenido
+
+# ==============================================================
+# 7. CITAS DE UN PACIENTE ("Ver mis citas")
+# ==============================================================
+# Índices: UNIQUE (rut) de pacientes y migraciones/002_indices_citas_paciente.sql (idx_citas_paciente_estado)
+
+SQL_CITAS_PACIENTE = preparada("""
+    SELECT c.id_cita, b.id_bloque, m.id_medico, m.nombre AS medico, m.especialidad,
+           b.fecha, TO_CHAR(b.hora_inicio, 'HH24:MI') AS hora_str
+    FROM pacientes p
+    JOIN citas_agendadas c ON c.paciente_id = p.id_paciente AND c.estado_cita = 'CONFIRMADA'
+    JOIN bloques_disponibles b ON b.id_bloque = c.bloque_id
+    JOIN medicos m ON m.id_medico = c.medico_id
+    WHERE p.rut = %s AND p.telefono_wsp = %s AND b.fecha >= CURRENT_DATE
+    ORDER BY b.fecha, b.hora_inicio
+    LIMIT %s
+""")
+
+async def _citas_de_paciente_bd_async(rut: str, telefono: str) -> List[Dict[str, Any]]:
+    async with pool_async.connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await _ejecutar_async(cur, SQL_CITAS_PACIENTE, (rut, telefono, CITAS_PACIENTE_MAX))
+            return await cur.fetchall()
+
+async def citas_de_paciente_async(rut: str, telefono: str) -> List[Dict[str, Any]]:
+    """
+    Próximas citas confirmadas del paciente (RUT sin puntos ni guion), solo si
+    `telefono` es el WhatsApp registrado para ese RUT: saber un RUT ajeno no basta.
+    """
+    try:
+        return await cache_citas_paciente.obtener_async(
+            (rut, telefono), lambda: _citas_de_paciente_bd_async(rut, telefono)
+        )
+    except Exception as e:
+        logger.error(f"Error citas_de_paciente_async: {e}")
+        return []
+
+# ==============================================================
+# 8. CANCELAR CITA (libera el bloque en la misma sentencia)
+# ==============================================================
+
+# Cancela la cita (solo si es del RUT, se pide desde su WhatsApp y sigue
+# confirmada) y devuelve su bloque a DISPONIBLE en una sola sentencia atómica:
+# nunca queda una cita cancelada con el bloque tomado ni un bloque libre con
+# la cita vigente.
+SQL_CANCELAR_CITA = preparada("""
+    WITH cita AS (
+        UPDATE citas_agendadas c
+        SET estado_cita = 'CANCELADA'
+        FROM pacientes p
+        WHERE c.id_cita = %(id_cita)s AND c.estado_cita = 'CONFIRMADA'
+          AND p.id_paciente = c.paciente_id AND p.rut = %(rut)s AND p.telefono_wsp = %(telefono)s
+        RETURNING c.bloque_id
+    )
+    UPDATE bloques_disponibles b
+    SET estado = 'DISPONIBLE', paciente_id = NULL
+    FROM cita
+    WHERE b.id_bloque = cita.bloque_id
+    RETURNING b.medico_id, b.fecha
+""")
+
+def _tras_cancelacion(id_cita: int, rut: str, fila: Optional[tuple]) -> bool:
+    cache_citas_paciente.invalidar_si(lambda clave: clave[0] == rut)  # también si falló: lo mostrado ya no era vigente
+    if fila is None:
+        return False
+    cache_disponibilidad.invalidar((fila[0], fila[1]))  # el bloque liberado se ve al tiro
+    logger.success(f"Cita cancelada → Cita {id_cita} | Paciente {rut}")
+    return True
+
+async def cancelar_cita_async(id_cita: int, rut: str, telefono: str) -> bool:
+    """True si la cita se canceló; False si no existe, no es del RUT y teléfono o ya estaba cancelada."""
+    try:
+        async with pool_async.connection() as conn:
+            await conn.set_autocommit(True)
+            try:
+                async with conn.cursor() as cur:
+                    await _ejecutar_async(cur, SQL_CANCELAR_CITA, {"id_cita": id_cita, "rut": rut, "telefono": telefono})
+                    fila = await cur.fetchone()
+            finally:
+                await conn.set_autocommit(False)
+            return _tras_cancelacion(id_cita, rut, fila)
+    except Exception as e:
+        logger.error(f"Error al cancelar cita: {e}")
+        return False
+
+# ==============================================================
+# 9. PRÓXIMAS HORAS LIBRES (varios días, paginado por keyset)
+# ==============================================================
+# Índice: migraciones/004_indices_acceso.sql (idx_bloques_libres_medico_fecha)
+
+PROXIMOS_BLOQUES_N = int(os.getenv("PROXIMOS_BLOQUES_N", "5"))
+PROXIMOS_BLOQUES_DIAS = int(os.getenv("PROXIMOS_BLOQUES_DIAS", "30"))
+
+# El cursor (fecha, hora, id_bloque) es el último bloque ya mostrado: la página
+# siguiente empieza justo después, sin OFFSET (no relee lo ya mostrado).
+SQL_PROXIMOS_BLOQUES = preparada("""
+    SELECT b.id_bloque, b.medico_id, b.fecha, TO_CHAR(b.hora_inicio, 'HH24:MI') AS hora_str
+    FROM bloques_disponibles b
+    WHERE b.medico_id = ANY(%(medicos)s::int[]) AND b.estado = 'DISPONIBLE'
+      AND b.fecha <= %(hasta)s
+      AND (b.fecha, b.hora_inicio, b.id_bloque) > (%(fecha)s, %(hora)s::time, %(id_bloque)s)
+    ORDER BY b.fecha, b.hora_inicio, b.id_bloque
+    LIMIT %(n)s
+""")
+
+def _params_proximos(medico_ids: List[int], n: int, despues: Optional[tuple], dias: int) -> Dict[str, Any]:
+    hoy = date.today()
+    fecha, hora, id_bloque = despues or (hoy, "00:00", 0)
+    return {
+        "medicos": list(medico_ids), "n": n, "hasta": hoy + timedelta(days=dias),
+        "fecha": max(fecha, hoy), "hora": hora if fecha >= hoy else "00:00", "id_bloque": id_bloque,
+    }
+
+async def proximos_bloques_async(medico_ids: List[int], n: int = PROXIMOS_BLOQUES_N, despues: Optional[tuple] = None,
+                                 dias: int = PROXIMOS_BLOQUES_DIAS) -> List[Dict[str, Any]]:
+    """
+    Los `n` primeros bloques libres de esos médicos (uno o toda una especialidad)
+    en los próximos `dias`. `despues` = (fecha, 'HH:MM', id_bloque) del último
+    bloque mostrado, para pedir la página siguiente.
+    """
+    try:
+        async with pool_async.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await _ejecutar_async(cur, SQL_PROXIMOS_BLOQUES, _params_proximos(medico_ids, n, despues, dias))
+                return await cur.fetchall()
+    except Exception as e:
+        logger.error(f"Error proximos_bloques_async: {e}")
+        return []
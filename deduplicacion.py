@@ -0,0 +1,72 @@
+# deduplicacion.py → ÍNDICE DE MENSAJES YA RECIBIDOS (reintentos de YCloud)
+
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from loguru import logger
+
+# ==============================================================
+# CONFIG
+# ==============================================================
+
+VISTOS_TTL = int(os.getenv("VISTOS_TTL", "86400"))           # YCloud reintenta durante horas, no días
+VISTOS_MAX = int(os.getenv("VISTOS_MAX", "200000"))
+VISTOS_REDIS_URL = os.getenv("VISTOS_REDIS_URL") or os.getenv("REDIS_URL")
+VISTOS_PREFIJO = os.getenv("VISTOS_PREFIJO", "agenza:visto:")
+
+
+class IndiceVistos:
+    """
+    Conjunto acotado (LRU + TTL) de IDs de mensaje ya aceptados.
+    Con Redis configurado, además comparte el índice entre workers/réplicas
+    (SET NX EX); la copia local evita ir a Redis para reintentos al mismo proceso.
+    """
+
+    def __init__(self, max_ids: int = VISTOS_MAX, ttl: int = VISTOS_TTL, redis_url: Optional[str] = VISTOS_REDIS_URL):
+        self.max_ids = max_ids
+        self.ttl = ttl
+        self.redis_url = redis_url
+        self._ids: "OrderedDict[str, float]" = OrderedDict()  # id → expira
+        self._redis = None
+        self.duplicados = 0
+
+    async def abrir(self):
+        if self.redis_url:
+            import redis.asyncio as redis  # dependencia opcional
+            self._redis = redis.from_url(self.redis_url)
+            logger.info("Índice de mensajes vistos compartido en Redis")
+
+    async def cerrar(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def es_nuevo(self, msg_id: str) -> bool:
+        """Marca el ID como visto; False si ya se había recibido (duplicado)."""
+        ahora = time.monotonic()
+        expira = self._ids.get(msg_id)
+        if expira is not None and expira > ahora:
+            self.duplicados += 1
+            return False
+        if self._redis is not None and not await self._redis.set(VISTOS_PREFIJO + msg_id, 1, nx=True, ex=self.ttl):
+            self._recordar(msg_id, ahora)
+            self.duplicados += 1
+            return False
+        self._recordar(msg_id, ahora)
+        return True
+
+    async def olvidar(self, msg_id: str):
+        """Deshace es_nuevo (p. ej. el mensaje no se pudo encolar y YCloud lo reenviará)."""
+        self._ids.pop(msg_id, None)
+        if self._redis is not None:
+            await self._redis.delete(VISTOS_PREFIJO + msg_id)
+
+    def estadisticas(self):
+        return {"ids": len(self._ids), "duplicados": self.duplicados}
+
+    def _recordar(self, msg_id: str, ahora: float):
+        self._ids[msg_id] = ahora + self.ttl
+        self._ids.move_to_end(msg_id)
+        while len(self._ids) > self.max_ids:
+            self._ids.popitem(last=False)
@@ -0,0 +1,173 @@
+# despachador.py → ENVÍO MASIVO CONCURRENTE (token bucket + reintentos con backoff)
+
+import asyncio
+import inspect
+import os
+import random
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import httpx
+from loguru import logger
+from ycloud_client import YCloudClient
+
+# ==============================================================
+# CONFIG
+# ==============================================================
+
+DESPACHO_CONCURRENCIA = int(os.getenv("DESPACHO_CONCURRENCIA", "10"))
+# Mensajes/segundo permitidos por el número emisor (según el tier del proveedor)
+DESPACHO_TASA = float(os.getenv("DESPACHO_TASA", "20"))
+DESPACHO_RAFAGA = int(os.getenv("DESPACHO_RAFAGA", "20"))
+DESPACHO_REINTENTOS = int(os.getenv("DESPACHO_REINTENTOS", "4"))
+DESPACHO_BACKOFF_BASE = float(os.getenv("DESPACHO_BACKOFF_BASE", "0.5"))
+DESPACHO_BACKOFF_MAX = float(os.getenv("DESPACHO_BACKOFF_MAX", "30"))
+
+
+class LimitadorTokens:
+    """Token bucket: `tasa` tokens por segundo, acumulables hasta `rafaga`."""
+
+    def __init__(self, tasa: float, rafaga: int):
+        self.tasa = tasa
+        self.rafaga = max(1, rafaga)
+        self._tokens = float(self.rafaga)
+        self._ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def adquirir(self):
+        async with self._lock:
+            while True:
+                ahora = time.monotonic()
+                self._tokens = min(self.rafaga, self._tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.tasa)
+
+
+@dataclass
+class ResumenEnvio:
+    enviados: int = 0
+    fallidos: int = 0
+    reintentos: int = 0
+    latencias: List[float] = field(default_factory=list)  # segundos por mensaje enviado (incluye reintentos)
+
+    def percentil(self, p: int) -> Optional[float]:
+        if not self.latencias:
+            return None
+        if len(self.latencias) == 1:
+            return self.latencias[0]
+        return statistics.quantiles(self.latencias, n=100, method="inclusive")[p - 1]
+
+    def como_dict(self) -> Dict[str, object]:
+        p50, p95 = self.percentil(50), self.percentil(95)
+        return {
+            "enviados": self.enviados,
+            "fallidos": self.fallidos,
+            "reintentos": self.reintentos,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+# Solo se reintenta un error de transporte si la petición seguro no salió: un
+# ReadTimeout o una conexión cortada a mitad de respuesta pueden llegar cuando el
+# proveedor ya aceptó el mensaje, y reintentarlo se lo duplicaría al paciente.
+ERRORES_SIN_ENVIO = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _es_reintentable(status: int) -> bool:
+    return status == 429 or status >= 500
+
+
+class Despachador:
+    """Envía muchos mensajes con concurrencia acotada respetando el límite del proveedor."""
+
+    def __init__(self, cliente: YCloudClient, concurrencia: int = DESPACHO_CONCURRENCIA,
+                 tasa: float = DESPACHO_TASA, rafaga: int = DESPACHO_RAFAGA,
+                 max_reintentos: int = DESPACHO_REINTENTOS):
+        self.cliente = cliente
+        self.concurrencia = max(1, concurrencia)
+        self.limitador = LimitadorTokens(tasa, rafaga)
+        self.max_reintentos = max_reintentos
+
+    def _espera(self, intento: int, resp: Optional[httpx.Response]) -> float:
+        if resp is not None and resp.headers.get("Retry-After", "").isdigit():
+            return min(float(resp.headers["Retry-After"]), DESPACHO_BACKOFF_MAX)
+        base = min(DESPACHO_BACKOFF_BASE * (2 ** intento), DESPACHO_BACKOFF_MAX)
+        return base * random.uniform(0.5, 1.0)  # jitter: evita reintentos sincronizados
+
+    async def enviar(self, to: str, texto: str, resumen: ResumenEnvio) -> bool:
+        inicio = time.monotonic()
+        for intento in range(self.max_reintentos + 1):
+            await self.limitador.adquirir()
+            resp = None
+            try:
+                resp = await self.cliente.enviar_texto(to, texto)
+                if resp.status_code < 400:
+                    resumen.enviados += 1
+                    resumen.latencias.append(time.monotonic() - inicio)
+                    return True
+                if not _es_reintentable(resp.status_code):
+                    logger.error(f"Envío a {to} rechazado: HTTP {resp.status_code} {resp.text[:200]}")
+                    break
+                motivo = f"HTTP {resp.status_code}"
+            except ERRORES_SIN_ENVIO as e:
+                motivo = str(e) or type(e).__name__
+            except httpx.TransportError as e:
+                logger.error(f"Envío a {to} sin confirmar, no se reintenta: {str(e) or type(e).__name__}")
+                break
+            if intento < self.max_reintentos:
+                resumen.reintentos += 1
+                espera = self._espera(intento, resp)
+                logger.warning(f"Reintentando envío a {to} en {espera:.1f}s ({motivo})")
+                await asyncio.sleep(espera)
+        resumen.fallidos += 1
+        return False
+
+    async def despachar(self, mensajes: AsyncIterable[Tuple[Any, str, str]],
+                        resumen: Optional[ResumenEnvio] = None,
+                        al_terminar: Optional[Callable[[Any, bool], Union[None, Awaitable[None]]]] = None) -> ResumenEnvio:
+        """
+        Consume (clave, to, texto) a medida que llegan y los envía con `concurrencia`
+        workers. al_terminar(clave, ok) se llama apenas termina cada mensaje (si es
+        una corrutina, el worker la espera antes de tomar el siguiente); pasar un
+        `resumen` existente permite acumular varias tandas en el mismo resumen.
+        """
+        resumen = resumen if resumen is not None else ResumenEnvio()
+        cola: asyncio.Queue = asyncio.Queue(maxsize=self.concurrencia * 2)
+
+        async def worker():
+            while True:
+                item = await cola.get()
+                try:
+                    if item is None:
+                        return
+                    clave, to, texto = item
+                    try:
+                        ok = await self.enviar(to, texto, resumen)
+                    except Exception as e:
+                        logger.exception(f"Error inesperado enviando a {to}: {e}")
+                        resumen.fallidos += 1
+                        ok = False
+                    if al_terminar is not None:
+                        try:
+                            resultado = al_terminar(clave, ok)
+                            if inspect.isawaitable(resultado):
+                                await resultado
+                        except Exception as e:
+                            logger.exception(f"Error en al_terminar de {clave}: {e}")
+                finally:
+                    cola.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrencia)]
+        try:
+            async for item in mensajes:
+                await cola.put(item)
+        finally:
+            for _ in workers:
+                await cola.put(None)
+            await asyncio.gather(*workers, return_exceptions=True)
+        return resumen
@@ -0,0 +1,209 @@
+# disponibilidad_reglas.py → DISPONIBILIDAD CALCULADA DESDE LAS PLANTILLAS (sin un row por bloque)
+#
+# Alternativa a leer bloques_disponibles ya generados: las horas libres se
+# calculan como (tramos de horarios_medicos − feriados − horas ya tomadas).
+# Solo las horas reservadas existen como fila; el bloque se materializa al
+# reservar (materializar_bloque_async). Se activa con DISPONIBILIDAD_MOTOR=reglas,
+# y entonces el programador no genera bloques: "próxima" también sale de aquí.
+
+import os
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from loguru import logger
+from db_service import pool_async, cache_disponibilidad, PROXIMOS_BLOQUES_N, PROXIMOS_BLOQUES_DIAS
+from estado_conversacion import hora_a_minutos, minutos_a_hora
+from generador_bloques import SQL_FERIADOS, SQL_PLANTILLAS_MEDICOS, Tramos, agrupar_tramos, expandir
+
+try:
+    import numpy as np  # acelera rangos largos; sin él se usa bisect
+except ImportError:
+    np = None
+
+# ==============================================================
+# CONFIG
+# ==============================================================
+
+DISPONIBILIDAD_MOTOR = os.getenv("DISPONIBILIDAD_MOTOR", "bloques")   # bloques | reglas
+MINUTOS_DIA = 1440
+
+# (medico_id, fecha, minuto de inicio, duracion) de cada hora tomada
+Ocupados = Sequence[Tuple[int, date, int, int]]
+
+# Cualquier fila que no esté DISPONIBLE ocupa su intervalo (reservada o bloqueada)
+SQL_OCUPADOS = """
+    SELECT medico_id, fecha, EXTRACT(EPOCH FROM hora_inicio)::int / 60, duracion_min
+    FROM bloques_disponibles
+    WHERE medico_id = ANY(%s::int[]) AND fecha BETWEEN %s AND %s AND estado <> 'DISPONIBLE'
+"""
+
+# La duración sale del tramo de la plantilla que contiene la hora (30 si ya no hay ninguno)
+SQL_MATERIALIZAR_BLOQUE = """
+    INSERT INTO bloques_disponibles (medico_id, fecha, hora_inicio, duracion_min)
+    SELECT %(medico)s, %(fecha)s, %(hora)s::time, COALESCE((
+        SELECT h.duracion_min FROM horarios_medicos h
+        WHERE h.medico_id = %(medico)s AND h.dia_semana = EXTRACT(ISODOW FROM %(fecha)s::date)
+          AND %(hora)s::time >= h.hora_inicio AND %(hora)s::time < h.hora_fin
+          AND (h.vigente_desde IS NULL OR h.vigente_desde <= %(fecha)s)
+          AND (h.vigente_hasta IS NULL OR h.vigente_hasta >= %(fecha)s)
+        ORDER BY h.id_horario LIMIT 1
+    ), 30)
+    ON CONFLICT (medico_id, fecha, hora_inicio) DO UPDATE SET hora_inicio = EXCLUDED.hora_inicio
+    RETURNING id_bloque
+"""
+
+# ==============================================================
+# ARITMÉTICA DE INTERVALOS
+# ==============================================================
+# Todo se lleva a minutos absolutos desde `desde` (día * 1440 + minuto), así
+# un rango completo de fechas es un solo arreglo ordenado por médico.
+
+def candidatos(tramos: Tramos, feriados: Iterable[date], desde: date, hasta: date) -> Dict[int, Tuple[List[int], List[int]]]:
+    """medico_id → (inicios en minutos absolutos, duraciones) de los bloques que las plantillas ofrecen en el rango."""
+    por_medico: Dict[int, Tuple[List[int], List[int]]] = {}
+    for medico_id, _, d, inicios, duracion in expandir(tramos, set(feriados), desde, (hasta - desde).days + 1):
+        s, duraciones = por_medico.setdefault(medico_id, ([], []))
+        base = d * MINUTOS_DIA
+        s.extend(range(base + inicios.start, base + inicios.stop, inicios.step))
+        duraciones.extend([duracion] * len(inicios))
+    return por_medico
+
+def unir_intervalos(intervalos: Iterable[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+    """Intervalos [a, b) → (inicios, fines) disjuntos y ordenados; los que se solapan o tocan se unen."""
+    inicios: List[int] = []
+    fines: List[int] = []
+    for a, b in sorted(intervalos):
+        if fines and a <= fines[-1]:
+            fines[-1] = max(fines[-1], b)
+        else:
+            inicios.append(a)
+            fines.append(b)
+    return inicios, fines
+
+def restar_ocupados(inicios: List[int], duraciones: List[int], ocupados: Iterable[Tuple[int, int]]) -> List[int]:
+    """
+    Inicios libres, ordenados. Con los ocupados unidos en intervalos disjuntos,
+    el primero que termina después de s (búsqueda binaria sobre los fines) es
+    el único que puede chocar primero con el candidato [s, s+d): está libre si
+    no hay tal intervalo o si empieza en s+d o después.
+    """
+    a, b = unir_intervalos(ocupados)
+    if np is not None:
+        s = np.asarray(inicios, dtype=np.int64)
+        d = np.asarray(duraciones, dtype=np.int64)
+        orden = np.argsort(s, kind="stable")
+        s, d = s[orden], d[orden]
+        if a:
+            a, b = np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64)
+            i = np.searchsorted(b, s, side="right")
+            libre = (i == len(b)) | (a[np.minimum(i, len(a) - 1)] >= s + d)
+            s = s[libre]
+        return s.tolist()
+    libres = []
+    for s, d in sorted(zip(inicios, duraciones)):
+        i = bisect_right(b, s)
+        if i == len(b) or a[i] >= s + d:
+            libres.append(s)
+    return libres
+
+def libres_desde_reglas(tramos: Tramos, feriados: Iterable[date], ocupados: Ocupados,
+                        desde: date, hasta: date) -> List[Tuple[int, int]]:
+    """(minuto absoluto, medico_id) de cada hora libre en [desde, hasta], ordenadas por momento y luego médico."""
+    tomados: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    for medico_id, fecha, minuto, duracion in ocupados:
+        inicio = (fecha - desde).days * MINUTOS_DIA + minuto
+        tomados[medico_id].append((inicio, inicio + duracion))
+    libres = []
+    for medico_id, (inicios, duraciones) in candidatos(tramos, feriados, desde, hasta).items():
+        libres.extend((s, medico_id) for s in restar_ocupados(inicios, duraciones, tomados.get(medico_id, ())))
+    libres.sort()
+    return libres
+
+def disponibilidad_desde_reglas(tramos: Tramos, feriados: Iterable[date], ocupados: Ocupados,
+                                desde: date, hasta: date) -> Dict[date, List[Dict[str, Any]]]:
+    """{fecha: [{"id_bloque": None, "hora_str": "HH:MM"}, ...]} de un médico, con la misma forma que consultar_disponibilidad."""
+    resultado: Dict[date, List[Dict[str, Any]]] = {}
+    for minuto, _ in libres_desde_reglas(tramos, feriados, ocupados, desde, hasta):
+        dia, m = divmod(minuto, MINUTOS_DIA)
+        resultado.setdefault(desde + timedelta(days=dia), []).append({"id_bloque": None, "hora_str": minutos_a_hora(m)})
+    return resultado
+
+# ==============================================================
+# CONSULTA
+# ==============================================================
+
+async def _leer_reglas(conn, medico_ids: List[int], desde: date, hasta: date) -> Tuple[Tramos, List[date], Ocupados]:
+    """Plantillas, feriados y horas tomadas: tres lecturas pequeñas en un solo viaje (pipeline)."""
+    async with conn.pipeline():
+        c_plantillas = await conn.execute(SQL_PLANTILLAS_MEDICOS, (medico_ids,))
+        c_feriados = await conn.execute(SQL_FERIADOS, (desde, hasta))
+        c_ocupados = await conn.execute(SQL_OCUPADOS, (medico_ids, desde, hasta))
+    tramos = agrupar_tramos(await c_plantillas.fetchall())
+    feriados = [f[0] for f in await c_feriados.fetchall()]
+    return tramos, feriados, await c_ocupados.fetchall()
+
+async def disponibilidad_rango_async(id_medico: int, desde: date, hasta: date) -> Dict[date, List[Dict[str, Any]]]:
+    """Horas libres del médico en [desde, hasta]."""
+    async with pool_async.connection() as conn:
+        tramos, feriados, ocupados = await _leer_reglas(conn, [id_medico], desde, hasta)
+    return disponibilidad_desde_reglas(tramos, feriados, ocupados, desde, hasta)
+
+async def consultar_disponibilidad_reglas_async(id_medico: int, fecha: date) -> List[Dict[str, Any]]:
+    """Reemplazo de consultar_disponibilidad_async (misma caché: reservar/cancelar la invalidan)."""
+    async def cargar():
+        return (await disponibilidad_rango_async(id_medico, fecha, fecha)).get(fecha, [])
+    try:
+        return await cache_disponibilidad.obtener_async((id_medico, fecha), cargar)
+    except Exception as e:
+        logger.error(f"Error consultar_disponibilidad_reglas_async: {e}")
+        return []
+
+async def proximos_reglas_async(medico_ids: List[int], n: int = PROXIMOS_BLOQUES_N, despues: Optional[tuple] = None,
+                                dias: int = PROXIMOS_BLOQUES_DIAS) -> List[Dict[str, Any]]:
+    """
+    Reemplazo de proximos_bloques_async, con la misma forma y orden (fecha,
+    hora). Las horas aún no tienen id_bloque, así que el empate se resuelve
+    por médico y el cursor `despues` es (fecha, 'HH:MM', medico_id).
+    """
+    hoy = date.today()
+    hasta = hoy + timedelta(days=dias)
+    fecha, hora, medico = despues or (hoy, "00:00", 0)
+    if fecha < hoy:
+        fecha, hora, medico = hoy, "00:00", 0
+    cursor = (hora_a_minutos(hora), medico)
+    resultado = []
+    # Casi siempre las n primeras están en los primeros días: se lee y calcula
+    # por ventanas que se duplican (1, 2, 4... días), no todo el rango de una vez
+    desde, ventana = fecha, 1
+    try:
+        async with pool_async.connection() as conn:
+            while desde <= hasta and len(resultado) < n:
+                hasta_ventana = min(hasta, desde + timedelta(days=ventana - 1))
+                tramos, feriados, ocupados = await _leer_reglas(conn, list(medico_ids), desde, hasta_ventana)
+                base = (desde - fecha).days * MINUTOS_DIA
+                for minuto, medico_id in libres_desde_reglas(tramos, feriados, ocupados, desde, hasta_ventana):
+                    if (base + minuto, medico_id) <= cursor:
+                        continue
+                    dia, m = divmod(minuto, MINUTOS_DIA)
+                    resultado.append({
+                        "id_bloque": None, "medico_id": medico_id,
+                        "fecha": desde + timedelta(days=dia), "hora_str": minutos_a_hora(m),
+                    })
+                    if len(resultado) == n:
+                        break
+                desde, ventana = hasta_ventana + timedelta(days=1), ventana * 2
+    except Exception as e:
+        logger.error(f"Error proximos_reglas_async: {e}")
+        return []
+    return resultado
+
+async def materializar_bloque_async(id_medico: int, fecha: date, hora: int) -> Optional[int]:
+    """id_bloque de la hora (minutos) elegida, creando la fila si aún no existe; luego se reserva como siempre."""
+    try:
+        async with pool_async.connection() as conn:
+            cur = await conn.execute(SQL_MATERIALIZAR_BLOQUE, {"medico": id_medico, "fecha": fecha, "hora": minutos_a_hora(hora)})
+            return (await cur.fetchone())[0]
+    except Exception as e:
+        logger.error(f"Error materializar_bloque_async: {e}")
+        return None
@@ -0,0 +1,62 @@
+# estado_conversacion.py → REGISTRO COMPACTO DEL ESTADO DE UNA CONVERSACIÓN
+
+import json
+from dataclasses import dataclass, replace
+from datetime import date
+from typing import Optional, Tuple
+
+FORMATO = 4  # subir si cambia el orden de campos en a_bytes()
+
+
+@dataclass(slots=True, frozen=True)
+class EstadoConversacion:
+    """
+    Solo IDs y números: los nombres de médicos se resuelven desde el
+    catálogo compartido (version_catalogo) y las horas van en minutos.
+    """
+    estado: str = "inicio"
+    version_catalogo: int = 0            # snapshot de médicos mostrado en el menú
+    medico_id: Optional[int] = None
+    fecha: Optional[date] = None
+    bloque_ids: Tuple[int, ...] = ()     # bloques ofrecidos, en el orden mostrado
+    horas: Tuple[int, ...] = ()          # minutos desde medianoche, paralelo a bloque_ids
+    fechas: Tuple[int, ...] = ()         # "próximas horas": día (ordinal) de cada bloque ofrecido
+    medico_ids: Tuple[int, ...] = ()     # "próximas horas": médico de cada bloque ofrecido
+    alcance: Tuple[int, ...] = ()        # "próximas horas": médicos en que se busca (para "más")
+    bloque_id: Optional[int] = None
+    hora: Optional[int] = None
+    cita_ids: Tuple[int, ...] = ()       # citas ofrecidas para cancelar, en el orden mostrado
+    rut: Optional[str] = None            # RUT normalizado del paciente que cancela
+    actualizado: int = 0                 # epoch (s) del último guardado; para vencer pasos abandonados
+
+    def con(self, **cambios) -> "EstadoConversacion":
+        return replace(self, **cambios)
+
+    def a_bytes(self) -> bytes:
+        return json.dumps([
+            FORMATO, self.estado, self.version_catalogo, self.medico_id,
+            self.fecha.toordinal() if self.fecha else None,
+            self.bloque_ids, self.horas, self.fechas, self.medico_ids, self.alcance,
+            self.bloque_id, self.hora, self.cita_ids, self.rut, self.actualizado,
+        ], separators=(",", ":")).encode()
+
+    @classmethod
+    def de_bytes(cls, raw: bytes) -> "EstadoConversacion":
+        v = json.loads(raw)
+        if v[0] != FORMATO:
+            return cls()  # formato viejo: la conversación vuelve al inicio
+        return cls(
+            estado=v[1], version_catalogo=v[2], medico_id=v[3],
+            fecha=date.fromordinal(v[4]) if v[4] is not None else None,
+            bloque_ids=tuple(v[5]), horas=tuple(v[6]),
+            fechas=tuple(v[7]), medico_ids=tuple(v[8]), alcance=tuple(v[9]), bloque_id=v[10], hora=v[11],
+            cita_ids=tuple(v[12]), rut=v[13], actualizado=v[14],
+        )
+
+
+def hora_a_minutos(hora_str: str) -> int:
+    h, m = hora_str.split(":")[:2]
+    return int(h) * 60 + int(m)
+
+def minutos_a_hora(minutos: int) -> str:
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
@@ -0,0 +1,170 @@
+# estado_store.py → ALMACÉN DE ESTADO DE CONVERSACIONES (memoria LRU+TTL o Redis)
+
+import abc
+import asyncio
+import os
+import secrets
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from loguru import logger
+from estado_conversacion import EstadoConversacion
+
+# ==============================================================
+# CONFIG
+# ==============================================================
+
+REDIS_URL = os.getenv("REDIS_URL")
+ESTADO_TTL = int(os.getenv("ESTADO_TTL", str(6 * 3600)))          # conversación inactiva expira
+ESTADO_MAX_MEMORIA = int(os.getenv("ESTADO_MAX_MEMORIA", "50000"))  # tope de teléfonos en RAM
+ESTADO_PREFIJO = os.getenv("ESTADO_PREFIJO", "agenza:estado:")
+ESTADO_BLOQUEO_MS = int(os.getenv("ESTADO_BLOQUEO_MS", "30000"))    # el candado vence solo si el worker muere
+ESTADO_ESPERA_BLOQUEO = float(os.getenv("ESTADO_ESPERA_BLOQUEO", "10"))  # máx. segundos esperando el candado
+
+
+class EstadoOcupado(Exception):
+    """Otro worker tiene tomada la conversación más tiempo del permitido."""
+
+# ==============================================================
+# INTERFAZ
+# ==============================================================
+
+class EstadoStore(abc.ABC):
+    """
+    Interfaz común: get devuelve None si el teléfono no tiene conversación viva.
+    Un get → set de la misma conversación va dentro de `bloquear(telefono)`.
+    """
+
+    async def abrir(self):
+        pass
+
+    async def cerrar(self):
+        pass
+
+    @asynccontextmanager
+    async def bloquear(self, telefono: str) -> AsyncIterator[None]:
+        # Un solo proceso: la cola ya procesa cada teléfono en su carril, de a uno
+        yield
+
+    @abc.abstractmethod
+    async def get(self, telefono: str) -> Optional[EstadoConversacion]:
+        ...
+
+    @abc.abstractmethod
+    async def set(self, telefono: str, datos: EstadoConversacion):
+        ...
+
+    @abc.abstractmethod
+    async def borrar(self, telefono: str):
+        ...
+
+# ==============================================================
+# 1. MEMORIA (LRU + TTL, un solo proceso)
+# ==============================================================
+
+class MemoriaStore(EstadoStore):
+
+    def __init__(self, max_entradas: int = ESTADO_MAX_MEMORIA, ttl: int = ESTADO_TTL):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos: "OrderedDict[str, tuple]" = OrderedDict()  # telefono → (expira, bytes)
+
+    def __len__(self):
+        return len(self._datos)
+
+    async def get(self, telefono: str) -> Optional[EstadoConversacion]:
+        item = self._datos.get(telefono)
+        if item is None:
+            return None
+        expira, raw = item
+        if expira < time.monotonic():
+            del self._datos[telefono]
+            return None
+        self._datos.move_to_end(telefono)
+        return EstadoConversacion.de_bytes(raw)
+
+    async def set(self, telefono: str, datos: EstadoConversacion):
+        self._datos[telefono] = (time.monotonic() + self.ttl, datos.a_bytes())
+        self._datos.move_to_end(telefono)
+        while len(self._datos) > self.max_entradas:
+            self._datos.popitem(last=False)
+
+    async def borrar(self, telefono: str):
+        self._datos.pop(telefono, None)
+
+# ==============================================================
+# 2. REDIS (compartido entre workers/réplicas)
+# ==============================================================
+
+class RedisStore(EstadoStore):
+    """
+    Con varios workers, dos mensajes del mismo teléfono pueden caer en procesos
+    distintos: `bloquear` toma un candado por teléfono (SET NX PX) para que sus
+    get → set no se pisen.
+    """
+
+    def __init__(self, url: str, ttl: int = ESTADO_TTL, prefijo: str = ESTADO_PREFIJO,
+                 bloqueo_ms: int = ESTADO_BLOQUEO_MS, espera_bloqueo: float = ESTADO_ESPERA_BLOQUEO):
+        self.url = url
+        self.ttl = ttl
+        self.prefijo = prefijo
+        self.bloqueo_ms = bloqueo_ms
+        self.espera_bloqueo = espera_bloqueo
+        self._redis = None
+
+    async def abrir(self):
+        import redis.asyncio as redis  # dependencia opcional: solo si se configura REDIS_URL
+        self._redis = redis.from_url(self.url)
+        await self._redis.ping()
+        logger.info("Estado de conversaciones en Redis")
+
+    async def cerrar(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    @asynccontextmanager
+    async def bloquear(self, telefono: str) -> AsyncIterator[None]:
+        clave = self.prefijo + "bloqueo:" + telefono
+        token = secrets.token_hex(8)
+        limite = time.monotonic() + self.espera_bloqueo
+        espera = 0.005
+        while not await self._redis.set(clave, token, nx=True, px=self.bloqueo_ms):
+            if time.monotonic() >= limite:
+                raise EstadoOcupado(f"Conversación de {telefono} bloqueada por otro worker")
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, 0.1)
+        try:
+            yield
+        finally:
+            await self._soltar(clave, token)
+
+    async def _soltar(self, clave: str, token: str):
+        # Borra el candado solo si sigue siendo nuestro (pudo vencer y tomarlo otro)
+        from redis.exceptions import WatchError
+        async with self._redis.pipeline() as pipe:
+            try:
+                await pipe.watch(clave)
+                if await pipe.get(clave) == token.encode():
+                    pipe.multi()
+                    pipe.delete(clave)
+                    await pipe.execute()
+            except WatchError:
+                pass  # cambió entre el GET y el DEL: ya no era nuestro
+
+    async def get(self, telefono: str) -> Optional[EstadoConversacion]:
+        raw = await self._redis.get(self.prefijo + telefono)
+        return EstadoConversacion.de_bytes(raw) if raw is not None else None
+
+    async def set(self, telefono: str, datos: EstadoConversacion):
+        await self._redis.set(self.prefijo + telefono, datos.a_bytes(), ex=self.ttl)
+
+    async def borrar(self, telefono: str):
+        await self._redis.delete(self.prefijo + telefono)
+
+
+def crear_store() -> EstadoStore:
+    if REDIS_URL:
+        return RedisStore(REDIS_URL)
+    return MemoriaStore()
@@ -0,0 +1,354 @@
+# flujo_conversacion.py → MÁQUINA DE ESTADOS DEL BOT (tabla estado → handler)
+
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Awaitable, Callable, Dict, FrozenSet, List, Optional
+from loguru import logger
+from db_service import (
+    consultar_disponibilidad_async, reservar_cita_async, citas_de_paciente_async, cancelar_cita_async,
+    proximos_bloques_async, PROXIMOS_BLOQUES_DIAS,
+)
+from estado_conversacion import EstadoConversacion, hora_a_minutos, minutos_a_hora
+from disponibilidad_reglas import (
+    DISPONIBILIDAD_MOTOR, consultar_disponibilidad_reglas_async, proximos_reglas_async, materializar_bloque_async,
+)
+import catalogo
+import plantillas_mensajes as plantillas
+
+# ==============================================================
+# CONFIG
+# ==============================================================
+
+# Tras este tiempo sin respuesta, un paso a medio camino vuelve al saludo inicial
+FLUJO_TIMEOUT = int(os.getenv("FLUJO_TIMEOUT", "1800"))
+
+# Horas de un día: bloques ya generados, o calculadas desde las plantillas
+# (en ese caso el bloque llega sin id y se materializa al reservar)
+consultar_horas = consultar_disponibilidad_reglas_async if DISPONIBILIDAD_MOTOR == "reglas" else consultar_disponibilidad_async
+proximas_horas = proximos_reglas_async if DISPONIBILIDAD_MOTOR == "reglas" else proximos_bloques_async
+
+# ==============================================================
+# REGISTRO DE ESTADOS
+# ==============================================================
+
+@dataclass(slots=True)
+class Contexto:
+    telefono: str
+    texto: str
+    estado: EstadoConversacion
+    enviar: Callable[[str], Awaitable[None]]
+    guardar: Callable[[EstadoConversacion], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class Paso:
+    nombre: str
+    handler: Callable[[Contexto], Awaitable[None]]
+    timeout: Optional[int]          # segundos; None = no vence
+    siguientes: FrozenSet[str]      # transiciones permitidas (además de quedarse)
+
+
+ESTADOS: Dict[str, Paso] = {}
+
+def estado(nombre: str, siguientes=(), timeout: Optional[int] = FLUJO_TIMEOUT):
+    """Registra el handler de un estado: @estado("menu", siguientes=("elegir_medico",))."""
+    def registrar(handler):
+        ESTADOS[nombre] = Paso(nombre, handler, timeout, frozenset(siguientes))
+        return handler
+    return registrar
+
+# ==============================================================
+# PARSERS (precompilados)
+# ==============================================================
+
+_RE_NUMERO = re.compile(r"^\s*(\d{1,3})\s*$")
+_RE_FECHA = re.compile(r"^\s*(\d{1,2})-(\d{1,2})-(\d{4})\s*$")
+
+PALABRAS_PROXIMA = frozenset({"proxima", "próxima", "proximas", "próximas"})
+PALABRAS_MAS = frozenset({"mas", "más"})
+
+def leer_indice(texto: str) -> Optional[int]:
+    """'3' → 2 (índice 0-based); None si no es un número de lista válido."""
+    m = _RE_NUMERO.match(texto)
+    if not m or int(m.group(1)) < 1:
+        return None
+    return int(m.group(1)) - 1
+
+def leer_fecha(texto: str) -> Optional[date]:
+    m = _RE_FECHA.match(texto)
+    if not m:
+        return None
+    try:
+        return date(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+    except ValueError:
+        return None
+
+def leer_rut(texto: str) -> Optional[str]:
+    """'12.345.678-9' → '123456789' (mismo formato con que se guarda el paciente)."""
+    rut = texto.strip().replace(".", "").replace("-", "").lower()
+    if not rut[:-1].isdigit() or len(rut) < 8:
+        return None
+    return rut
+
+def leer_opcion_menu(texto: str, opciones: str = "123") -> Optional[str]:
+    """Primera opción (en orden de prioridad) que aparece en el texto: 'quiero la 1' → '1'."""
+    return next((o for o in opciones if o in texto), None)
+
+# ==============================================================
+# PERFIL (tiempo por estado)
+# ==============================================================
+
+_perfil: Dict[str, List[float]] = {}   # estado → [mensajes, segundos_total, segundos_max]
+ganchos_perfil: List[Callable[[str, float], None]] = []   # p. ej. exportar a un APM
+
+def _registrar_tiempo(nombre: str, segundos: float):
+    fila = _perfil.setdefault(nombre, [0, 0.0, 0.0])
+    fila[0] += 1
+    fila[1] += segundos
+    fila[2] = max(fila[2], segundos)
+    for gancho in ganchos_perfil:
+        gancho(nombre, segundos)
+
+def perfil() -> Dict[str, Dict[str, float]]:
+    return {
+        nombre: {"mensajes": n, "promedio_ms": round(total / n * 1000, 2), "max_ms": round(maximo * 1000, 2)}
+        for nombre, (n, total, maximo) in _perfil.items()
+    }
+
+# ==============================================================
+# DESPACHO
+# ==============================================================
+
+def _vencido(ctx: Contexto, paso: Paso) -> bool:
+    return paso.timeout is not None and ctx.estado.actualizado and time.time() - ctx.estado.actualizado > paso.timeout
+
+async def despachar(ctx: Contexto):
+    """Ejecuta el handler del estado actual (búsqueda O(1) en la tabla)."""
+    paso = ESTADOS.get(ctx.estado.estado)
+    if paso is None or _vencido(ctx, paso):
+        paso = ESTADOS["inicio"]
+        ctx.estado = EstadoConversacion()
+
+    guardar = ctx.guardar
+
+    async def guardar_validando(nuevo: EstadoConversacion):
+        if nuevo.estado != paso.nombre and nuevo.estado not in paso.siguientes:
+            logger.warning(f"Transición no declarada {paso.nombre} → {nuevo.estado}")
+        await guardar(nuevo)
+
+    ctx.guardar = guardar_validando
+    inicio = time.perf_counter()
+    try:
+        await paso.handler(ctx)
+    finally:
+        _registrar_tiempo(paso.nombre, time.perf_counter() - inicio)
+
+# ==============================================================
+# HANDLERS
+# ==============================================================
+
+@estado("inicio", siguientes=("menu",), timeout=None)
+async def _inicio(ctx: Contexto):
+    await ctx.enviar(plantillas.BIENVENIDA)
+    await ctx.guardar(EstadoConversacion(estado="menu"))
+
+
+@estado("menu", siguientes=("elegir_medico", "ver_citas", "cancelar_rut"))
+async def _menu(ctx: Contexto):
+    opcion = leer_opcion_menu(ctx.texto)
+    if opcion == "1":
+        version, medicos = await catalogo.obtener_medicos_async()
+        if not medicos:
+            await ctx.enviar("Lo siento, no hay médicos disponibles ahora.")
+            return
+        await ctx.enviar(plantillas.menu_medicos(version, medicos))
+        await ctx.guardar(EstadoConversacion(estado="elegir_medico", version_catalogo=version))
+    elif opcion == "2":
+        await ctx.enviar("Para ver citas, envía tu RUT (ej: 12.345.678-9)")
+        await ctx.guardar(EstadoConversacion(estado="ver_citas"))
+    elif opcion == "3":
+        await ctx.enviar("Para cancelar, envía tu RUT (ej: 12.345.678-9)")
+        await ctx.guardar(EstadoConversacion(estado="cancelar_rut"))
+    else:
+        await ctx.enviar("Opción no válida. Escribe 1 para agendar.")
+
+
+@estado("elegir_medico", siguientes=("elegir_fecha", "elegir_proximo", "menu"))
+async def _elegir_medico(ctx: Contexto):
+    medicos = await catalogo.medicos_de_version_async(ctx.estado.version_catalogo)
+    if medicos is None:
+        await ctx.enviar("La lista de médicos cambió. Escribe 1 para verla de nuevo.")
+        await ctx.guardar(EstadoConversacion(estado="menu"))
+        return
+    idx = leer_indice(ctx.texto)
+    if idx is None:
+        alcance = tuple(m["id_medico"] for m in medicos if m["especialidad"].lower() == ctx.texto)
+        if alcance:
+            await _ofrecer_proximos(ctx, alcance)
+            return
+    if idx is None or idx >= len(medicos):
+        await ctx.enviar("Número inválido. Escribe solo el número del médico.")
+        return
+    medico = medicos[idx]
+    await ctx.enviar(plantillas.medico_elegido(medico["nombre"]))
+    await ctx.guardar(ctx.estado.con(estado="elegir_fecha", medico_id=medico["id_medico"]))
+
+
+@estado("elegir_fecha", siguientes=("elegir_hora", "elegir_proximo"))
+async def _elegir_fecha(ctx: Contexto):
+    if ctx.texto in PALABRAS_PROXIMA:
+        await _ofrecer_proximos(ctx, (ctx.estado.medico_id,))
+        return
+    fecha = leer_fecha(ctx.texto)
+    if fecha is None:
+        await ctx.enviar("Formato inválido. Usa DD-MM-YYYY")
+        return
+    if fecha < date.today():
+        await ctx.enviar("Fecha inválida. Elige una fecha futura.")
+        return
+    bloques = await consultar_horas(ctx.estado.medico_id, fecha)
+    if not bloques:
+        await ctx.enviar("No hay horarios disponibles esa fecha. Elige otra.")
+        return
+    await ctx.enviar(plantillas.lista_horas(ctx.texto, bloques))
+    await ctx.guardar(ctx.estado.con(
+        estado="elegir_hora", fecha=fecha,
+        bloque_ids=tuple(b["id_bloque"] for b in bloques),
+        horas=tuple(hora_a_minutos(b["hora_str"]) for b in bloques),
+    ))
+
+
+@estado("elegir_hora", siguientes=("datos_paciente",))
+async def _elegir_hora(ctx: Contexto):
+    idx = leer_indice(ctx.texto)
+    if idx is None or idx >= len(ctx.estado.bloque_ids):
+        await ctx.enviar("Número inválido.")
+        return
+    await ctx.enviar("Perfecto. Ahora dime:\n\n• Nombre completo\n• RUT (ej: 12.345.678-9)")
+    await ctx.guardar(ctx.estado.con(
+        estado="datos_paciente", bloque_id=ctx.estado.bloque_ids[idx], hora=ctx.estado.horas[idx],
+        bloque_ids=(), horas=(),
+    ))
+
+
+@estado("elegir_proximo", siguientes=("datos_paciente",))
+async def _elegir_proximo(ctx: Contexto):
+    e = ctx.estado
+    if ctx.texto in PALABRAS_MAS and e.bloque_ids:
+        # Con reglas las horas aún no tienen id_bloque: el cursor desempata por médico
+        desempate = e.medico_ids[-1] if DISPONIBILIDAD_MOTOR == "reglas" else e.bloque_ids[-1]
+        await _ofrecer_proximos(ctx, e.alcance, (date.fromordinal(e.fechas[-1]), minutos_a_hora(e.horas[-1]), desempate))
+        return
+    idx = leer_indice(ctx.texto)
+    if idx is None or idx >= len(e.bloque_ids):
+        await ctx.enviar("Número inválido. Escribe el número del horario o *más*.")
+        return
+    await ctx.enviar("Perfecto. Ahora dime:\n\n• Nombre completo\n• RUT (ej: 12.345.678-9)")
+    await ctx.guardar(e.con(
+        estado="datos_paciente", medico_id=e.medico_ids[idx], fecha=date.fromordinal(e.fechas[idx]),
+        bloque_id=e.bloque_ids[idx], hora=e.horas[idx],
+        bloque_ids=(), horas=(), fechas=(), medico_ids=(), alcance=(),
+    ))
+
+
+def _nombre_medico(medico_id: int) -> str:
+    return (catalogo.medico_por_id(medico_id) or {"nombre": ""})["nombre"]
+
+
+async def _ofrecer_proximos(ctx: Contexto, alcance: tuple, despues: Optional[tuple] = None):
+    """Muestra la siguiente página de horas libres de `alcance` (uno o varios médicos)."""
+    bloques = await proximas_horas(list(alcance), despues=despues)
+    if not bloques:
+        if despues:
+            await ctx.enviar("No hay más horas libres. Escribe el número de uno de los horarios anteriores.")
+        else:
+            await ctx.enviar(f"No hay horas libres en los próximos {PROXIMOS_BLOQUES_DIAS} días.")
+        return
+    await ctx.enviar(plantillas.lista_proximos(bloques, _nombre_medico if len(alcance) > 1 else None))
+    await ctx.guardar(ctx.estado.con(
+        estado="elegir_proximo", alcance=tuple(alcance),
+        bloque_ids=tuple(b["id_bloque"] for b in bloques),
+        horas=tuple(hora_a_minutos(b["hora_str"]) for b in bloques),
+        fechas=tuple(b["fecha"].toordinal() for b in bloques),
+        medico_ids=tuple(b["medico_id"] for b in bloques),
+    ))
+
+
+@estado("datos_paciente", siguientes=("inicio",))
+async def _datos_paciente(ctx: Contexto):
+    estado_actual = ctx.estado
+    lineas = [l.strip() for l in ctx.texto.split("\n") if l.strip()]
+    if len(lineas) < 2:
+        await ctx.enviar("Faltan datos. Nombre y RUT por favor.")
+        return
+    nombre = lineas[0]
+    rut = leer_rut(lineas[1])
+    if rut is None:
+        await ctx.enviar("RUT inválido. Ejemplo: 12345678-9")
+        return
+
+    id_bloque = estado_actual.bloque_id
+    if id_bloque is None:
+        id_bloque = await materializar_bloque_async(estado_actual.medico_id, estado_actual.fecha, estado_actual.hora)
+    exito = id_bloque is not None and await reservar_cita_async(
+        id_bloque=id_bloque,
+        rut=rut,
+        nombre_completo=nombre,
+        telefono=ctx.telefono,
+        id_medico=estado_actual.medico_id
+    )
+    if exito:
+        await catalogo.medicos_de_version_async(estado_actual.version_catalogo)  # asegura el catálogo en este proceso
+        medico = catalogo.medico_por_id(estado_actual.medico_id) or {"nombre": ""}
+        await ctx.enviar(plantillas.confirmacion(medico["nombre"], estado_actual.fecha, minutos_a_hora(estado_actual.hora), nombre))
+    else:
+        await ctx.enviar("Lo siento, ese horario ya fue tomado. Elige otro.")
+    await ctx.guardar(EstadoConversacion())
+
+
+@estado("ver_citas", siguientes=("menu",))
+async def _ver_citas(ctx: Contexto):
+    rut = leer_rut(ctx.texto)
+    if rut is None:
+        await ctx.enviar("RUT inválido. Ejemplo: 12345678-9")
+        return
+    citas = await citas_de_paciente_async(rut, ctx.telefono)
+    if not citas:
+        await ctx.enviar("No tienes citas próximas agendadas.\n\nEscribe 1 para agendar una.")
+    else:
+        await ctx.enviar(plantillas.lista_citas("Tus próximas citas:", citas, "Escribe 1 para agendar otra cita."))
+    await ctx.guardar(EstadoConversacion(estado="menu"))
+
+
+@estado("cancelar_rut", siguientes=("cancelar_elegir", "menu"))
+async def _cancelar_rut(ctx: Contexto):
+    rut = leer_rut(ctx.texto)
+    if rut is None:
+        await ctx.enviar("RUT inválido. Ejemplo: 12345678-9")
+        return
+    citas = await citas_de_paciente_async(rut, ctx.telefono)
+    if not citas:
+        await ctx.enviar("No tienes citas próximas para cancelar.\n\nEscribe 1 para agendar una.")
+        await ctx.guardar(EstadoConversacion(estado="menu"))
+        return
+    await ctx.enviar(plantillas.lista_citas("¿Qué cita deseas cancelar?", citas, "Escribe solo el número de la cita"))
+    await ctx.guardar(EstadoConversacion(
+        estado="cancelar_elegir", rut=rut, cita_ids=tuple(c["id_cita"] for c in citas),
+    ))
+
+
+@estado("cancelar_elegir", siguientes=("inicio",))
+async def _cancelar_elegir(ctx: Contexto):
+    idx = leer_indice(ctx.texto)
+    if idx is None or idx >= len(ctx.estado.cita_ids):
+        await ctx.enviar("Número inválido.")
+        return
+    if await cancelar_cita_async(ctx.estado.cita_ids[idx], ctx.estado.rut, ctx.telefono):
+        await ctx.enviar("Cita cancelada ✅\n\nEl horario quedó libre. Escríbenos cuando quieras agendar otra.")
+    else:
+        await ctx.enviar("No pudimos cancelar esa cita (puede que ya estuviera cancelada).")
+    await ctx.guardar(EstadoConversacion())
+
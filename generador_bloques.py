@@ -0,0 +1,133 @@
+# generador_bloques.py → GENERA bloques_disponibles DESDE LAS PLANTILLAS SEMANALES (COPY masivo)
+#
+#   python generador_bloques.py [semanas]
+#
+# Tablas: migraciones/005_horarios_medicos.sql (duracion_min del bloque: 007_duracion_bloques.sql)
+
+import asyncio
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import date, time as hora, timedelta
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from loguru import logger
+from db_service import pool_async, abrir_pool_async, cerrar_pool_async, cache_disponibilidad
+
+# ==============================================================
+# CONFIG
+# ==============================================================
+
+GENERADOR_SEMANAS = int(os.getenv("GENERADOR_SEMANAS", "8"))
+
+# (medico_id, inicio, fin, duracion, vigente_desde, vigente_hasta) por día ISO de la
+# semana, en minutos desde medianoche. También lo usa disponibilidad_reglas.py.
+Tramos = Dict[int, List[Tuple[int, int, int, int, Optional[date], Optional[date]]]]
+
+SQL_PLANTILLAS = """
+    SELECT medico_id, dia_semana,
+           EXTRACT(EPOCH FROM hora_inicio)::int / 60, EXTRACT(EPOCH FROM hora_fin)::int / 60,
+           duracion_min, vigente_desde, vigente_hasta
+    FROM horarios_medicos
+"""
+
+SQL_PLANTILLAS_MEDICOS = SQL_PLANTILLAS + "    WHERE medico_id = ANY(%s::int[])\n"
+
+SQL_FERIADOS = "SELECT fecha FROM feriados WHERE fecha BETWEEN %s AND %s"
+
+# ON COMMIT DROP: la tabla temporal vive solo durante la transacción
+SQL_TABLA_TEMPORAL = """
+    CREATE TEMP TABLE bloques_nuevos (
+        medico_id INTEGER, fecha DATE, hora_inicio TIME, duracion_min SMALLINT
+    ) ON COMMIT DROP
+"""
+
+SQL_COPY = "COPY bloques_nuevos (medico_id, fecha, hora_inicio, duracion_min) FROM STDIN (FORMAT BINARY)"
+
+# Los bloques ya existentes (incluso reservados) no se tocan
+SQL_INSERTAR_NUEVOS = """
+    INSERT INTO bloques_disponibles (medico_id, fecha, hora_inicio, duracion_min)
+    SELECT medico_id, fecha, hora_inicio, duracion_min FROM bloques_nuevos
+    ON CONFLICT (medico_id, fecha, hora_inicio) DO NOTHING
+"""
+
+# ==============================================================
+# EXPANSIÓN (plantilla semanal → bloques)
+# ==============================================================
+
+_HORAS = [hora(m // 60, m % 60) for m in range(24 * 60)]   # minuto → time, sin crear uno por bloque
+
+def agrupar_tramos(filas) -> Tramos:
+    """Filas de SQL_PLANTILLAS → tramos por día de la semana."""
+    tramos: Tramos = defaultdict(list)
+    for medico_id, dia, inicio, fin, duracion, desde, hasta in filas:
+        tramos[dia].append((medico_id, inicio, fin, duracion, desde, hasta))
+    return tramos
+
+def expandir(tramos: Tramos, feriados: Set[date], desde: date, dias: int) -> Iterator[Tuple[int, date, int, range, int]]:
+    """
+    (medico_id, fecha, d, inicios, duracion) de cada tramo vigente en los `dias`
+    desde `desde`, saltando feriados. `d` es el número de día desde `desde` e
+    `inicios` el range de minutos de inicio de sus bloques.
+    """
+    for d in range(dias):
+        fecha = desde + timedelta(days=d)
+        if fecha in feriados:
+            continue
+        for medico_id, inicio, fin, duracion, vigente_desde, vigente_hasta in tramos.get(fecha.isoweekday(), ()):
+            if (vigente_desde and fecha < vigente_desde) or (vigente_hasta and fecha > vigente_hasta):
+                continue
+            yield medico_id, fecha, d, range(inicio, fin - duracion + 1, duracion), duracion
+
+# ==============================================================
+# GENERACIÓN
+# ==============================================================
+
+async def generar_bloques_async(semanas: int = GENERADOR_SEMANAS, desde: Optional[date] = None) -> int:
+    """
+    Crea los bloques de las próximas `semanas` para todos los médicos con
+    plantilla. Los bloques van por COPY binario a una tabla temporal y de ahí
+    a bloques_disponibles en un solo INSERT ... ON CONFLICT DO NOTHING:
+    re-ejecutarlo solo agrega lo que falta. Devuelve cuántos bloques creó.
+    """
+    desde = desde or date.today()
+    hasta = desde + timedelta(days=semanas * 7 - 1)
+    inicio = time.monotonic()
+    async with pool_async.connection() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await cur.execute(SQL_PLANTILLAS)
+                tramos = agrupar_tramos(await cur.fetchall())
+                await cur.execute(SQL_FERIADOS, (desde, hasta))
+                feriados = {fila[0] for fila in await cur.fetchall()}
+
+                await cur.execute(SQL_TABLA_TEMPORAL)
+                generados = 0
+                async with cur.copy(SQL_COPY) as copy:
+                    copy.set_types(["int4", "date", "time", "int2"])
+                    for medico_id, fecha, _, inicios, duracion in expandir(tramos, feriados, desde, semanas * 7):
+                        for m in inicios:
+                            await copy.write_row((medico_id, fecha, _HORAS[m], duracion))
+                        generados += len(inicios)
+
+                await cur.execute(SQL_INSERTAR_NUEVOS)
+                creados = cur.rowcount
+    cache_disponibilidad.limpiar()  # lo cacheado en este proceso no incluye los nuevos
+    logger.success(
+        f"Bloques {desde} → {hasta}: {creados} nuevos de {generados} generados "
+        f"({time.monotonic() - inicio:.1f}s)"
+    )
+    return creados
+
+def generar_bloques(semanas: int = GENERADOR_SEMANAS) -> int:
+    """Ejecución manual como script: abre su propio pool."""
+    async def _run():
+        await abrir_pool_async()
+        try:
+            return await generar_bloques_async(semanas)
+        finally:
+            await cerrar_pool_async()
+    return asyncio.run(_run())
+
+if __name__ == "__main__":
+    generar_bloques(int(sys.argv[1]) if len(sys.argv) > 1 else GENERADOR_SEMANAS)
@@ -0,0 +1,71 @@
+# loteador.py → AGRUPA CONSULTAS CONCURRENTES EN UNA SOLA (micro-lotes)
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+
+class Loteador:
+    """
+    Las claves pedidas dentro de una ventana corta (o hasta max_lote) se
+    resuelven juntas con una sola llamada a cargar_lote(claves) → {clave: valor}.
+    Una clave ausente en el resultado recibe `por_defecto`.
+    """
+
+    def __init__(self, cargar_lote: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+                 ventana: float = 0.002, max_lote: int = 200, por_defecto: Any = None):
+        self.cargar_lote = cargar_lote
+        self.ventana = ventana
+        self.max_lote = max_lote
+        self.por_defecto = por_defecto
+        self._pendientes: Dict[Hashable, asyncio.Future] = {}
+        self._tarea: Optional[asyncio.Task] = None
+        # El loop solo guarda referencias débiles a sus tareas: un lote en vuelo
+        # sin referencia puede ser recolectado y dejar a sus llamadores esperando
+        self._en_vuelo: Set[asyncio.Task] = set()
+        self.lotes = 0
+        self.claves = 0
+
+    async def cargar(self, clave: Hashable) -> Any:
+        fut = self._pendientes.get(clave)
+        if fut is None:
+            fut = self._pendientes[clave] = asyncio.get_running_loop().create_future()
+            if len(self._pendientes) >= self.max_lote:
+                self._despachar()
+            elif self._tarea is None:
+                self._tarea = asyncio.create_task(self._esperar_y_despachar())
+        return await asyncio.shield(fut)
+
+    async def _esperar_y_despachar(self):
+        await asyncio.sleep(self.ventana)
+        self._tarea = None
+        self._despachar()
+
+    def _despachar(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            self._tarea = None
+        lote, self._pendientes = self._pendientes, {}
+        if lote:
+            tarea = asyncio.create_task(self._resolver(lote))
+            self._en_vuelo.add(tarea)
+            tarea.add_done_callback(self._en_vuelo.discard)
+
+    async def _resolver(self, lote: Dict[Hashable, asyncio.Future]):
+        self.lotes += 1
+        self.claves += len(lote)
+        try:
+            resultado = await self.cargar_lote(list(lote))
+        except Exception as e:
+            for fut in lote.values():
+                if not fut.done():
+                    fut.set_exception(e)
+                fut.exception()  # evita "exception was never retrieved" si nadie espera ya
+            return
+        except BaseException:
+            # Cancelado (p. ej. al apagar la app): quien esperaba recibe CancelledError, no queda colgado
+            for fut in lote.values():
+                fut.cancel()
+            raise
+        for clave, fut in lote.items():
+            if not fut.done():
+                fut.set_result(resultado.get(clave, self.por_defecto))
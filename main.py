@@ -2,14 +2,24 @@
 
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import PlainTextResponse, JSONResponse
+from contextlib import asynccontextmanager
 import os
-import requests
-from datetime import datetime, date
+import time
+from datetime import datetime
 import pytz
 from loguru import logger
-from db_service import obtener_lista_medicos, consultar_disponibilidad, reservar_cita
-
-app = FastAPI()
+from db_service import (
+    cache_disponibilidad, cache_citas_paciente, loteador_disponibilidad, abrir_pool_async, cerrar_pool_async, estadisticas_pool,
+)
+from ycloud_client import YCloudClient
+from cola_mensajes import ColaMensajes, ColaLlena
+from estado_store import crear_store
+from deduplicacion import IndiceVistos
+from estado_conversacion import EstadoConversacion
+import catalogo
+import flujo_conversacion
+from plantillas_mensajes import trocear
+import programador
 
 # ====================== CONFIG YCLOUD ======================
 API_KEY = os.getenv("YCLOUD_API_KEY")
@@ -17,26 +27,60 @@ PHONE_ID = os.getenv("YCLOUD_PHONE_ID")
 VERIFY_TOKEN = os.getenv("WEBHOOK_VERIFY_TOKEN", "clinica2025")
 CHILE_TZ = pytz.timezone("America/Santiago")
 
-# ====================== ESTADO EN MEMORIA ======================
-conversaciones = {}
+# Un solo cliente (pool keep-alive) para todos los envíos del proceso
+ycloud = YCloudClient(API_KEY, PHONE_ID)
+
+# IDs de mensajes ya aceptados: los reintentos de YCloud se descartan al entrar
+vistos = IndiceVistos()
+
+# ====================== CICLO DE VIDA ======================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El pool se precalienta antes de aceptar tráfico: Railway no enruta hasta que termine el arranque
+    await abrir_pool_async()
+    await ycloud.abrir()
+    await conversaciones.abrir()
+    await vistos.abrir()
+    await cola.iniciar()
+    catalogo.iniciar_escucha()
+    programador.iniciar(ycloud)
+    try:
+        yield
+    finally:
+        programador.detener()
+        catalogo.detener_escucha()
+        await cola.detener()
+        await vistos.cerrar()
+        await conversaciones.cerrar()
+        await ycloud.cerrar()
+        await cerrar_pool_async()
+
+app = FastAPI(lifespan=lifespan)
+
+# ====================== ESTADO DE CONVERSACIONES ======================
+# Memoria LRU+TTL por defecto; Redis si hay REDIS_URL (necesario con varios workers)
+conversaciones = crear_store()
 
 # ====================== ENVIAR MENSAJE ======================
 async def enviar_mensaje(to: str, texto: str):
-    url = f"https://api.ycloud.com/v2/api/whatsapp/{PHONE_ID}/messages"
-    payload = {"to": to, "type": "text", "text": {"body": texto}}
-    headers = {"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"}
-    try:
-        requests.post(url, json=payload, headers=headers, timeout=10)
-        logger.success(f"Enviado a {to}")
-    except Exception as e:
-        logger.error(f"Error enviando: {e}")
+    # Textos sobre el límite de WhatsApp salen en varios mensajes, en orden
+    for parte in trocear(texto):
+        try:
+            resp = await ycloud.enviar_texto(to, parte)
+            if resp.status_code >= 400:
+                logger.error(f"Error enviando a {to}: HTTP {resp.status_code} {resp.text[:200]}")
+                return
+            logger.success(f"Enviado a {to}")
+        except Exception as e:
+            logger.error(f"Error enviando: {e}")
+            return
 
 # ====================== GET/SET ESTADO ======================
-async def get_estado(telefono: str):
-    return conversaciones.get(telefono, {"estado": "inicio"})
+async def get_estado(telefono: str) -> EstadoConversacion:
+    return await conversaciones.get(telefono) or EstadoConversacion()
 
-async def set_estado(telefono: str, datos: dict):
-    conversaciones[telefono] = datos
+async def set_estado(telefono: str, datos: EstadoConversacion):
+    await conversaciones.set(telefono, datos.con(actualizado=int(time.time())))
 
 # ====================== WEBHOOK ======================
 @app.get("/webhook")
@@ -47,107 +91,67 @@ async def verify(request: Request):
 
 @app.post("/webhook")
 async def webhook(request: Request):
-    data = await request.json()
-    if "messages" not in data:
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(400, "JSON inválido")
+    mensajes = data.get("messages") if isinstance(data, dict) else None
+    if not isinstance(mensajes, list):
         return {"status": "ok"}
 
-    for msg in data["messages"]:
-        telefono = msg["from"]
-        texto = msg.get("text", {}).get("body", "").strip().lower()
-
-        estado = await get_estado(telefono)
-
-        # FLUJO COMPLETO CON NEON DB
-        if estado["estado"] == "inicio":
-            await enviar_mensaje(telefono, "¡Hola! Bienvenido(a) a *Clínica Sonrisas*\n\n¿Qué deseas?\n1️⃣ Agendar cita\n2️⃣ Ver mis citas\n3️⃣ Cancelar cita")
-            await set_estado(telefono, {"estado": "menu"})
-
-        elif estado["estado"] == "menu":
-            if "1" in texto:
-                medicos = obtener_lista_medicos()
-                if not medicos:
-                    await enviar_mensaje(telefono, "Lo siento, no hay médicos disponibles ahora.")
-                    return
-                respuesta = "Elige tu médico:\n\n"
-                for i, m in enumerate(medicos, 1):
-                    respuesta += f"{i}️⃣ Dr(a). {m['nombre']} - {m['especialidad']}\n"
-                respuesta += "\nEscribe solo el número 👆"
-                await enviar_mensaje(telefono, respuesta)
-                await set_estado(telefono, {"estado": "elegir_medico", "medicos": medicos})
-            elif "2" in texto:
-                await enviar_mensaje(telefono, "Para ver citas, envía tu RUT (ej: 12.345.678-9)")
-                await set_estado(telefono, {"estado": "ver_citas"})
-            else:
-                await enviar_mensaje(telefono, "Opción no válida. Escribe 1 para agendar.")
-
-        elif estado["estado"] == "elegir_medico":
-            try:
-                idx = int(texto) - 1
-                medico = estado["medicos"][idx]
-                await enviar_mensaje(telefono, f"Perfecto, Dr(a). {medico['nombre']}\n\n¿Para qué fecha? (ej: 20-11-2025)")
-                await set_estado(telefono, {"estado": "elegir_fecha", "medico_id": medico["id_medico"], "medico_nombre": medico["nombre"]})
-            except:
-                await enviar_mensaje(telefono, "Número inválido. Escribe solo el número del médico.")
-
-        elif estado["estado"] == "elegir_fecha":
-            try:
-                fecha = datetime.strptime(texto, "%d-%m-%Y").date()
-                if fecha < date.today():
-                    await enviar_mensaje(telefono, "Fecha inválida. Elige una fecha futura.")
-                    return
-                bloques = consultar_disponibilidad(estado["medico_id"], fecha)
-                if not bloques:
-                    await enviar_mensaje(telefono, "No hay horarios disponibles esa fecha. Elige otra.")
-                    return
-                respuesta = f"Horarios disponibles {texto}:\n\n"
-                for i, b in enumerate(bloques, 1):
-                    respuesta += f"{i}️⃣ {b['hora_str']}\n"
-                respuesta += "\nEscribe solo el número del horario"
-                await enviar_mensaje(telefono, respuesta)
-                await set_estado(telefono, {**estado, "estado": "elegir_hora", "fecha": fecha, "bloques": bloques})
-            except:
-                await enviar_mensaje(telefono, "Formato inválido. Usa DD-MM-YYYY")
-
-        elif estado["estado"] == "elegir_hora":
-            try:
-                idx = int(texto) - 1
-                bloque = estado["bloques"][idx]
-                await enviar_mensaje(telefono, "Perfecto. Ahora dime:\n\n• Nombre completo\n• RUT (ej: 12.345.678-9)")
-                await set_estado(telefono, {**estado, "estado": "datos_paciente", "bloque_id": bloque["id_bloque"]})
-            except:
-                await enviar_mensaje(telefono, "Número inválido.")
-
-        elif estado["estado"] == "datos_paciente":
-            lineas = [l.strip() for l in texto.split("\n") if l.strip()]
-            if len(lineas) < 2:
-                await enviar_mensaje(telefono, "Faltan datos. Nombre y RUT por favor.")
-                return
-            nombre = lineas[0]
-            rut = lineas[1].replace(".", "").replace("-", "").lower()
-            if not rut[:-1].isdigit() or len(rut) < 8:
-                await enviar_mensaje(telefono, "RUT inválido. Ejemplo: 12345678-9")
-                return
-
-            exito = reservar_cita(
-                id_bloque=estado["bloque_id"],
-                rut=rut,
-                nombre_completo=nombre,
-                telefono=telefono,
-                id_medico=estado["medico_id"]
-            )
-            if exito:
-                await enviar_mensaje(telefono, f"¡CITA CONFIRMADA! 🎉\n\nDr(a). {estado['medico_nombre']}\nFecha: {estado['fecha'].strftime('%d-%m-%Y')}\nHora: {estado['bloques'][idx]['hora_str']}\nPaciente: {nombre}\n\n¡Te esperamos! 😊\nDirección: Av. Siempre Viva 123, Santiago")
-            else:
-                await enviar_mensaje(telefono, "Lo siento, ese horario ya fue tomado. Elige otro.")
-            await set_estado(telefono, {"estado": "inicio"})
-
-        elif estado["estado"] == "ver_citas":
-            # Aquí puedes agregar consulta real a Neon
-            await enviar_mensaje(telefono, "Para ver citas, envía tu RUT (ej: 12.345.678-9)")
-            await set_estado(telefono, {"estado": "menu"})
-
+    # Solo validar y encolar: el procesamiento ocurre en la cola de workers.
+    # Cada mensaje va al carril de su teléfono: teléfonos distintos del mismo
+    # payload avanzan en paralelo y los de un mismo teléfono en orden.
+    for msg in mensajes:
+        if not isinstance(msg, dict) or not msg.get("from"):
+            logger.warning(f"Mensaje sin remitente descartado: {str(msg)[:200]}")
+            continue
+        msg_id = msg.get("id")
+        if msg_id and not await vistos.es_nuevo(msg_id):
+            continue  # reintento de YCloud: ya está procesado o en cola
+        try:
+            await cola.encolar(msg)
+        except ColaLlena as e:
+            logger.warning(str(e))
+            if msg_id:
+                await vistos.olvidar(msg_id)
+            raise HTTPException(503, "Cola llena, reintentar")
     return {"status": "ok"}
 
+# ====================== PROCESAR MENSAJE ======================
+async def procesar_mensaje(msg: dict):
+    telefono = msg["from"]
+    texto = ((msg.get("text") or {}).get("body") or "").strip().lower()  # imágenes/audio → texto vacío
+
+    # FLUJO COMPLETO CON NEON DB: cada estado tiene su handler en flujo_conversacion.py
+    # Leer y guardar el estado bajo el candado del teléfono (otro worker puede tener su siguiente mensaje)
+    async with conversaciones.bloquear(telefono):
+        await flujo_conversacion.despachar(flujo_conversacion.Contexto(
+            telefono=telefono,
+            texto=texto,
+            estado=await get_estado(telefono),
+            enviar=lambda respuesta: enviar_mensaje(telefono, respuesta),
+            guardar=lambda estado: set_estado(telefono, estado),
+        ))
+
+# ====================== COLA DE TRABAJO ======================
+cola = ColaMensajes(procesar_mensaje)
+
 @app.get("/")
 async def root():
-    return {"status": "Bot citas 24/7 activo", "hora_chile": datetime.now(CHILE_TZ).strftime("%d-%m-%Y %H:%M")}
\ No newline at end of file
+    return {"status": "Bot citas 24/7 activo", "hora_chile": datetime.now(CHILE_TZ).strftime("%d-%m-%Y %H:%M")}
+
+@app.get("/metricas")
+async def metricas():
+    return {
+        "catalogo": catalogo.estadisticas(),
+        "disponibilidad": {
+            **cache_disponibilidad.estadisticas(),
+            "lotes_bd": loteador_disponibilidad.lotes,
+            "claves_bd": loteador_disponibilidad.claves,
+        },
+        "citas_paciente": cache_citas_paciente.estadisticas(),
+        "pool": estadisticas_pool(),
+        "vistos": vistos.estadisticas(),
+        "flujo": flujo_conversacion.perfil(),
+    }
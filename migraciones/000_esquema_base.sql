@@ -0,0 +1,45 @@
+-- 000 → Esquema base del bot (idempotente: en una BD existente no cambia nada)
+
+CREATE TABLE IF NOT EXISTS medicos (
+    id_medico     SERIAL PRIMARY KEY,
+    nombre        TEXT NOT NULL,
+    especialidad  TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS pacientes (
+    id_paciente      SERIAL PRIMARY KEY,
+    rut              TEXT NOT NULL UNIQUE,      -- normalizado: sin puntos ni guion
+    nombre_completo  TEXT NOT NULL,
+    telefono_wsp     TEXT
+);
+
+CREATE TABLE IF NOT EXISTS bloques_disponibles (
+    id_bloque    SERIAL PRIMARY KEY,
+    medico_id    INTEGER NOT NULL REFERENCES medicos (id_medico),
+    fecha        DATE    NOT NULL,
+    hora_inicio  TIME    NOT NULL,
+    estado       TEXT    NOT NULL DEFAULT 'DISPONIBLE',   -- DISPONIBLE | RESERVADO
+    paciente_id  INTEGER REFERENCES pacientes (id_paciente)
+);
+
+CREATE TABLE IF NOT EXISTS citas_agendadas (
+    id_cita      SERIAL PRIMARY KEY,
+    bloque_id    INTEGER NOT NULL REFERENCES bloques_disponibles (id_bloque),
+    paciente_id  INTEGER NOT NULL REFERENCES pacientes (id_paciente),
+    medico_id    INTEGER NOT NULL REFERENCES medicos (id_medico),
+    estado_cita  TEXT    NOT NULL DEFAULT 'CONFIRMADA',   -- CONFIRMADA | CANCELADA
+    creada_en    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Avisa a catalogo.py (LISTEN catalogo_medicos) cuando cambia la lista de médicos
+CREATE OR REPLACE FUNCTION notificar_catalogo_medicos() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('catalogo_medicos', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_catalogo_medicos ON medicos;
+CREATE TRIGGER trg_catalogo_medicos
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON medicos
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_catalogo_medicos();
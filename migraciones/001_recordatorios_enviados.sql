@@ -0,0 +1,14 @@
+-- 001 → Registro idempotente de recordatorios enviados
+-- Una fila por (cita, tipo de recordatorio). Quien logra insertarla (o
+-- re-reclamarla si quedó colgada/fallida) es el único que envía.
+
+CREATE TABLE IF NOT EXISTS recordatorios_enviados (
+    cita_id        INTEGER     NOT NULL REFERENCES citas_agendadas (id_cita) ON DELETE CASCADE,
+    tipo           TEXT        NOT NULL,                       -- p. ej. 'DIA_ANTES'
+    estado         TEXT        NOT NULL DEFAULT 'ENVIANDO',    -- ENVIANDO | ENVIADO | FALLIDO
+    intentos       INTEGER     NOT NULL DEFAULT 1,
+    reclamado_por  TEXT,
+    reclamado_en   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    enviado_en     TIMESTAMPTZ,
+    PRIMARY KEY (cita_id, tipo)
+);
@@ -0,0 +1,10 @@
+-- 002 → Índices para "Ver mis citas" (búsqueda por RUT)
+-- La consulta va RUT → paciente → sus citas confirmadas → bloque/médico.
+-- Los INCLUDE permiten resolver los dos primeros pasos solo con el índice
+-- (index-only scan), sin visitar el heap de pacientes ni de citas.
+
+CREATE INDEX IF NOT EXISTS idx_pacientes_rut_cubre
+    ON pacientes (rut) INCLUDE (id_paciente);
+
+CREATE INDEX IF NOT EXISTS idx_citas_paciente_estado
+    ON citas_agendadas (paciente_id, estado_cita) INCLUDE (id_cita, bloque_id, medico_id);
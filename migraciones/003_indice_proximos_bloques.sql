@@ -0,0 +1,7 @@
+-- 003 → Índice para "próximas horas libres" (búsqueda en varios días)
+-- Igualdad en (medico_id, estado) y luego orden por (fecha, hora_inicio):
+-- la consulta recorre el índice ya ordenado desde el cursor y corta en LIMIT,
+-- sin ordenar ni leer bloques de otros médicos o ya reservados.
+
+CREATE INDEX IF NOT EXISTS idx_bloques_medico_estado_fecha_hora
+    ON bloques_disponibles (medico_id, estado, fecha, hora_inicio) INCLUDE (id_bloque);
@@ -0,0 +1,18 @@
+-- 004 → Índices para los caminos de acceso del bot
+-- Verificar con: python migrar.py verificar-planes
+
+-- consultar_disponibilidad (y su versión por lotes): solo se leen bloques
+-- libres, así el índice parcial no crece con el historial de reservados.
+CREATE INDEX IF NOT EXISTS idx_bloques_libres_medico_fecha
+    ON bloques_disponibles (medico_id, fecha, hora_inicio) INCLUDE (id_bloque)
+    WHERE estado = 'DISPONIBLE';
+
+-- Recordatorios: citas de un día (bloques por fecha → cita confirmada del bloque)
+CREATE INDEX IF NOT EXISTS idx_bloques_fecha_hora
+    ON bloques_disponibles (fecha, hora_inicio);
+
+-- Un bloque tiene a lo más una cita vigente; las canceladas no cuentan, así
+-- un bloque liberado por cancelar_cita se puede volver a reservar.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_citas_bloque_confirmada
+    ON citas_agendadas (bloque_id)
+    WHERE estado_cita = 'CONFIRMADA';
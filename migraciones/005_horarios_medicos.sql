@@ -0,0 +1,29 @@
+-- 005 → Plantillas semanales de atención y feriados (generador_bloques.py)
+
+-- Un tramo de atención por fila. Un día con colación son dos tramos
+-- (p. ej. 09:00-13:00 y 14:00-18:00): la pausa es el espacio entre ellos.
+CREATE TABLE IF NOT EXISTS horarios_medicos (
+    id_horario     SERIAL   PRIMARY KEY,
+    medico_id      INTEGER  NOT NULL REFERENCES medicos (id_medico) ON DELETE CASCADE,
+    dia_semana     SMALLINT NOT NULL CHECK (dia_semana BETWEEN 1 AND 7),   -- ISO: 1 = lunes
+    hora_inicio    TIME     NOT NULL,
+    hora_fin       TIME     NOT NULL,
+    duracion_min   SMALLINT NOT NULL DEFAULT 30 CHECK (duracion_min > 0),
+    vigente_desde  DATE,
+    vigente_hasta  DATE,
+    CHECK (hora_fin > hora_inicio)
+);
+
+CREATE INDEX IF NOT EXISTS idx_horarios_medicos_medico ON horarios_medicos (medico_id);
+
+-- Días sin atención para toda la clínica
+CREATE TABLE IF NOT EXISTS feriados (
+    fecha   DATE PRIMARY KEY,
+    nombre  TEXT
+);
+
+-- Un bloque por médico y hora: el generador inserta con ON CONFLICT DO NOTHING
+-- y puede re-ejecutarse sin duplicar. Si falla, hay duplicados previos que
+-- resolver a mano antes de aplicar esta migración.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_bloques_medico_fecha_hora
+    ON bloques_disponibles (medico_id, fecha, hora_inicio);
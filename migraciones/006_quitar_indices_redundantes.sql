@@ -0,0 +1,10 @@
+-- 006 → Quita índices que otros ya cubren (cada índice extra encarece cada escritura)
+
+-- 003: proximos_bloques filtra estado = 'DISPONIBLE', y para eso está el
+-- índice parcial de 004 (idx_bloques_libres_medico_fecha), que además no
+-- crece con el historial de reservados.
+DROP INDEX IF EXISTS idx_bloques_medico_estado_fecha_hora;
+
+-- 002: duplica el UNIQUE (rut) de pacientes; "Ver mis citas" usa ese índice
+-- y lee id_paciente del heap (una página por paciente).
+DROP INDEX IF EXISTS idx_pacientes_rut_cubre;
@@ -0,0 +1,7 @@
+-- 007 → Duración de cada bloque (minutos)
+-- Con DISPONIBILIDAD_MOTOR=reglas una hora tomada resta su intervalo real
+-- [inicio, inicio + duracion_min) a las plantillas, que pueden tener otra
+-- duración. Los bloques existentes quedan con la de antes (30).
+
+ALTER TABLE bloques_disponibles
+    ADD COLUMN IF NOT EXISTS duracion_min SMALLINT NOT NULL DEFAULT 30 CHECK (duracion_min > 0);
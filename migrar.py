@@ -0,0 +1,238 @@
+# migrar.py → MIGRACIONES DE ESQUEMA (solo hacia adelante, con checksum)
+#
+#   python migrar.py                   aplica las pendientes de migraciones/
+#   python migrar.py estado            lista aplicadas / pendientes
+#   python migrar.py verificar-planes  EXPLAIN de las consultas calientes (falla si hay Seq Scan)
+
+import hashlib
+import json
+import os
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import psycopg
+from loguru import logger
+from db_service import (
+    DATABASE_URL, SQL_DISPONIBILIDAD, SQL_DISPONIBILIDAD_LOTE, SQL_RESERVAR_UN_VIAJE, SQL_CITAS_DEL_DIA,
+    SQL_CITAS_PACIENTE, SQL_CANCELAR_CITA, SQL_PROXIMOS_BLOQUES,
+)
+
+# ==============================================================
+# CONFIG
+# ==============================================================
+
+# DDL y advisory locks de sesión: usar la URL directa de Neon, no la del pooler
+MIGRACIONES_URL = os.getenv("MIGRACIONES_URL") or DATABASE_URL
+DIRECTORIO = Path(__file__).resolve().parent / "migraciones"
+BLOQUEO_MIGRACIONES = 7240022   # pg_advisory_lock: una sola réplica migra a la vez
+
+SQL_TABLA_MIGRACIONES = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version      TEXT PRIMARY KEY,
+        nombre       TEXT NOT NULL,
+        checksum     TEXT NOT NULL,
+        aplicada_en  TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+
+
+class ErrorMigracion(Exception):
+    pass
+
+# ==============================================================
+# MIGRACIONES
+# ==============================================================
+
+def leer_migraciones() -> List[Tuple[str, str, str, str]]:
+    """(version, nombre, checksum, sql) de cada migraciones/NNN_nombre.sql, en orden."""
+    migraciones = []
+    for archivo in sorted(DIRECTORIO.glob("*.sql")):
+        contenido = archivo.read_bytes()
+        version = archivo.name.split("_", 1)[0]
+        migraciones.append((version, archivo.name, hashlib.sha256(contenido).hexdigest(), contenido.decode("utf-8")))
+    versiones = [m[0] for m in migraciones]
+    if len(set(versiones)) != len(versiones):
+        raise ErrorMigracion(f"Versiones repetidas en {DIRECTORIO}: {versiones}")
+    return migraciones
+
+def _aplicadas(conn) -> Dict[str, str]:
+    conn.execute(SQL_TABLA_MIGRACIONES)
+    return dict(conn.execute("SELECT version, checksum FROM schema_migrations").fetchall())
+
+def _verificar_checksums(migraciones, aplicadas: Dict[str, str]):
+    # Solo hacia adelante: una migración aplicada no se edita, se agrega otra
+    for version, nombre, checksum, _ in migraciones:
+        if version in aplicadas and aplicadas[version] != checksum:
+            raise ErrorMigracion(f"{nombre} cambió después de aplicarse (checksum distinto)")
+
+def migrar() -> List[str]:
+    """Aplica las migraciones pendientes, cada una en su propia transacción."""
+    migraciones = leer_migraciones()
+    aplicadas_ahora = []
+    # autocommit: cada conn.transaction() es un BEGIN/COMMIT real, no un savepoint
+    with psycopg.connect(MIGRACIONES_URL, autocommit=True, connect_timeout=15) as conn:
+        conn.execute("SELECT pg_advisory_lock(%s)", (BLOQUEO_MIGRACIONES,))
+        try:
+            aplicadas = _aplicadas(conn)
+            _verificar_checksums(migraciones, aplicadas)
+            for version, nombre, checksum, sql in migraciones:
+                if version in aplicadas:
+                    continue
+                with conn.transaction():
+                    conn.execute(sql)
+                    conn.execute(
+                        "INSERT INTO schema_migrations (version, nombre, checksum) VALUES (%s, %s, %s)",
+                        (version, nombre, checksum),
+                    )
+                logger.success(f"Migración aplicada: {nombre}")
+                aplicadas_ahora.append(nombre)
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (BLOQUEO_MIGRACIONES,))
+    if not aplicadas_ahora:
+        logger.info("Esquema al día")
+    return aplicadas_ahora
+
+def estado() -> List[Tuple[str, bool]]:
+    migraciones = leer_migraciones()
+    with psycopg.connect(MIGRACIONES_URL, autocommit=True, connect_timeout=15) as conn:
+        aplicadas = _aplicadas(conn)
+    _verificar_checksums(migraciones, aplicadas)
+    return [(nombre, version in aplicadas) for version, nombre, _, _ in migraciones]
+
+# ==============================================================
+# VERIFICACIÓN DE PLANES (EXPLAIN sobre datos sembrados)
+# ==============================================================
+# Todo corre en una transacción que se revierte: sirve contra una rama de
+# Neon o staging sin dejar datos. Falla si una consulta caliente recorre
+# completa alguna de las tablas que crecen con el uso.
+
+TABLAS_VIGILADAS = frozenset({"bloques_disponibles", "citas_agendadas", "pacientes", "recordatorios_enviados"})
+SEMILLA_MEDICOS = 20
+SEMILLA_DIAS = 60
+SEMILLA_DIAS_HISTORIA = 365  # días pasados: el historial de citas crece, un día de bloques no
+SEMILLA_BLOQUES_DIA = 16
+SEMILLA_PACIENTES = 3000
+
+def _sembrar(cur) -> Dict[str, Any]:
+    cur.execute(
+        "INSERT INTO medicos (nombre, especialidad) "
+        "SELECT 'Plan ' || i, 'Plan especialidad ' || (i %% 4) FROM generate_series(1, %s) i RETURNING id_medico",
+        (SEMILLA_MEDICOS,),
+    )
+    medicos = [fila[0] for fila in cur.fetchall()]
+    cur.execute(
+        "INSERT INTO bloques_disponibles (medico_id, fecha, hora_inicio) "
+        "SELECT m, CURRENT_DATE + d, time '08:00' + make_interval(mins => 30 * s) "
+        "FROM unnest(%s::int[]) m, generate_series(%s::int, %s) d, generate_series(0, %s) s",
+        (medicos, -SEMILLA_DIAS_HISTORIA, SEMILLA_DIAS - 1, SEMILLA_BLOQUES_DIA - 1),
+    )
+    cur.execute(
+        "INSERT INTO pacientes (rut, nombre_completo, telefono_wsp) "
+        "SELECT 'plan' || i, 'Paciente ' || i, '569' || i FROM generate_series(1, %s) i",
+        (SEMILLA_PACIENTES,),
+    )
+    # Un cuarto de los bloques queda reservado, con su cita confirmada
+    cur.execute("""
+        WITH b AS (
+            SELECT id_bloque, medico_id, row_number() OVER (ORDER BY id_bloque) AS n
+            FROM bloques_disponibles WHERE medico_id = ANY(%(medicos)s) AND id_bloque %% 4 = 0
+        ), p AS (
+            SELECT id_paciente, row_number() OVER (ORDER BY id_paciente) AS n
+            FROM pacientes WHERE rut LIKE 'plan%%'
+        ), r AS (
+            UPDATE bloques_disponibles x SET estado = 'RESERVADO', paciente_id = p.id_paciente
+            FROM b JOIN p ON p.n = b.n %% %(pacientes)s + 1
+            WHERE x.id_bloque = b.id_bloque
+            RETURNING x.id_bloque, x.medico_id, x.paciente_id
+        )
+        INSERT INTO citas_agendadas (bloque_id, paciente_id, medico_id, estado_cita)
+        SELECT id_bloque, paciente_id, medico_id, 'CONFIRMADA' FROM r
+        RETURNING id_cita
+    """, {"medicos": medicos, "pacientes": SEMILLA_PACIENTES})
+    id_cita = cur.fetchone()[0]
+    cur.execute(
+        "SELECT p.rut, p.telefono_wsp FROM citas_agendadas c JOIN pacientes p ON p.id_paciente = c.paciente_id "
+        "WHERE c.id_cita = %s",
+        (id_cita,),
+    )
+    rut, telefono = cur.fetchone()
+    cur.execute(
+        "SELECT id_bloque FROM bloques_disponibles "
+        "WHERE medico_id = %s AND estado = 'DISPONIBLE' AND fecha >= CURRENT_DATE LIMIT 1",
+        (medicos[0],),
+    )
+    id_bloque = cur.fetchone()[0]
+    for tabla in ("medicos", "pacientes", "bloques_disponibles", "citas_agendadas"):
+        cur.execute(f"ANALYZE {tabla}")
+    return {"medicos": medicos, "id_cita": id_cita, "rut": rut, "telefono": telefono, "id_bloque": id_bloque}
+
+def _consultas_calientes(s: Dict[str, Any]) -> List[Tuple[str, str, Any]]:
+    manana = date.today() + timedelta(days=1)
+    medico = s["medicos"][0]
+    return [
+        ("disponibilidad", SQL_DISPONIBILIDAD, (medico, manana)),
+        ("disponibilidad_lote", SQL_DISPONIBILIDAD_LOTE, ([medico, s["medicos"][1]], [manana, manana])),
+        ("proximos_bloques", SQL_PROXIMOS_BLOQUES, {
+            "medicos": s["medicos"][:5], "n": 5, "hasta": date.today() + timedelta(days=30),
+            "fecha": date.today(), "hora": "00:00", "id_bloque": 0,
+        }),
+        ("citas_del_dia", SQL_CITAS_DEL_DIA, (manana,)),
+        ("citas_paciente", SQL_CITAS_PACIENTE, (s["rut"], s["telefono"], 10)),
+        ("reservar_un_viaje", SQL_RESERVAR_UN_VIAJE, {
+            "rut": "plan-nuevo", "nombre": "Plan", "telefono": "569", "id_bloque": s["id_bloque"], "id_medico": medico,
+        }),
+        ("cancelar_cita", SQL_CANCELAR_CITA, {"id_cita": s["id_cita"], "rut": s["rut"], "telefono": s["telefono"]}),
+    ]
+
+def _nodos(plan: Dict[str, Any]):
+    yield plan
+    for hijo in plan.get("Plans", ()):
+        yield from _nodos(hijo)
+
+def revisar_planes() -> Dict[str, Tuple[List[str], str]]:
+    """EXPLAIN (ANALYZE, BUFFERS) de cada consulta caliente → {nombre: (tablas vigiladas con Seq Scan, detalle)}."""
+    planes = {}
+    with psycopg.connect(MIGRACIONES_URL, connect_timeout=15) as conn:
+        try:
+            with conn.cursor() as cur:
+                semilla = _sembrar(cur)
+                for nombre, sql, params in _consultas_calientes(semilla):
+                    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+                    resultado = cur.fetchone()[0]
+                    resultado = json.loads(resultado) if isinstance(resultado, str) else resultado
+                    plan = resultado[0]["Plan"]
+                    secuenciales = sorted({
+                        n["Relation Name"] for n in _nodos(plan)
+                        if n["Node Type"] == "Seq Scan" and n.get("Relation Name") in TABLAS_VIGILADAS
+                    })
+                    detalle = (f"{resultado[0].get('Execution Time', 0):.2f} ms, "
+                               f"buffers hit={plan.get('Shared Hit Blocks', 0)} read={plan.get('Shared Read Blocks', 0)}")
+                    planes[nombre] = (secuenciales, detalle)
+        finally:
+            conn.rollback()  # la semilla y lo que hicieron los EXPLAIN ANALYZE no quedan
+    return planes
+
+def verificar_planes() -> bool:
+    """False si alguna consulta caliente hace Seq Scan en TABLAS_VIGILADAS."""
+    ok = True
+    for nombre, (secuenciales, detalle) in revisar_planes().items():
+        if secuenciales:
+            ok = False
+            logger.error(f"{nombre}: Seq Scan en {', '.join(secuenciales)} ({detalle})")
+        else:
+            logger.success(f"{nombre}: sin Seq Scan ({detalle})")
+    return ok
+
+
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) > 1 else "migrar"
+    if comando == "migrar":
+        migrar()
+    elif comando == "estado":
+        for nombre, aplicada in estado():
+            print(f"{'✅' if aplicada else '⏳'} {nombre}")
+    elif comando == "verificar-planes":
+        sys.exit(0 if verificar_planes() else 1)
+    else:
+        sys.exit(f"Comando desconocido: {comando} (migrar | estado | verificar-planes)")
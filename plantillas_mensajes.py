@@ -0,0 +1,116 @@
+# plantillas_mensajes.py → TEXTOS DEL BOT (plantillas precompiladas + menús cacheados)
+
+import os
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+# ==============================================================
+# CONFIG
+# ==============================================================
+
+# Límite de WhatsApp para el cuerpo de un mensaje de texto
+WHATSAPP_MAX_CUERPO = int(os.getenv("WHATSAPP_MAX_CUERPO", "4096"))
+MAX_MENUS = 8   # versiones de catálogo con menú ya renderizado
+
+# ==============================================================
+# PLANTILLAS
+# ==============================================================
+# str.format ya ligado: el texto fijo se escribe una vez y cada turno solo
+# rellena los campos.
+
+BIENVENIDA = "¡Hola! Bienvenido(a) a *Clínica Sonrisas*\n\n¿Qué deseas?\n1️⃣ Agendar cita\n2️⃣ Ver mis citas\n3️⃣ Cancelar cita"
+
+_LINEA_MEDICO = "{}️⃣ Dr(a). {nombre} - {especialidad}".format
+_LINEA_HORA = "{}️⃣ {}".format
+_LINEA_FECHA_HORA = "{}️⃣ {:%d-%m-%Y} {}".format
+_LINEA_CITA = "{}️⃣ {fecha:%d-%m-%Y} {hora_str} - Dr(a). {medico} ({especialidad})".format
+
+_MEDICO_ELEGIDO = "Perfecto, Dr(a). {}\n\n¿Para qué fecha? (ej: 20-11-2025)\n\nO escribe *próxima* para ver las primeras horas libres".format
+_CONFIRMACION = (
+    "¡CITA CONFIRMADA! 🎉\n\nDr(a). {medico}\nFecha: {fecha:%d-%m-%Y}\nHora: {hora}\nPaciente: {paciente}\n\n"
+    "¡Te esperamos! 😊\nDirección: Av. Siempre Viva 123, Santiago"
+).format
+
+def _lista(titulo: str, lineas: Iterable[str], pie: str) -> str:
+    # Una sola unión al final en vez de concatenar línea a línea
+    return "".join((titulo, "\n\n", "\n".join(lineas), "\n\n", pie))
+
+# ==============================================================
+# MENÚ DE MÉDICOS (igual para todos: se renderiza una vez por versión)
+# ==============================================================
+
+_menus: "OrderedDict[int, str]" = OrderedDict()
+
+def menu_medicos(version: int, medicos: Sequence[Dict[str, Any]]) -> str:
+    menu = _menus.get(version)
+    if menu is None:
+        menu = _menus[version] = _lista(
+            "Elige tu médico:",
+            (_LINEA_MEDICO(i, **m) for i, m in enumerate(medicos, 1)),
+            "Escribe solo el número 👆\no una especialidad para ver sus próximas horas libres",
+        )
+        while len(_menus) > MAX_MENUS:
+            _menus.popitem(last=False)
+    return menu
+
+# ==============================================================
+# MENSAJES POR PACIENTE
+# ==============================================================
+
+def medico_elegido(nombre: str) -> str:
+    return _MEDICO_ELEGIDO(nombre)
+
+def lista_horas(fecha_texto: str, bloques: Sequence[Dict[str, Any]]) -> str:
+    return _lista(
+        f"Horarios disponibles {fecha_texto}:",
+        (_LINEA_HORA(i, b["hora_str"]) for i, b in enumerate(bloques, 1)),
+        "Escribe solo el número del horario",
+    )
+
+def lista_proximos(bloques: Sequence[Dict[str, Any]], nombre_medico: Optional[Callable[[int], str]] = None) -> str:
+    """Próximas horas libres; con `nombre_medico` (búsqueda por especialidad) cada línea lleva el médico."""
+    lineas = (_LINEA_FECHA_HORA(i, b["fecha"], b["hora_str"]) for i, b in enumerate(bloques, 1))
+    if nombre_medico is not None:
+        lineas = (f"{linea} - Dr(a). {nombre_medico(b['medico_id'])}" for linea, b in zip(lineas, bloques))
+    return _lista("Próximas horas libres:", lineas, "Escribe el número del horario o *más* para ver otros")
+
+def lista_citas(titulo: str, citas: Sequence[Dict[str, Any]], pie: str) -> str:
+    return _lista(titulo, (_LINEA_CITA(i, **c) for i, c in enumerate(citas, 1)), pie)
+
+def confirmacion(medico: str, fecha: date, hora: str, paciente: str) -> str:
+    return _CONFIRMACION(medico=medico, fecha=fecha, hora=hora, paciente=paciente)
+
+# ==============================================================
+# LÍMITE DE LARGO
+# ==============================================================
+
+def trocear(texto: str, limite: int = WHATSAPP_MAX_CUERPO) -> List[str]:
+    """
+    Parte `texto` en mensajes de a lo más `limite` caracteres, cortando entre
+    líneas (una lista larga llega en varios mensajes en vez de ser rechazada).
+    Solo una línea más larga que el límite se corta por la mitad, y sus
+    trozos van solos (el último no arrastra la línea siguiente).
+    """
+    if len(texto) <= limite:
+        return [texto]
+    partes: List[str] = []
+    actual: List[str] = []
+    largo = 0
+    for linea in texto.split("\n"):
+        if len(linea) > limite:
+            if actual:
+                partes.append("\n".join(actual))
+                actual, largo = [], 0
+            partes.extend(linea[i:i + limite] for i in range(0, len(linea), limite))
+            continue
+        extra = len(linea) + (1 if actual else 0)
+        if largo + extra > limite:
+            partes.append("\n".join(actual))
+            actual, largo = [], 0
+            extra = len(linea)
+        actual.append(linea)
+        largo += extra
+    if actual:
+        partes.append("\n".join(actual))
+    return [p for p in partes if p.strip()]
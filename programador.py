@@ -0,0 +1,69 @@
+# programador.py → TAREAS PERIÓDICAS DENTRO DE LA APP (APScheduler + lock entre réplicas)
+
+import os
+import zlib
+import pytz
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from loguru import logger
+from db_service import bloqueo_exclusivo_async
+from disponibilidad_reglas import DISPONIBILIDAD_MOTOR
+from cron_reminders import run_reminder_job_async
+from generador_bloques import generar_bloques_async
+from ycloud_client import YCloudClient
+
+# ==============================================================
+# CONFIG
+# ==============================================================
+
+PROGRAMADOR_ACTIVO = os.getenv("PROGRAMADOR_ACTIVO", "1") == "1"
+RECORDATORIOS_HORA = os.getenv("RECORDATORIOS_HORA", "10:00")        # hora de Chile
+GENERADOR_HORA = os.getenv("GENERADOR_HORA", "03:00")               # lunes, hora de Chile
+PROGRAMADOR_GRACIA = int(os.getenv("PROGRAMADOR_GRACIA", "3600"))    # seg. tolerados de atraso (redeploys)
+CHILE_TZ = pytz.timezone("America/Santiago")
+
+# coalesce: si se perdieron varias ejecuciones (app caída) corre una sola vez.
+# max_instances=1: una ejecución lenta nunca se solapa con la siguiente.
+scheduler = AsyncIOScheduler(
+    timezone=CHILE_TZ,
+    job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": PROGRAMADOR_GRACIA},
+)
+
+
+def _clave_lock(job_id: str) -> int:
+    return zlib.crc32(f"agenza:job:{job_id}".encode())
+
+
+def registrar_tarea(funcion, trigger, job_id: str, **kwargs):
+    """
+    Registra una tarea periódica. Con varias réplicas todas la programan, pero
+    solo la que gana el advisory lock de Postgres la ejecuta en cada disparo.
+    """
+    async def _ejecutar_si_lider():
+        async with bloqueo_exclusivo_async(_clave_lock(job_id)) as lider:
+            if not lider:
+                logger.info(f"Tarea {job_id}: otra réplica la está ejecutando")
+                return
+            await funcion(**kwargs)
+
+    scheduler.add_job(_ejecutar_si_lider, trigger, id=job_id, name=job_id, replace_existing=True)
+
+
+def iniciar(cliente: YCloudClient):
+    if not PROGRAMADOR_ACTIVO:
+        return
+    hora, minuto = (int(x) for x in RECORDATORIOS_HORA.split(":"))
+    registrar_tarea(run_reminder_job_async, CronTrigger(hour=hora, minute=minuto), "recordatorios", cliente=cliente)
+    # Con el motor de reglas las horas libres se calculan al consultar: generar
+    # un row por bloque cada semana sería justo lo que ese motor evita
+    if DISPONIBILIDAD_MOTOR != "reglas":
+        hora, minuto = (int(x) for x in GENERADOR_HORA.split(":"))
+        registrar_tarea(generar_bloques_async, CronTrigger(day_of_week="mon", hour=hora, minute=minuto), "generar_bloques")
+    scheduler.start()
+    bloques = f"bloques los lunes a las {GENERADOR_HORA}" if DISPONIBILIDAD_MOTOR != "reglas" else "sin generar bloques (motor de reglas)"
+    logger.info(f"Programador iniciado: recordatorios diarios a las {RECORDATORIOS_HORA}, {bloques}")
+
+
+def detener():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
@@ -1,7 +1,7 @@
 # test_db.py
 import os
 from datetime import date
-from db_service import consultar_disponibilidad
+from db_service import consultar_disponibilidad, abrir_pool
 
 # --- PARÁMETROS DE PRUEBA ---
 MEDICO_ID_PRUEBA = 1
@@ -18,6 +18,7 @@ if not uri:
 print(f"URI cargada.")
 
 # 2. Llamar a la función crítica
+abrir_pool()
 print(f"Buscando disponibilidad para Médico {MEDICO_ID_PRUEBA} en {FECHA_PRUEBA}...")
 
 horas_disponibles = consultar_disponibilidad(MEDICO_ID_PRUEBA, FECHA_PRUEBA)
@@ -0,0 +1,63 @@
+# stub_ycloud.py → SERVIDOR LOCAL QUE IMITA EL ENVÍO DE MENSAJES DE YCLOUD
+
+import asyncio
+import json
+from collections import deque
+from typing import Deque, List, Optional, Set, Tuple
+import uvicorn
+
+
+class StubYCloud:
+    """
+    App ASGI mínima: responde POST /v2/api/whatsapp/{phone}/messages tras
+    `latencia` segundos. `respuestas` permite encadenar status (y Retry-After)
+    para las próximas peticiones; vacía → 200.
+    """
+
+    def __init__(self, latencia: float = 0.0):
+        self.latencia = latencia
+        self.respuestas: Deque[Tuple[int, Optional[str]]] = deque()
+        self.recibidos: List[dict] = []
+        self.conexiones: Set[Tuple[str, int]] = set()
+        self._server: Optional[uvicorn.Server] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self.url = ""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        cuerpo = b""
+        while True:
+            evento = await receive()
+            cuerpo += evento.get("body", b"")
+            if not evento.get("more_body"):
+                break
+        self.conexiones.add(tuple(scope["client"]))
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        status, retry_after = self.respuestas.popleft() if self.respuestas else (200, None)
+        self.recibidos.append({
+            "path": scope["path"],
+            "auth": dict(scope["headers"]).get(b"authorization", b"").decode(),
+            "json": json.loads(cuerpo or b"null"),
+            "status": status,
+        })
+        headers = [(b"content-type", b"application/json")]
+        if retry_after is not None:
+            headers.append((b"retry-after", retry_after.encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": b'{"id":"stub"}'})
+
+    async def iniciar(self):
+        config = uvicorn.Config(self, host="127.0.0.1", port=0, log_level="error", lifespan="off", ws="none",
+                                backlog=2048, limit_concurrency=None)
+        self._server = uvicorn.Server(config)
+        self._tarea = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            await asyncio.sleep(0.01)
+        puerto = self._server.servers[0].sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{puerto}"
+
+    async def detener(self):
+        self._server.should_exit = True
+        await self._tarea
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from cache_ttl import CacheTTL
+
+
+def test_guarda_hasta_que_vence_el_ttl():
+    cache = CacheTTL(ttl=0.05)
+    cargas = []
+
+    def cargar():
+        cargas.append(1)
+        return len(cargas)
+
+    assert cache.obtener("k", cargar) == 1
+    assert cache.obtener("k", cargar) == 1
+    time.sleep(0.06)
+    assert cache.obtener("k", cargar) == 2
+    assert cache.estadisticas()["hits"] == 1
+
+
+def test_lru_respeta_max_entradas():
+    cache = CacheTTL(ttl=60, max_entradas=2)
+    for clave in "abc":
+        cache.poner(clave, clave)
+    assert cache.estadisticas()["entradas"] == 2
+    assert cache.obtener("a", lambda: "recargada") == "recargada"
+    assert cache.obtener("c", lambda: "no") == "c"
+
+
+def test_rafaga_de_hilos_carga_una_vez():
+    cache = CacheTTL(ttl=60)
+    cargas = []
+    lock = threading.Lock()
+
+    def cargar():
+        with lock:
+            cargas.append(1)
+        time.sleep(0.05)
+        return "valor"
+
+    with ThreadPoolExecutor(max_workers=20) as ex:
+        resultados = list(ex.map(lambda _: cache.obtener("k", cargar), range(20)))
+
+    assert resultados == ["valor"] * 20
+    assert len(cargas) == 1
+    assert cache.estadisticas()["coalescidas"] >= 1
+
+
+async def test_rafaga_async_carga_una_vez():
+    cache = CacheTTL(ttl=60)
+    cargas = 0
+
+    async def cargar():
+        nonlocal cargas
+        cargas += 1
+        await asyncio.sleep(0.01)
+        return "valor"
+
+    resultados = await asyncio.gather(*(cache.obtener_async("k", cargar) for _ in range(50)))
+
+    assert resultados == ["valor"] * 50
+    assert cargas == 1
+    assert cache.estadisticas()["coalescidas"] == 49
+
+
+async def test_error_no_se_cachea_y_llega_a_todos():
+    cache = CacheTTL(ttl=60)
+    intentos = 0
+
+    async def falla():
+        nonlocal intentos
+        intentos += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("bd caída")
+
+    resultados = await asyncio.gather(*(cache.obtener_async("k", falla) for _ in range(5)), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in resultados)
+
+    async def ok():
+        return "valor"
+
+    assert await cache.obtener_async("k", ok) == "valor"
+    assert intentos == 1
+
+
+async def test_invalidar_durante_la_carga_no_guarda_el_dato_viejo():
+    cache = CacheTTL(ttl=60)
+    version = 1
+    empezo = asyncio.Event()
+
+    async def cargar_lento():
+        leida = version
+        empezo.set()
+        await asyncio.sleep(0.02)
+        return leida
+
+    carga = asyncio.ensure_future(cache.obtener_async("k", cargar_lento))
+    await empezo.wait()
+    version = 2
+    cache.invalidar("k")
+
+    assert await carga == 1  # quien pidió antes recibe lo que se leyó
+
+    async def cargar():
+        return version
+
+    assert await cache.obtener_async("k", cargar) == 2
+
+
+def test_invalidar_si_filtra_por_predicado():
+    cache = CacheTTL(ttl=60)
+    for medico in (1, 2):
+        for dia in (1, 2):
+            cache.poner((medico, dia), "x")
+
+    cache.invalidar_si(lambda clave: clave[0] == 1)
+
+    assert cache.estadisticas()["entradas"] == 2
+    assert cache.obtener((2, 1), lambda: pytest.fail("debió estar en caché")) == "x"
@@ -0,0 +1,138 @@
+import asyncio
+import random
+import pytest
+from carriles import CarrilesPorClave
+
+
+async def test_misma_clave_en_orden_y_de_a_uno():
+    carriles = CarrilesPorClave(max_paralelo=10)
+    orden = {clave: [] for clave in "abc"}
+    en_curso = {clave: 0 for clave in "abc"}
+    maximo = {clave: 0 for clave in "abc"}
+
+    async def trabajo(clave, i):
+        en_curso[clave] += 1
+        maximo[clave] = max(maximo[clave], en_curso[clave])
+        await asyncio.sleep(random.uniform(0, 0.003))
+        orden[clave].append(i)
+        en_curso[clave] -= 1
+
+    await asyncio.gather(*(carriles.ejecutar(clave, trabajo, clave, i) for i in range(20) for clave in "abc"))
+
+    assert orden == {clave: list(range(20)) for clave in "abc"}
+    assert maximo == {clave: 1 for clave in "abc"}
+
+
+async def test_claves_distintas_en_paralelo_hasta_el_tope():
+    carriles = CarrilesPorClave(max_paralelo=3)
+    en_curso = 0
+    maximo = 0
+
+    async def trabajo():
+        nonlocal en_curso, maximo
+        en_curso += 1
+        maximo = max(maximo, en_curso)
+        await asyncio.sleep(0.01)
+        en_curso -= 1
+
+    await asyncio.gather(*(carriles.ejecutar(f"tel{i}", trabajo) for i in range(10)))
+
+    assert maximo == 3
+
+
+async def test_ejecutar_devuelve_resultado_y_propaga_errores():
+    carriles = CarrilesPorClave(max_paralelo=2)
+
+    async def doble(x):
+        return 2 * x
+
+    async def falla():
+        raise ValueError("boom")
+
+    assert await carriles.ejecutar("a", doble, 21) == 42
+    with pytest.raises(ValueError):
+        await carriles.ejecutar("a", falla)
+    assert await carriles.ejecutar("a", doble, 1) == 2  # el carril sigue vivo
+
+
+async def test_error_en_enviar_no_detiene_el_carril():
+    carriles = CarrilesPorClave(max_paralelo=2)
+    hechos = []
+
+    async def falla():
+        raise RuntimeError("boom")
+
+    async def anota(i):
+        hechos.append(i)
+
+    carriles.enviar("a", falla)
+    carriles.enviar("a", anota, 1)
+    await carriles.ejecutar("a", anota, 2)
+
+    assert hechos == [1, 2]
+
+
+async def test_carril_vacio_se_elimina():
+    carriles = CarrilesPorClave(max_paralelo=2)
+
+    async def nada():
+        pass
+
+    await asyncio.gather(*(carriles.ejecutar(f"tel{i}", nada) for i in range(50)))
+    await asyncio.sleep(0)
+
+    assert carriles.activos() == 0
+
+
+async def test_cancelar_cancela_lo_pendiente():
+    carriles = CarrilesPorClave(max_paralelo=1)
+    liberar = asyncio.Event()
+
+    async def bloquea():
+        await liberar.wait()
+
+    primero = asyncio.ensure_future(carriles.ejecutar("a", bloquea))
+    segundo = asyncio.ensure_future(carriles.ejecutar("a", bloquea))
+    await asyncio.sleep(0.01)
+    await carriles.cancelar()
+
+    for fut in (primero, segundo):
+        with pytest.raises(asyncio.CancelledError):
+            await fut
+    assert carriles.activos() == 0
+
+
+async def test_cancelar_entrega_los_envios_no_corridos():
+    descartados = []
+    carriles = CarrilesPorClave(max_paralelo=1, al_descartar=lambda fn, args: descartados.append(args))
+    liberar = asyncio.Event()
+    corridos = []
+
+    async def bloquea(i):
+        corridos.append(i)
+        await liberar.wait()
+
+    for i in range(3):
+        carriles.enviar("a", bloquea, i)
+    carriles.enviar("b", bloquea, 9)   # su carril espera el semáforo
+    await asyncio.sleep(0.01)
+    await carriles.cancelar()
+
+    assert corridos == [0]
+    assert sorted(descartados) == [(1,), (2,), (9,)]
+    assert carriles.activos() == 0
+
+
+async def test_cancelar_antes_de_arrancar():
+    descartados = []
+    carriles = CarrilesPorClave(max_paralelo=2, al_descartar=lambda fn, args: descartados.append(args))
+
+    async def nada(i):
+        pass
+
+    carriles.enviar("a", nada, 1)
+    carriles.enviar("b", nada, 2)
+    await carriles.cancelar()   # sin ceder el loop antes: ninguna tarea alcanzó a empezar
+
+    assert sorted(descartados) == [(1,), (2,)]
+    assert carriles.activos() == 0
@@ -0,0 +1,54 @@
+import asyncio
+from cola_mensajes import ColaMensajes, ColaLlena
+import pytest
+
+
+async def test_mensajes_de_un_telefono_en_orden():
+    procesados = []
+
+    async def procesar(msg):
+        await asyncio.sleep(0.001)
+        procesados.append((msg["from"], msg["n"]))
+
+    cola = ColaMensajes(procesar, workers=4, max_mensajes=100)
+    await cola.iniciar()
+    for n in range(5):
+        for tel in ("a", "b"):
+            await cola.encolar({"from": tel, "n": n})
+    await cola.detener()
+
+    assert [n for tel, n in procesados if tel == "a"] == list(range(5))
+    assert [n for tel, n in procesados if tel == "b"] == list(range(5))
+    assert cola.pendientes() == 0
+
+
+async def test_cola_llena_rechaza_a_tiempo():
+    liberar = asyncio.Event()
+
+    async def procesar(msg):
+        await liberar.wait()
+
+    cola = ColaMensajes(procesar, workers=1, max_mensajes=2)
+    await cola.iniciar()
+    await cola.encolar({"from": "a"})
+    await cola.encolar({"from": "a"})
+    with pytest.raises(ColaLlena):
+        await cola.encolar({"from": "a"}, timeout=0.01)
+    liberar.set()
+    await cola.detener()
+
+
+async def test_detener_libera_lo_no_procesado():
+    async def procesar(msg):
+        await asyncio.sleep(10)
+
+    cola = ColaMensajes(procesar, workers=1, max_mensajes=10)
+    await cola.iniciar()
+    for tel in ("a", "a", "b", "c"):
+        await cola.encolar({"from": tel})
+    await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(cola.detener(timeout=0.05), timeout=1)
+
+    assert cola.pendientes() == 0
+    assert cola._cupos._value == 10  # todos los cupos devueltos
@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+import pytest_asyncio
+from cron_reminders import TIPO_RECORDATORIO, run_reminder_job_async
+from stub_ycloud import StubYCloud
+from ycloud_client import YCloudClient
+
+CITAS = 5
+
+
+@pytest_asyncio.fixture
+async def stub():
+    stub = StubYCloud()
+    await stub.iniciar()
+    try:
+        yield stub
+    finally:
+        await stub.detener()
+
+
+@pytest_asyncio.fixture
+async def cliente(stub):
+    cliente = YCloudClient("k", "p", base_url=stub.url)
+    await cliente.abrir()
+    try:
+        yield cliente
+    finally:
+        await cliente.cerrar()
+
+
+def _sembrar_citas_manana(bd):
+    manana = date.today() + timedelta(days=1)
+    bd.execute("INSERT INTO medicos (nombre, especialidad) VALUES ('Ana Pérez', 'Ortodoncia')")
+    bd.execute(
+        "INSERT INTO pacientes (rut, nombre_completo, telefono_wsp) "
+        "SELECT 'r' || i, 'Paciente ' || i, '569' || i FROM generate_series(1, %s) i", (CITAS,),
+    )
+    bd.execute(
+        "INSERT INTO bloques_disponibles (medico_id, fecha, hora_inicio, estado, paciente_id) "
+        "SELECT 1, %s, time '09:00' + make_interval(mins => 30 * i), 'RESERVADO', i FROM generate_series(1, %s) i",
+        (manana, CITAS),
+    )
+    bd.execute(
+        "INSERT INTO citas_agendadas (bloque_id, paciente_id, medico_id) "
+        "SELECT id_bloque, paciente_id, medico_id FROM bloques_disponibles ORDER BY id_bloque"
+    )
+
+
+def _estados(bd):
+    filas = bd.execute(
+        "SELECT estado, count(*) FROM recordatorios_enviados WHERE tipo = %s GROUP BY estado", (TIPO_RECORDATORIO,)
+    ).fetchall()
+    return dict(filas)
+
+
+async def test_cada_recordatorio_queda_marcado_y_no_se_repite(bd, pool_prueba, stub, cliente):
+    _sembrar_citas_manana(bd)
+    stub.respuestas.append((400, None))  # uno lo rechaza el proveedor
+
+    resumen = await run_reminder_job_async(cliente)
+
+    assert (resumen.enviados, resumen.fallidos) == (CITAS - 1, 1)
+    assert _estados(bd) == {"ENVIADO": CITAS - 1, "FALLIDO": 1}
+    assert len(stub.recibidos) == CITAS
+
+    # Re-ejecutar solo reintenta el fallido
+    resumen = await run_reminder_job_async(cliente)
+
+    assert (resumen.enviados, resumen.fallidos) == (1, 0)
+    assert _estados(bd) == {"ENVIADO": CITAS}
+    assert len(stub.recibidos) == CITAS + 1
@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+import psycopg
+import pytest
+from psycopg_pool import ConnectionPool, PoolClosed
+import db_service
+
+
+@pytest.fixture
+def pool_sin_abrir(monkeypatch):
+    monkeypatch.setattr(db_service, "pool", ConnectionPool(db_service.DATABASE_URL, open=False))
+
+
+def test_sync_sin_abrir_pool_falla_explicitamente(pool_sin_abrir):
+    with pytest.raises(PoolClosed):
+        db_service.consultar_disponibilidad(1, date(2025, 11, 20))
+    with pytest.raises(PoolClosed):
+        db_service.reservar_cita(1, "11111111", "Juan", "569", 1)
+
+
+
+def _sembrar_paciente_con_cita(bd, rut="11111111", telefono="56911111111"):
+    manana = date.today() + timedelta(days=1)
+    bd.execute("INSERT INTO medicos (nombre, especialidad) VALUES ('Ana Pérez', 'Ortodoncia')")
+    bd.execute("INSERT INTO pacientes (rut, nombre_completo, telefono_wsp) VALUES (%s, 'Juan', %s)", (rut, telefono))
+    bd.execute(
+        "INSERT INTO bloques_disponibles (medico_id, fecha, hora_inicio, estado, paciente_id) VALUES "
+        "(1, %s, '09:00', 'RESERVADO', 1), (1, %s, '09:30', 'DISPONIBLE', NULL)",
+        (manana, manana),
+    )
+    bd.execute("INSERT INTO citas_agendadas (bloque_id, paciente_id, medico_id) VALUES (1, 1, 1)")
+
+
+async def test_citas_de_paciente_solo_desde_su_telefono(bd, pool_prueba):
+    _sembrar_paciente_con_cita(bd)
+
+    assert [c["id_cita"] for c in await db_service.citas_de_paciente_async("11111111", "56911111111")] == [1]
+    assert await db_service.citas_de_paciente_async("11111111", "56999999999") == []
+
+
+async def test_reservar_invalida_las_citas_cacheadas_del_rut(bd, pool_prueba):
+    _sembrar_paciente_con_cita(bd)
+    assert len(await db_service.citas_de_paciente_async("11111111", "56911111111")) == 1
+
+    assert await db_service.reservar_cita_async(2, "11111111", "Juan", "56911111111", 1)
+
+    assert len(await db_service.citas_de_paciente_async("11111111", "56911111111")) == 2
+
+
+async def test_cancelar_exige_rut_y_telefono(bd, pool_prueba):
+    _sembrar_paciente_con_cita(bd)
+
+    assert not await db_service.cancelar_cita_async(1, "11111111", "56999999999")  # RUT ajeno
+    assert bd.execute("SELECT estado_cita FROM citas_agendadas WHERE id_cita = 1").fetchone() == ("CONFIRMADA",)
+
+    assert await db_service.cancelar_cita_async(1, "11111111", "56911111111")
+    assert bd.execute("SELECT estado FROM bloques_disponibles WHERE id_bloque = 1").fetchone() == ("DISPONIBLE",)
+    assert not await db_service.cancelar_cita_async(1, "11111111", "56911111111")  # ya estaba cancelada
+
+
+async def test_proximos_bloques_pagina_por_cursor(bd, pool_prueba):
+    manana = date.today() + timedelta(days=1)
+    bd.execute("INSERT INTO medicos (nombre, especialidad) VALUES ('Ana Pérez', 'Ortodoncia'), ('Luis Soto', 'Ortodoncia')")
+    bd.execute(
+        "INSERT INTO bloques_disponibles (medico_id, fecha, hora_inicio) VALUES "
+        "(1, %(d1)s, '10:00'), (2, %(d1)s, '09:00'), (1, %(d2)s, '08:00'), (2, %(d2)s, '08:00')",
+        {"d1": manana, "d2": manana + timedelta(days=1)},
+    )
+
+    primera = await db_service.proximos_bloques_async([1, 2], n=3)
+    ultimo = primera[-1]
+    segunda = await db_service.proximos_bloques_async([1, 2], n=3, despues=(ultimo["fecha"], ultimo["hora_str"], ultimo["id_bloque"]))
+
+    assert [(b["medico_id"], b["hora_str"]) for b in primera] == [(2, "09:00"), (1, "10:00"), (1, "08:00")]
+    assert [(b["medico_id"], b["hora_str"]) for b in segunda] == [(2, "08:00")]
+
+
+def test_solo_las_registradas_quedan_preparadas(bd, monkeypatch):
+    monkeypatch.setattr(db_service, "_preparadas_activas", True)
+    with psycopg.connect(bd.info.dsn, **db_service.CONFIG_POOL["kwargs"]) as conn:
+        for _ in range(10):
+            with conn.cursor() as cur:
+                db_service._ejecutar(cur, db_service.SQL_DISPONIBILIDAD, (1, date.today()))
+                db_service._ejecutar(cur, "SELECT count(*) FROM medicos")
+        preparadas = [fila[0] for fila in conn.execute("SELECT statement FROM pg_prepared_statements").fetchall()]
+
+    assert len(preparadas) == 1 and "FROM bloques_disponibles" in preparadas[0]
@@ -0,0 +1,145 @@
+import socket
+import time
+import pytest
+import pytest_asyncio
+import despachador
+import ycloud_client
+from despachador import Despachador, ResumenEnvio
+from stub_ycloud import StubYCloud
+from ycloud_client import YCloudClient
+
+
+@pytest_asyncio.fixture
+async def stub():
+    stub = StubYCloud()
+    await stub.iniciar()
+    try:
+        yield stub
+    finally:
+        await stub.detener()
+
+
+@pytest_asyncio.fixture
+async def cliente(stub):
+    cliente = YCloudClient("clave-prueba", "phone-1", base_url=stub.url)
+    await cliente.abrir()
+    try:
+        yield cliente
+    finally:
+        await cliente.cerrar()
+
+
+@pytest.fixture(autouse=True)
+def backoff_corto(monkeypatch):
+    monkeypatch.setattr(despachador, "DESPACHO_BACKOFF_BASE", 0.01)
+
+
+async def _mensajes(n: int):
+    for i in range(n):
+        yield i, f"569{i:08d}", f"recordatorio {i}"
+
+
+async def test_429_respeta_retry_after_y_luego_envia(stub, cliente):
+    stub.respuestas.extend([(429, "1")])
+    resumen = ResumenEnvio()
+
+    inicio = time.monotonic()
+    ok = await Despachador(cliente).enviar("569", "hola", resumen)
+
+    assert ok
+    assert time.monotonic() - inicio >= 1.0          # esperó lo que pidió el proveedor
+    assert [r["status"] for r in stub.recibidos] == [429, 200]
+    assert (resumen.enviados, resumen.fallidos, resumen.reintentos) == (1, 0, 1)
+
+
+async def test_5xx_se_reintenta_con_backoff(stub, cliente):
+    stub.respuestas.extend([(503, None), (502, None)])
+    resumen = ResumenEnvio()
+
+    assert await Despachador(cliente).enviar("569", "hola", resumen)
+    assert [r["status"] for r in stub.recibidos] == [503, 502, 200]
+    assert resumen.reintentos == 2
+
+
+async def test_4xx_no_se_reintenta(stub, cliente):
+    stub.respuestas.extend([(400, None)])
+    resumen = ResumenEnvio()
+
+    assert not await Despachador(cliente).enviar("569", "hola", resumen)
+    assert [r["status"] for r in stub.recibidos] == [400]
+    assert (resumen.enviados, resumen.fallidos, resumen.reintentos) == (0, 1, 0)
+
+
+async def test_reintentos_agotados_cuentan_como_fallido(stub, cliente):
+    stub.respuestas.extend([(500, None)] * 3)
+    resumen = ResumenEnvio()
+
+    assert not await Despachador(cliente, max_reintentos=2).enviar("569", "hola", resumen)
+    assert len(stub.recibidos) == 3
+    assert (resumen.fallidos, resumen.reintentos) == (1, 2)
+
+
+async def test_error_de_conexion_se_reintenta():
+    with socket.socket() as s:  # puerto libre sin nadie escuchando
+        s.bind(("127.0.0.1", 0))
+        puerto = s.getsockname()[1]
+    cliente = YCloudClient("k", "p", base_url=f"http://127.0.0.1:{puerto}")
+    await cliente.abrir()
+    resumen = ResumenEnvio()
+    try:
+        assert not await Despachador(cliente, max_reintentos=2).enviar("569", "hola", resumen)
+    finally:
+        await cliente.cerrar()
+
+    assert (resumen.fallidos, resumen.reintentos) == (1, 2)
+
+
+async def test_read_timeout_no_se_reintenta(stub, monkeypatch):
+    # El proveedor recibió la petición: reintentar podría duplicar el mensaje
+    monkeypatch.setattr(ycloud_client, "YCLOUD_TIMEOUT", 0.05)
+    stub.latencia = 0.2
+    cliente = YCloudClient("k", "p", base_url=stub.url)
+    await cliente.abrir()
+    resumen = ResumenEnvio()
+    try:
+        assert not await Despachador(cliente).enviar("569", "hola", resumen)
+    finally:
+        await cliente.cerrar()
+
+    assert (resumen.fallidos, resumen.reintentos) == (1, 0)
+
+
+async def test_despachar_respeta_la_tasa(stub, cliente):
+    tasa, rafaga, total = 20, 5, 25
+    terminados = []
+
+    inicio = time.monotonic()
+    resumen = await Despachador(cliente, concurrencia=10, tasa=tasa, rafaga=rafaga).despachar(
+        _mensajes(total), al_terminar=lambda clave, ok: terminados.append((clave, ok)),
+    )
+    segundos = time.monotonic() - inicio
+
+    assert resumen.enviados == total and len(stub.recibidos) == total
+    assert sorted(terminados) == [(i, True) for i in range(total)]
+    # La ráfaga sale al tiro; el resto a `tasa` por segundo
+    assert segundos >= (total - rafaga) / tasa * 0.95
+
+
+async def test_al_terminar_async_se_espera_por_mensaje(stub, cliente):
+    vistos_al_marcar = []
+
+    async def marcar(clave, ok):
+        vistos_al_marcar.append(len(stub.recibidos))  # cuántos habían salido al marcar este
+
+    await Despachador(cliente, concurrencia=1).despachar(_mensajes(3), al_terminar=marcar)
+
+    assert vistos_al_marcar == [1, 2, 3]  # cada uno se marca antes de enviar el siguiente
+
+
+async def test_error_en_al_terminar_no_detiene_el_despacho(stub, cliente):
+    def falla(clave, ok):
+        raise RuntimeError("boom")
+
+    resumen = await Despachador(cliente, concurrencia=2).despachar(_mensajes(5), al_terminar=falla)
+
+    assert resumen.enviados == 5
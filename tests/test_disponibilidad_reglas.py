@@ -0,0 +1,130 @@
+import random
+from datetime import date, time, timedelta
+import pytest
+import disponibilidad_reglas as reglas
+from generador_bloques import agrupar_tramos, generar_bloques_async
+
+LUNES = date(2025, 11, 17)
+
+
+def _tramos(*filas):
+    """(medico_id, dia, "HH:MM", "HH:MM", duracion) → Tramos, sin vigencia."""
+    return agrupar_tramos(
+        (medico, dia, _min(ini), _min(fin), dur, None, None) for medico, dia, ini, fin, dur in filas
+    )
+
+
+def _min(hhmm: str) -> int:
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+
+def _horas(resultado, fecha=LUNES):
+    return [b["hora_str"] for b in resultado.get(fecha, [])]
+
+
+def test_hora_tomada_mas_corta_que_la_plantilla_resta_solo_su_intervalo():
+    # Plantilla de 60 min; la 09:30 (30 min) quedó tomada con la plantilla anterior
+    tramos = _tramos((1, 1, "09:00", "12:00", 60))
+    ocupados = [(1, LUNES, _min("09:30"), 30)]
+
+    resultado = reglas.disponibilidad_desde_reglas(tramos, [], ocupados, LUNES, LUNES)
+
+    assert _horas(resultado) == ["10:00", "11:00"]
+
+
+def test_hora_tomada_mas_larga_tapa_varios_candidatos():
+    tramos = _tramos((1, 1, "09:00", "11:00", 30))
+    ocupados = [(1, LUNES, _min("09:00"), 60)]
+
+    assert _horas(reglas.disponibilidad_desde_reglas(tramos, [], ocupados, LUNES, LUNES)) == ["10:00", "10:30"]
+
+
+def test_feriados_y_vigencia():
+    tramos = agrupar_tramos([
+        (1, 1, _min("09:00"), _min("10:00"), 30, None, None),
+        (1, 2, _min("09:00"), _min("10:00"), 30, LUNES + timedelta(days=8), None),   # martes, desde la otra semana
+    ])
+
+    resultado = reglas.disponibilidad_desde_reglas(tramos, [LUNES], [], LUNES, LUNES + timedelta(days=8))
+
+    assert sorted(resultado) == [LUNES + timedelta(days=7), LUNES + timedelta(days=8)]
+
+
+def test_unir_intervalos():
+    assert reglas.unir_intervalos([(50, 60), (0, 10), (10, 20), (15, 30)]) == ([0, 50], [30, 60])
+
+
+def test_numpy_y_bisect_dan_lo_mismo(monkeypatch):
+    pytest.importorskip("numpy")
+    azar = random.Random(7)
+    inicios, duraciones = [], []
+    for dia in range(60):
+        for dur, desde in ((30, 480), (45, 840)):
+            for s in range(desde, desde + 240 - dur + 1, dur):
+                inicios.append(dia * reglas.MINUTOS_DIA + s)
+                duraciones.append(dur)
+    ocupados = []
+    for _ in range(400):
+        a = azar.randrange(60 * reglas.MINUTOS_DIA)
+        ocupados.append((a, a + azar.choice((15, 30, 60, 90))))
+
+    con_numpy = reglas.restar_ocupados(inicios, duraciones, ocupados)
+    monkeypatch.setattr(reglas, "np", None)
+    con_bisect = reglas.restar_ocupados(inicios, duraciones, ocupados)
+
+    assert con_numpy == con_bisect
+    assert 0 < len(con_numpy) < len(inicios)
+
+
+def _sembrar_plantillas(bd):
+    bd.execute("INSERT INTO medicos (nombre, especialidad) VALUES ('Ana Pérez', 'Ortodoncia'), ('Luis Soto', 'Ortodoncia')")
+    bd.execute(
+        "INSERT INTO horarios_medicos (medico_id, dia_semana, hora_inicio, hora_fin, duracion_min) "
+        "SELECT m, d, '09:00', '11:00', m * 30 FROM generate_series(1, 2) m, generate_series(1, 7) d"
+    )
+
+
+async def test_materializar_toma_la_duracion_de_la_plantilla(bd, pool_prueba):
+    _sembrar_plantillas(bd)
+    manana = date.today() + timedelta(days=1)
+
+    id_bloque = await reglas.materializar_bloque_async(2, manana, _min("09:00"))
+
+    assert bd.execute(
+        "SELECT duracion_min FROM bloques_disponibles WHERE id_bloque = %s", (id_bloque,)
+    ).fetchone() == (60,)
+
+
+async def test_proximos_desde_reglas_pagina_por_cursor(bd, pool_prueba):
+    _sembrar_plantillas(bd)
+    manana = date.today() + timedelta(days=1)
+    # El médico 2 (60 min) tiene tomada su 09:00 de mañana
+    bd.execute(
+        "INSERT INTO bloques_disponibles (medico_id, fecha, hora_inicio, estado, duracion_min) "
+        "VALUES (2, %s, '09:00', 'RESERVADO', 60)", (manana,),
+    )
+
+    pagina = await reglas.proximos_reglas_async([1, 2], n=4, despues=(manana, "00:00", 0))
+
+    assert [(b["medico_id"], b["hora_str"]) for b in pagina] == [(1, "09:00"), (1, "09:30"), (1, "10:00"), (2, "10:00")]
+    assert all(b["fecha"] == manana and b["id_bloque"] is None for b in pagina)
+
+    ultimo = pagina[-1]
+    siguiente = await reglas.proximos_reglas_async([1, 2], n=2, despues=(ultimo["fecha"], ultimo["hora_str"], ultimo["medico_id"]))
+
+    assert [(b["fecha"], b["medico_id"], b["hora_str"]) for b in siguiente] == [(manana, 1, "10:30"), (manana + timedelta(days=1), 1, "09:00")]
+
+
+async def test_generador_guarda_la_duracion(bd, pool_prueba):
+    _sembrar_plantillas(bd)
+
+    await generar_bloques_async(semanas=1, desde=LUNES)
+
+    filas = bd.execute(
+        "SELECT medico_id, hora_inicio, duracion_min FROM bloques_disponibles WHERE fecha = %s ORDER BY 1, 2", (LUNES,)
+    ).fetchall()
+    assert filas == [
+        (1, time(9), 30), (1, time(9, 30), 30), (1, time(10), 30), (1, time(10, 30), 30),
+        (2, time(9), 60), (2, time(10), 60),
+    ]
@@ -0,0 +1,43 @@
+import json
+from datetime import date
+import pytest
+from estado_conversacion import FORMATO, EstadoConversacion, hora_a_minutos
+
+ESTADOS = [
+    EstadoConversacion(),
+    EstadoConversacion(estado="elegir_medico", version_catalogo=3_141_592_653),
+    EstadoConversacion(estado="elegir_hora", medico_id=7, fecha=date(2025, 11, 20),
+                       bloque_ids=(10, 11, 12), horas=(540, 570, 600)),
+    EstadoConversacion(estado="elegir_proximo", fechas=(739_575, 739_576), medico_ids=(1, 2), alcance=(1, 2, 3),
+                       bloque_ids=(5, 6), horas=(480, 510)),
+    EstadoConversacion(estado="datos_paciente", medico_id=7, fecha=date(2026, 1, 2), bloque_id=12, hora=600,
+                       actualizado=1_760_000_000),
+    EstadoConversacion(estado="cancelar_elegir", cita_ids=(99, 100), rut="12345678-5"),
+]
+
+
+@pytest.mark.parametrize("estado", ESTADOS)
+def test_a_bytes_de_bytes_ida_y_vuelta(estado):
+    raw = estado.a_bytes()
+
+    assert isinstance(raw, bytes)
+    assert EstadoConversacion.de_bytes(raw) == estado
+
+
+def test_tuplas_vuelven_como_tuplas():
+    estado = EstadoConversacion.de_bytes(ESTADOS[2].a_bytes())
+
+    assert isinstance(estado.bloque_ids, tuple) and isinstance(estado.horas, tuple)
+    hash(estado)  # frozen y con tuplas: sigue siendo hasheable
+
+
+def test_formato_viejo_vuelve_al_inicio():
+    raw = json.loads(ESTADOS[2].a_bytes())
+    raw[0] = FORMATO - 1
+
+    assert EstadoConversacion.de_bytes(json.dumps(raw).encode()) == EstadoConversacion()
+
+
+def test_hora_a_minutos():
+    assert hora_a_minutos("09:30") == 570
+    assert hora_a_minutos("17:05:00") == 1025
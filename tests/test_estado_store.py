@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import pytest
+import pytest_asyncio
+from fakeredis import TcpFakeServer
+from estado_conversacion import EstadoConversacion
+from estado_store import EstadoOcupado, EstadoStore, MemoriaStore, RedisStore
+
+WORKERS = 8
+MENSAJES_POR_WORKER = 10
+
+
+@pytest.fixture(scope="module")
+def redis_url():
+    servidor = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    host, puerto = servidor.server_address
+    try:
+        yield f"redis://{host}:{puerto}/0"
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+@pytest_asyncio.fixture
+async def stores(redis_url):
+    """Un RedisStore (con su propia conexión) por worker, como procesos distintos."""
+    stores = [RedisStore(redis_url, prefijo="prueba:", espera_bloqueo=2) for _ in range(WORKERS)]
+    for store in stores:
+        await store.abrir()
+    await stores[0]._redis.flushdb()
+    try:
+        yield stores
+    finally:
+        for store in stores:
+            await store.cerrar()
+
+
+def test_interfaz_es_abstracta():
+    with pytest.raises(TypeError):
+        EstadoStore()
+
+
+async def test_memoria_get_set_borrar():
+    store = MemoriaStore(max_entradas=2)
+    await store.set("a", EstadoConversacion(estado="menu"))
+    await store.set("b", EstadoConversacion())
+    await store.set("c", EstadoConversacion())
+
+    assert await store.get("a") is None  # el más viejo salió por tope
+    assert (await store.get("c")).estado == "inicio"
+    await store.borrar("c")
+    assert await store.get("c") is None
+
+
+async def test_redis_get_set_borrar(stores):
+    store = stores[0]
+    await store.set("569", EstadoConversacion(estado="elegir_hora", bloque_ids=(4, 5), rut="11111111-1"))
+
+    leido = await store.get("569")
+    assert leido == EstadoConversacion(estado="elegir_hora", bloque_ids=(4, 5), rut="11111111-1")
+    await store.borrar("569")
+    assert await store.get("569") is None
+
+
+async def test_redis_bloquear_serializa_workers(stores):
+    """Cada worker hace get → (cede el loop) → set del mismo teléfono; sin candado se pierden escrituras."""
+
+    async def worker(store: RedisStore):
+        for _ in range(MENSAJES_POR_WORKER):
+            async with store.bloquear("569"):
+                estado = await store.get("569") or EstadoConversacion(hora=0)
+                await asyncio.sleep(0.001)
+                await store.set("569", estado.con(hora=estado.hora + 1))
+
+    await asyncio.gather(*(worker(store) for store in stores))
+
+    assert (await stores[0].get("569")).hora == WORKERS * MENSAJES_POR_WORKER
+    assert await stores[0]._redis.get("prueba:bloqueo:569") is None  # todos soltaron
+
+
+async def test_redis_bloquear_espera_acotada(stores):
+    primero, segundo = stores[0], stores[1]
+    segundo.espera_bloqueo = 0.05
+
+    async with primero.bloquear("569"):
+        with pytest.raises(EstadoOcupado):
+            async with segundo.bloquear("569"):
+                pass
+        async with segundo.bloquear("otro"):  # otro teléfono no espera
+            pass
+
+
+async def test_redis_no_suelta_candado_ajeno(stores):
+    primero, segundo = stores[0], stores[1]
+    primero.bloqueo_ms = 50
+
+    async with primero.bloquear("569"):
+        await asyncio.sleep(0.1)  # el candado venció: otro worker lo toma
+        assert await segundo._redis.set("prueba:bloqueo:569", "ajeno", nx=True, px=5000)
+
+    assert await segundo._redis.get("prueba:bloqueo:569") == b"ajeno"
@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from loteador import Loteador
+
+
+def _loteador(**kwargs):
+    llamadas = []
+
+    async def cargar_lote(claves):
+        llamadas.append(sorted(claves))
+        await asyncio.sleep(0)
+        return {c: c * 10 for c in claves if c != 0}
+
+    return Loteador(cargar_lote, **kwargs), llamadas
+
+
+async def test_claves_concurrentes_van_en_un_lote():
+    loteador, llamadas = _loteador(por_defecto=-1)
+
+    resultados = await asyncio.gather(*(loteador.cargar(c) for c in (3, 1, 2, 0)))
+
+    assert resultados == [30, 10, 20, -1]  # la ausente recibe por_defecto
+    assert llamadas == [[0, 1, 2, 3]]
+    assert (loteador.lotes, loteador.claves) == (1, 4)
+
+
+async def test_clave_repetida_se_consulta_una_vez():
+    loteador, llamadas = _loteador()
+
+    resultados = await asyncio.gather(*(loteador.cargar(5) for _ in range(10)))
+
+    assert resultados == [50] * 10
+    assert llamadas == [[5]]
+
+
+async def test_max_lote_despacha_sin_esperar_la_ventana():
+    loteador, llamadas = _loteador(ventana=10, max_lote=3)
+
+    resultados = await asyncio.wait_for(asyncio.gather(*(loteador.cargar(c) for c in range(1, 7))), timeout=1)
+
+    assert resultados == [10, 20, 30, 40, 50, 60]
+    assert llamadas == [[1, 2, 3], [4, 5, 6]]
+
+
+async def test_error_del_lote_llega_a_cada_clave():
+    async def falla(claves):
+        raise ConnectionError("bd caída")
+
+    loteador = Loteador(falla)
+
+    resultados = await asyncio.gather(*(loteador.cargar(c) for c in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, ConnectionError) for r in resultados)
+
+
+async def test_lotes_sucesivos_son_independientes():
+    loteador, llamadas = _loteador()
+
+    assert await loteador.cargar(1) == 10
+    assert await loteador.cargar(2) == 20
+    assert llamadas == [[1], [2]]
+
+
+async def test_cancelar_un_llamador_no_afecta_a_los_demas():
+    loteador, _ = _loteador(ventana=0.01)
+
+    cancelado = asyncio.ensure_future(loteador.cargar(1))
+    otro = asyncio.ensure_future(loteador.cargar(1))
+    await asyncio.sleep(0)
+    cancelado.cancel()
+
+    assert await otro == 10
+    with pytest.raises(asyncio.CancelledError):
+        await cancelado
+
+
+async def test_lote_cancelado_cancela_a_quienes_esperan():
+    empezo = asyncio.Event()
+
+    async def eterno(claves):
+        empezo.set()
+        await asyncio.Event().wait()
+
+    loteador = Loteador(eterno)
+    esperando = [asyncio.ensure_future(loteador.cargar(c)) for c in range(3)]
+    await empezo.wait()
+    (tarea,) = loteador._en_vuelo
+    tarea.cancel()
+
+    resultados = await asyncio.wait_for(asyncio.gather(*esperando, return_exceptions=True), timeout=1)
+
+    assert all(isinstance(r, asyncio.CancelledError) for r in resultados)
+
+
+async def test_lotes_terminados_no_quedan_referenciados():
+    loteador, _ = _loteador()
+
+    await asyncio.gather(*(loteador.cargar(c) for c in range(5)))
+    await asyncio.sleep(0)
+
+    assert not loteador._en_vuelo
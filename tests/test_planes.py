@@ -0,0 +1,17 @@
+import migrar
+
+
+def test_consultas_calientes_sin_seq_scan(bd):
+    planes = migrar.revisar_planes()
+
+    assert len(planes) == 7
+    con_seq_scan = {nombre: (tablas, detalle) for nombre, (tablas, detalle) in planes.items() if tablas}
+    assert not con_seq_scan, con_seq_scan
+
+
+def test_indices_redundantes_eliminados(bd):
+    indices = {fila[0] for fila in bd.execute("SELECT indexname FROM pg_indexes WHERE schemaname = 'public'")}
+
+    assert "idx_bloques_medico_estado_fecha_hora" not in indices
+    assert "idx_pacientes_rut_cubre" not in indices
+    assert {"idx_bloques_libres_medico_fecha", "pacientes_rut_key"} <= indices
@@ -0,0 +1,66 @@
+from datetime import date
+import plantillas_mensajes as plantillas
+from plantillas_mensajes import trocear
+
+MEDICOS = [
+    {"id_medico": 1, "nombre": "Ana Pérez", "especialidad": "Ortodoncia"},
+    {"id_medico": 2, "nombre": "Luis Soto", "especialidad": "Endodoncia"},
+]
+
+
+def test_trocear_texto_corto_no_cambia():
+    assert trocear("hola\nmundo", limite=20) == ["hola\nmundo"]
+
+
+def test_trocear_corta_entre_lineas():
+    lineas = [f"{i}️⃣ 10:30 - Dr(a). Nombre {i}" for i in range(300)]
+    texto = "\n".join(lineas)
+
+    partes = trocear(texto, limite=500)
+
+    assert len(partes) > 1
+    assert all(len(p) <= 500 for p in partes)
+    assert "\n".join(partes) == texto  # ninguna línea queda partida
+
+
+def test_trocear_linea_mas_larga_que_el_limite():
+    texto = "inicio\n" + "x" * 25 + "\nfin"
+
+    partes = trocear(texto, limite=10)
+
+    assert all(len(p) <= 10 for p in partes)
+    assert "".join(partes).replace("\n", "") == texto.replace("\n", "")
+    assert partes[0] == "inicio" and partes[-1] == "fin"
+
+
+def test_trocear_justo_en_el_limite():
+    texto = "a" * 10 + "\n" + "b" * 10
+
+    assert trocear(texto, limite=21) == [texto]
+    assert trocear(texto, limite=20) == ["a" * 10, "b" * 10]
+
+
+def test_menu_medicos_se_renderiza_una_vez_por_version():
+    menu = plantillas.menu_medicos(101, MEDICOS)
+
+    assert "1️⃣ Dr(a). Ana Pérez - Ortodoncia" in menu
+    assert "2️⃣ Dr(a). Luis Soto - Endodoncia" in menu
+    assert plantillas.menu_medicos(101, []) is menu  # no se vuelve a renderizar
+
+
+def test_menus_cacheados_tienen_tope():
+    for version in range(1000, 1000 + plantillas.MAX_MENUS + 5):
+        plantillas.menu_medicos(version, MEDICOS)
+
+    assert len(plantillas._menus) == plantillas.MAX_MENUS
+    assert "Ana Pérez" not in plantillas.menu_medicos(1000, [])             # la más vieja salió: se re-renderiza
+    assert "Ana Pérez" in plantillas.menu_medicos(1000 + plantillas.MAX_MENUS + 4, [])
+
+
+def test_lista_citas_y_confirmacion():
+    citas = [{"fecha": date(2025, 11, 20), "hora_str": "09:30", "medico": "Ana Pérez", "especialidad": "Ortodoncia"}]
+
+    texto = plantillas.lista_citas("Tus próximas citas:", citas, "pie")
+
+    assert "1️⃣ 20-11-2025 09:30 - Dr(a). Ana Pérez (Ortodoncia)" in texto
+    assert "Fecha: 20-11-2025" in plantillas.confirmacion("Ana Pérez", date(2025, 11, 20), "09:30", "Juan")
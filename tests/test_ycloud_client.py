@@ -0,0 +1,86 @@
+import asyncio
+import time
+import pytest
+import pytest_asyncio
+from stub_ycloud import StubYCloud
+from ycloud_client import YCloudClient, YCLOUD_MAX_CONEXIONES
+import main
+
+CONVERSACIONES = 500
+MENSAJES_POR_CONVERSACION = 4
+LATENCIA_STUB = 0.05
+
+
+@pytest_asyncio.fixture
+async def stub():
+    stub = StubYCloud()
+    await stub.iniciar()
+    try:
+        yield stub
+    finally:
+        await stub.detener()
+
+
+@pytest_asyncio.fixture
+async def cliente(stub):
+    cliente = YCloudClient("clave-prueba", "phone-1", base_url=stub.url)
+    await cliente.abrir()
+    try:
+        yield cliente
+    finally:
+        await cliente.cerrar()
+
+
+async def test_enviar_texto_arma_la_peticion(stub, cliente):
+    resp = await cliente.enviar_texto("56911111111", "hola")
+
+    assert resp.status_code == 200
+    (recibido,) = stub.recibidos
+    assert recibido["path"] == "/v2/api/whatsapp/phone-1/messages"
+    assert recibido["auth"] == "Bearer clave-prueba"
+    assert recibido["json"] == {"to": "56911111111", "type": "text", "text": {"body": "hola"}}
+
+
+async def test_sin_abrir_falla_explicitamente():
+    with pytest.raises(RuntimeError):
+        await YCloudClient("k", "p").enviar_texto("569", "hola")
+
+
+async def test_enviar_mensaje_trocea_textos_largos(stub, cliente, monkeypatch):
+    monkeypatch.setattr(main, "ycloud", cliente)
+    texto = "\n".join(f"{i}️⃣ Dr(a). Nombre bastante largo {i} - Especialidad" for i in range(200))
+
+    await main.enviar_mensaje("569", texto)
+
+    cuerpos = [r["json"]["text"]["body"] for r in stub.recibidos]
+    assert len(cuerpos) > 1
+    assert "\n".join(cuerpos) == texto
+
+
+async def test_throughput_500_conversaciones(stub, cliente, monkeypatch):
+    """
+    500 conversaciones a la vez, cada una con sus mensajes en orden (como un
+    paciente). Con envíos bloqueantes el tiempo sería la suma de las latencias;
+    con el pool compartido crece con la concurrencia.
+    """
+    monkeypatch.setattr(main, "ycloud", cliente)
+    stub.latencia = LATENCIA_STUB
+
+    async def conversacion(i: int):
+        for n in range(MENSAJES_POR_CONVERSACION):
+            await main.enviar_mensaje(f"569{i:08d}", f"mensaje {n}")
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(conversacion(i) for i in range(CONVERSACIONES)))
+    segundos = time.perf_counter() - inicio
+
+    total = CONVERSACIONES * MENSAJES_POR_CONVERSACION
+    por_segundo = total / segundos
+    print(f"\n{total} envíos en {segundos:.2f}s → {por_segundo:.0f} envíos/s "
+          f"({len(stub.conexiones)} conexiones TCP, latencia stub {LATENCIA_STUB * 1000:.0f} ms)")
+    assert len(stub.recibidos) == total
+    assert all(r["status"] == 200 for r in stub.recibidos)
+    # Serial daría 1 / LATENCIA_STUB = 20 envíos/s
+    assert por_segundo > 5 / LATENCIA_STUB
+    # Un juego fijo de conexiones keep-alive: nunca más que el tope del pool
+    assert len(stub.conexiones) <= YCLOUD_MAX_CONEXIONES
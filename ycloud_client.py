@@ -0,0 +1,72 @@
+# ycloud_client.py → CLIENTE HTTP ASÍNCRONO YCLOUD (pool keep-alive compartido)
+
+import asyncio
+import os
+from typing import Optional
+import httpx
+from loguru import logger
+
+# ==============================================================
+# CONFIG
+# ==============================================================
+
+YCLOUD_BASE_URL = os.getenv("YCLOUD_BASE_URL", "https://api.ycloud.com")
+# Conexiones abiertas a YCloud; todas se mantienen vivas (keep-alive = tope): con
+# menos keep-alive que conexiones, cada conexión sobre ese número se cierra apenas
+# queda libre y la siguiente petición vuelve a pagar el handshake
+YCLOUD_MAX_CONEXIONES = int(os.getenv("YCLOUD_MAX_CONEXIONES", "20"))
+YCLOUD_TIMEOUT = float(os.getenv("YCLOUD_TIMEOUT", "10"))
+YCLOUD_HTTP2 = os.getenv("YCLOUD_HTTP2", "1") == "1"
+
+
+class YCloudClient:
+    """Cliente único por proceso: se abre en el arranque de la app y se cierra al apagarla."""
+
+    def __init__(self, api_key: Optional[str], phone_id: Optional[str], base_url: str = YCLOUD_BASE_URL):
+        self.api_key = api_key
+        self.phone_id = phone_id
+        self.base_url = base_url
+        self._http: Optional[httpx.AsyncClient] = None
+        self._cupos: Optional[asyncio.Semaphore] = None
+
+    async def abrir(self):
+        if self._http is not None:
+            return
+        try:
+            import h2  # noqa: F401  (HTTP/2 solo si está instalado el extra httpx[http2])
+            http2 = YCLOUD_HTTP2
+        except ImportError:
+            http2 = False
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=http2,
+            timeout=YCLOUD_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=YCLOUD_MAX_CONEXIONES,
+                max_keepalive_connections=YCLOUD_MAX_CONEXIONES,
+            ),
+            headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+        )
+        # Las peticiones que exceden el pool esperan aquí y no en la cola interna
+        # de httpcore, cuyo costo crece con (peticiones en espera × conexiones)
+        self._cupos = asyncio.Semaphore(YCLOUD_MAX_CONEXIONES)
+        logger.info(f"Cliente YCloud abierto (http2={http2}, max_conexiones={YCLOUD_MAX_CONEXIONES})")
+
+    async def cerrar(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            logger.info("Cliente YCloud cerrado")
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            raise RuntimeError("Cliente YCloud no abierto: llama a abrir() en el lifespan de la app")
+        return self._http
+
+    async def enviar_texto(self, to: str, texto: str) -> httpx.Response:
+        """Envía un mensaje de texto; devuelve la respuesta cruda (el llamador decide qué hacer con el status)."""
+        payload = {"to": to, "type": "text", "text": {"body": texto}}
+        http = self.http
+        async with self._cupos:
+            return await http.post(f"/v2/api/whatsapp/{self.phone_id}/messages", json=payload)